@@ -1,12 +1,131 @@
 import os
-import boto3
-from flask import Flask, render_template
-from flask_autoindex import AutoIndex
+import json
+import hashlib
+import threading
+from datetime import datetime, timedelta
+
+from flask import Flask, Response, render_template, jsonify, request, abort, url_for
+from cachetools import TTLCache
+
+import helix
+import storage
+import feed
+import reports
+
+PER_PAGE = 50
+REPORT_CACHE_TTL = int(os.environ.get('REPORT_CACHE_TTL', 30))
+KEEP_ALIVE = 15
 
 app = Flask(__name__)
+channel_storage = {}
+report_cache = TTLCache(256, REPORT_CACHE_TTL)
+report_cache_lock = threading.Lock()
+
+def render_live(channel_name, name, data):
+    with app.app_context():
+        return render_template('live_fragment.html', channel=channel_name, **data)
+
+live_relay = feed.FeedRelay(lambda position: get_storage().follow_events(position), render_live)
+
+def get_storage():
+    if 'storage' not in channel_storage:
+        channel_name = os.environ['TWITCH_CHANNEL']
+        channel_id = helix.HelixClient(os.environ['TWITCH_ID']).get_user_id(channel_name)
+        channel_storage['storage'] = storage.connect(channel_id, channel_name)
+    return channel_storage['storage']
+
+def parse_date(value):
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        abort(400)
+
+def report_filters():
+    try:
+        page = max(int(request.args.get('page', 1)), 1)
+    except ValueError:
+        abort(400)
+    end = parse_date(request.args.get('to'))
+    return {
+        "channel": request.args.get('channel') or None,
+        "report_type": request.args.get('type') or None,
+        "start": parse_date(request.args.get('from')),
+        "end": end + timedelta(days=1) if end else None,
+        "page": page
+    }
+
+def cached_response(name, render, mimetype):
+    """
+    Returns a response for the current query string, rendering it at most once
+    every REPORT_CACHE_TTL seconds, with an ETag so repeat visits get a 304.
+    """
+    key = (name, request.query_string)
+    with report_cache_lock:
+        cached = report_cache.get(key)
+    if cached is None:
+        body = render()
+        cached = (body, hashlib.sha1(body.encode('utf-8')).hexdigest())
+        with report_cache_lock:
+            report_cache[key] = cached
+    response = app.response_class(cached[0], mimetype=mimetype)
+    response.set_etag(cached[1])
+    response.headers['Cache-Control'] = 'public, max-age=%s' % REPORT_CACHE_TTL
+    return response.make_conditional(request)
+
+def list_reports(filters):
+    reports, total = get_storage().list_reports(per_page=PER_PAGE, **filters)
+    for report in reports:
+        report['created'] = report['created'].isoformat() + 'Z'
+    pages = max((total + PER_PAGE - 1) // PER_PAGE, 1)
+    return {"reports": reports, "page": filters['page'], "pages": pages, "total": total}
+
 @app.route('/')
 def index():
-    return render_template('reports.html', bucket=os.environ['S3_BUCKET'])
+    filters = report_filters()
+    def render():
+        page = list_reports(filters)
+        links = {}
+        for name, number in (('previous', page['page'] - 1), ('next', page['page'] + 1)):
+            if 1 <= number <= page['pages']:
+                links[name] = url_for('index', **dict(request.args.to_dict(), page=number))
+        return render_template('reports.html', bucket=os.environ['S3_BUCKET'],
+                               args=request.args, links=links,
+                               report_types=reports.REPORT_TYPES.items(), **page)
+    return cached_response('index', render, 'text/html')
+
+@app.route('/reports.json')
+def reports_json():
+    filters = report_filters()
+    def render():
+        return json.dumps(list_reports(filters))
+    return cached_response('json', render, 'application/json')
+
+@app.route('/odds')
+def odds():
+    live = get_storage().get_live('odds')
+    if live is None:
+        return jsonify(pending=0, items=[], updated=None)
+    return jsonify(updated=live['updated'].isoformat() + 'Z', **live['data'])
+
+@app.route('/live/<channel>')
+def live(channel):
+    live_relay.start()
+    return render_template('live.html', channel=channel.lower(),
+                           fragment=live_relay.current(channel.lower()))
+
+@app.route('/live/<channel>/events')
+def live_events(channel):
+    live_relay.start()
+    channel = channel.lower()
+    def stream():
+        version = None
+        while True:
+            version, event = live_relay.wait(channel, version, KEEP_ALIVE)
+            yield event or ': keep-alive\n\n'
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 if __name__ == '__main__':
-    app.run()
+    app.run(threaded=True)
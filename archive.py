@@ -0,0 +1,277 @@
+"""This module provides archival of old sessions into compressed cold storage."""
+import os
+import json
+import gzip
+import logging
+from datetime import datetime, timedelta
+
+import boto3
+
+from database.session import Session
+from database.session_log_entry import SessionLogEntry
+
+TIME_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+CHUNK_SIZE = 64 * 1024
+EXTENSIONS = {
+    "gzip": '.jsonl.gz',
+    "zstd": '.jsonl.zst'
+}
+
+
+def compress(data, compression):
+    """Returns data compressed with gzip or zstd."""
+    if compression == 'gzip':
+        return gzip.compress(data)
+    if compression == 'zstd':
+        import zstandard
+        return zstandard.ZstdCompressor().compress(data)
+    raise ValueError('Unknown compression %s' % compression)
+
+
+def decompressing_reader(file, compression):
+    """Returns a file-like object that decompresses file as it is read."""
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=file, mode='rb')
+    if compression == 'zstd':
+        import zstandard
+        return zstandard.ZstdDecompressor().stream_reader(file)
+    raise ValueError('Unknown compression %s' % compression)
+
+
+def iter_lines(reader):
+    """Returns a generator of the lines read from reader, CHUNK_SIZE bytes at a time."""
+    pending = b''
+    while True:
+        chunk = reader.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        lines = (pending + chunk).split(b'\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line
+    if pending:
+        yield pending
+
+
+def dump_session(session):
+    """Returns a session as a line of JSON."""
+    return json.dumps(session.to_mongo(), separators=(',', ':'),
+                      default=lambda value: value.strftime(TIME_FORMAT))
+
+
+def load_session(line):
+    """Returns a session from a line created by dump_session."""
+    data = json.loads(line)
+    guesses = []
+    for entry in data.get('guesses', []):
+        entry['timestamp'] = datetime.strptime(entry['timestamp'], TIME_FORMAT)
+        guesses.append(SessionLogEntry(**entry))
+    return Session(guesses=guesses)
+
+
+def session_end(session):
+    """Returns the time of a session's last guess, or None if it has no guesses."""
+    return max((entry.timestamp for entry in session.guesses), default=None)
+
+
+class LocalSegmentStore():
+    """This is a class for keeping archive segments in a directory on local disk."""
+    def __init__(self, directory):
+        """
+        The constructor for LocalSegmentStore class.
+
+        Parameters:
+            directory (string): The directory to keep segments in
+        """
+        self.directory = directory
+
+    def put(self, name, data):
+        """Writes a segment, replacing it whole so a partial write is never read."""
+        path = os.path.join(self.directory, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.partial', 'wb') as segment:
+            segment.write(data)
+        os.replace(path + '.partial', path)
+
+    def open(self, name):
+        """Returns a segment opened for reading."""
+        return open(os.path.join(self.directory, name), 'rb')
+
+
+class S3SegmentStore():
+    """This is a class for keeping archive segments in an S3 compatible bucket."""
+    def __init__(self, bucket, prefix='archive', endpoint_url=None):
+        """
+        The constructor for S3SegmentStore class.
+
+        Parameters:
+            bucket (string): The bucket to keep segments in
+            prefix (string): The key prefix to keep segments under
+            endpoint_url (string): The URL of an S3 compatible service, or None for S3
+        """
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = boto3.client('s3', endpoint_url=endpoint_url)
+
+    def put(self, name, data):
+        """Uploads a segment."""
+        self.client.put_object(Bucket=self.bucket, Key='%s/%s' % (self.prefix, name), Body=data)
+
+    def open(self, name):
+        """Returns a segment's body, streamed from the bucket as it is read."""
+        return self.client.get_object(
+            Bucket=self.bucket, Key='%s/%s' % (self.prefix, name))['Body']
+
+
+def open_store():
+    """
+    The function to open the segment store chosen by the environment.
+
+    ARCHIVE_STORE selects 'local', the default, which keeps segments under
+    ARCHIVE_DIR, or 's3', which keeps them in ARCHIVE_BUCKET, or S3_BUCKET if
+    that is not set, at ARCHIVE_ENDPOINT if set.
+
+    Returns:
+        Returns a LocalSegmentStore or S3SegmentStore.
+    """
+    store = os.environ.get('ARCHIVE_STORE', 'local')
+    if store == 'local':
+        return LocalSegmentStore(os.environ.get('ARCHIVE_DIR', 'archive'))
+    if store == 's3':
+        return S3SegmentStore(os.environ.get('ARCHIVE_BUCKET') or os.environ['S3_BUCKET'],
+                              endpoint_url=os.environ.get('ARCHIVE_ENDPOINT'))
+    raise ValueError('Unknown archive store %s' % store)
+
+
+class SessionArchiver():
+    """
+    This is a class for moving old sessions out of the streamer's hot document.
+
+    Each run takes up to batch of the oldest sessions whose last guess is older
+    than max_age, never the latest session, and writes them as one compressed
+    JSONL segment. The segment is written to the store and recorded in the
+    manifest before the sessions are removed, so a run that is interrupted
+    leaves its sessions in place, and the next run removes them rather than
+    archiving them twice. Runs are incremental, so calling run every so often
+    archives a backlog a batch at a time.
+    """
+    def __init__(self, storage, store, max_age=30, compression='gzip', batch=50):
+        """
+        The constructor for SessionArchiver class.
+
+        Parameters:
+            storage (Storage): The storage backend bound to the streamer's channel
+            store (object): The LocalSegmentStore or S3SegmentStore to write segments to
+            max_age (float): How many days after its last guess a session is archived
+            compression (string): 'gzip' or 'zstd'
+            batch (int): The most sessions to write to one segment
+        """
+        if compression not in EXTENSIONS:
+            raise ValueError('Unknown compression %s' % compression)
+        self.logger = logging.getLogger(__name__)
+        self.storage = storage
+        self.store = store
+        self.max_age = timedelta(days=max_age)
+        self.compression = compression
+        self.batch = batch
+        self.metrics = {
+            "hot-size": None,
+            "archived": 0,
+            "segments": 0
+        }
+
+    def run(self):
+        """
+        The function to archive one batch of old sessions.
+
+        Returns:
+            Returns the number of sessions moved out of the hot document.
+        """
+        sessions = self.storage.oldest_sessions(self.batch)
+        removed = self._remove_archived(sessions)
+        if removed:
+            sessions = sessions[removed:]
+        cutoff = datetime.now() - self.max_age
+        count = 0
+        for session in sessions:
+            end = session_end(session)
+            if end is not None and end >= cutoff:
+                break
+            count += 1
+        if count and self._write_segment(sessions[:count]):
+            removed += count
+        self.metrics['hot-size'] = self.storage.hot_size()
+        self.logger.info('Archived %s sessions, hot document is %s bytes',
+                         removed, self.metrics['hot-size'])
+        return removed
+
+    def _remove_archived(self, sessions):
+        segments = self.storage.list_archive_segments()
+        if not segments or not sessions:
+            return 0
+        last = segments[-1]['last']
+        count = 0
+        for session in sessions:
+            end = session_end(session)
+            if end is not None and end > last:
+                break
+            count += 1
+        if count and self.storage.remove_sessions(count):
+            self.logger.warning('Removed %s sessions left behind by an interrupted archive run',
+                                count)
+            return count
+        return 0
+
+    def _write_segment(self, sessions):
+        data = compress(''.join(dump_session(session) + '\n' for session in sessions)
+                        .encode('utf-8'), self.compression)
+        ends = [end for end in map(session_end, sessions) if end is not None]
+        first = min(ends, default=datetime.now())
+        last = max(ends, default=first)
+        name = '%s/%s-%s%s' % (self.storage.channel_id, first.strftime('%Y%m%dT%H%M%S'),
+                               len(sessions), EXTENSIONS[self.compression])
+        self.store.put(name, data)
+        self.storage.add_archive_segment({
+            "name": name,
+            "compression": self.compression,
+            "sessions": len(sessions),
+            "first": first,
+            "last": last,
+            "size": len(data)
+        })
+        self.logger.debug('Wrote archive segment %s of %s bytes', name, len(data))
+        if not self.storage.remove_sessions(len(sessions)):
+            self.logger.warning('Sessions changed while archiving, will remove next run')
+            return False
+        self.metrics['archived'] += len(sessions)
+        self.metrics['segments'] += 1
+        return True
+
+    def iter_sessions(self, start=None, end=None):
+        """
+        The function to read archived sessions back.
+
+        Segments are streamed from the store and decompressed as they are read,
+        so only one chunk of a segment is held in memory at a time.
+
+        Parameters:
+            start (datetime): Skip segments whose sessions all ended before this
+            end (datetime): Skip segments whose sessions all ended after this
+
+        Returns:
+            Returns a generator of Session documents, oldest first.
+        """
+        for segment in self.storage.list_archive_segments(start, end):
+            file = self.store.open(segment['name'])
+            try:
+                reader = decompressing_reader(file, segment['compression'])
+                for line in iter_lines(reader):
+                    if line:
+                        yield load_session(line.decode('utf-8'))
+            finally:
+                file.close()
+
+    def describe(self):
+        """Returns the archive metrics formatted for chat."""
+        return 'Hot document %s bytes, %s sessions archived to %s segments since start' % (
+            self.metrics['hot-size'], self.metrics['archived'], self.metrics['segments'])
@@ -0,0 +1,162 @@
+"""This module provides a benchmark of parsing chat messages with tag loops and ChatMessage."""
+import os
+import sys
+import time
+import random
+import logging
+import argparse
+import tracemalloc
+
+import irc.client
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import chat  # pylint: disable=wrong-import-position
+
+CHANNEL_ID = '1'
+SELF_ID = '2'
+COMMANDS = ['!guess', '!hud', '!points', '!song', '!start', '!finish']
+BADGES = ['', 'subscriber/12', 'moderator/1', 'vip/1', 'broadcaster/1,subscriber/0',
+          'premium/1', 'founder/0,bits/100']
+
+logger = logging.getLogger(__name__)
+
+
+def make_events(count, command_share, seed=0):
+    """Returns count pubmsg events with the 14 tags Twitch sends with chat."""
+    generator = random.Random(seed)
+    events = []
+    for number in range(count):
+        user_id = str(1000 + number % 5000)
+        badges = generator.choice(BADGES)
+        if generator.random() < command_share:
+            text = '%s hover boots' % generator.choice(COMMANDS)
+        else:
+            text = 'hello chat %s' % number
+        tags = [
+            {'key': 'badge-info', 'value': None},
+            {'key': 'badges', 'value': badges},
+            {'key': 'client-nonce', 'value': '%032x' % generator.getrandbits(128)},
+            {'key': 'color', 'value': '#1E90FF'},
+            {'key': 'display-name', 'value': 'User%s' % user_id},
+            {'key': 'emotes', 'value': None},
+            {'key': 'first-msg', 'value': '0'},
+            {'key': 'flags', 'value': None},
+            {'key': 'id', 'value': '%032x' % generator.getrandbits(128)},
+            {'key': 'mod', 'value': '1' if 'moderator' in badges else '0'},
+            {'key': 'room-id', 'value': CHANNEL_ID},
+            {'key': 'subscriber', 'value': '1' if 'subscriber' in badges else '0'},
+            {'key': 'tmi-sent-ts', 'value': str(1600000000000 + number)},
+            {'key': 'user-id', 'value': user_id},
+        ]
+        source = irc.client.NickMask('user{0}!user{0}@user{0}.tmi.twitch.tv'.format(user_id))
+        events.append(irc.client.Event('pubmsg', source, '#channel', [text], tags))
+    return events
+
+
+def tag_loop(event):
+    """
+    The function to handle an event the way the bot did before ChatMessage.
+
+    The tags are scanned for the sender's id, again for the rate limiter's
+    mod check and again for the permission check, and the text is split.
+
+    Returns:
+        Returns the work item the bot queued, or None for chat that is not a command.
+    """
+    for tag in event.tags:
+        if tag['key'] == 'user-id' and tag['value'] == SELF_ID:
+            return None
+    command = event.arguments[0].split(' ')
+    command_name = command[0].lower()
+    if command_name not in COMMANDS:
+        return None
+    user_id = None
+    admitted = False
+    for tag in event.tags:
+        if tag['key'] == 'user-id':
+            user_id = tag['value']
+            if user_id == CHANNEL_ID:
+                admitted = True
+        if tag['key'] == 'mod' and tag['value'] == '1':
+            admitted = True
+    mod = False
+    for tag in event.tags:
+        if tag['key'] == 'user-id' and tag['value'] == CHANNEL_ID:
+            mod = True
+        if tag['key'] == 'mod' and tag['value'] == '1':
+            mod = True
+    username = event.source.split('!')[0]
+    return (event, command, user_id, username, admitted, mod)
+
+
+def chat_message(event):
+    """
+    The function to handle an event the way the bot does with ChatMessage.
+
+    Returns:
+        Returns the message the bot queues, or None for chat that is not a command.
+    """
+    if not event.arguments[0].startswith('!'):
+        return None
+    message = chat.ChatMessage.from_event(event)
+    if message.user_id == SELF_ID or message.command_name not in COMMANDS:
+        return None
+    message.is_mod()
+    return message
+
+
+def time_per_message(handle, events, rounds):
+    """Returns the best time over rounds in microseconds per message."""
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for event in events:
+            handle(event)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / len(events) * 1e6
+
+
+def bytes_per_message(handle, events):
+    """
+    Returns the traced bytes per message.
+
+    That is the mean peak allocated while handling each message, and the bytes
+    still held per message once every queued work item is kept.
+    """
+    peaks = 0
+    for event in events:
+        tracemalloc.start()
+        handle(event)
+        peaks += tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    tracemalloc.start()
+    kept = [handle(event) for event in events]
+    held = tracemalloc.get_traced_memory()[0]
+    del kept
+    held -= tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return peaks / len(events), held / len(events)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Compare the time and memory per message of scanning Twitch tags in loops '
+                    'with parsing them once into a ChatMessage.')
+    parser.add_argument('--messages', type=int, default=20000)
+    parser.add_argument('--rounds', type=int, default=15)
+    args = parser.parse_args(argv)
+    for name, share in (('commands', 1.0), ('plain chat', 0.0)):
+        events = make_events(args.messages, share)
+        for path, handle in (('tag loops', tag_loop), ('ChatMessage', chat_message)):
+            elapsed = time_per_message(handle, events, args.rounds)
+            peak, held = bytes_per_message(handle, events)
+            logger.info('%-10s %-11s %6.2f us  peak %5d B  held %5d B', name, path, elapsed,
+                        peak, held)
+
+
+if __name__ == '__main__':
+    logging.basicConfig()
+    logger.setLevel(logging.INFO)
+    main()
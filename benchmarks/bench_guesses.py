@@ -0,0 +1,91 @@
+"""This module provides a benchmark of the memory held by pending guesses."""
+import os
+import sys
+import logging
+import argparse
+import tracemalloc
+from datetime import datetime, timedelta
+from collections import OrderedDict
+
+import jstyleson
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from guesses import CodeTable, Guess  # pylint: disable=wrong-import-position
+from guessing_game import MEDAL_ORDER, SONG_ORDER  # pylint: disable=wrong-import-position
+
+KINDS = ['item', 'medal', 'song']
+DUNGEONS = ['deku', 'dodongo', 'jabu', 'forest', 'fire', 'water', 'shadow', 'spirit']
+
+logger = logging.getLogger(__name__)
+
+
+def dict_guess(kind, number, items):
+    """Returns a pending guess as the game held it before Guess records."""
+    now = datetime.now()
+    guess = OrderedDict()
+    if kind == 'medal':
+        for position, medal in enumerate(MEDAL_ORDER):
+            guess[medal] = DUNGEONS[(number + position) % len(DUNGEONS)]
+    elif kind == 'song':
+        for position, song in enumerate(SONG_ORDER):
+            guess[song] = SONG_ORDER[(number + position) % len(SONG_ORDER)]
+    guess['timestamp'] = now
+    guess['deadline'] = now + timedelta(minutes=15)
+    guess['user-id'] = str(100000 + number)
+    guess['username'] = 'user%06d' % number
+    if kind == 'item':
+        guess['guess'] = items[number % len(items)]
+    return guess
+
+
+def record_guess(kind, number, items, code_table):
+    """Returns a pending guess as the game holds it now."""
+    if kind == 'medal':
+        codes = code_table.encode('dungeon', [DUNGEONS[(number + position) % len(DUNGEONS)]
+                                              for position in range(len(MEDAL_ORDER))])
+    elif kind == 'song':
+        codes = code_table.encode('song', [SONG_ORDER[(number + position) % len(SONG_ORDER)]
+                                           for position in range(len(SONG_ORDER))])
+    else:
+        codes = code_table.encode('item', [items[number % len(items)]])
+    return Guess(100000 + number, 'user%06d' % number, 1000, 1900, codes)
+
+
+def measure(build, count):
+    """Returns the traced bytes per guess of a queue of count pending guesses."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    queue = OrderedDict()
+    for number in range(count):
+        guess = build(number)
+        user_id = guess.user_id if isinstance(guess, Guess) else guess['user-id']
+        queue[user_id] = guess
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used / count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Measure the memory held per pending guess, as dicts and as Guess records.')
+    parser.add_argument('--count', type=int, default=100000,
+                        help='How many guesses to hold in the pending queue')
+    parser.add_argument('--items', default=os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'items.json'))
+    args = parser.parse_args(argv)
+    with open(args.items) as file:
+        item_list = jstyleson.load(file)
+    items = [item['name'] for item in item_list]
+    code_table = CodeTable(item_list, DUNGEONS, SONG_ORDER)
+    for kind in KINDS:
+        old = measure(lambda number, kind=kind: dict_guess(kind, number, items), args.count)
+        new = measure(lambda number, kind=kind: record_guess(kind, number, items, code_table),
+                      args.count)
+        logger.info('%s guess: %d bytes as a dict, %d bytes as a Guess', kind, old, new)
+
+
+if __name__ == '__main__':
+    logging.basicConfig()
+    logger.setLevel(logging.INFO)
+    main()
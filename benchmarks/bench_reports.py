@@ -0,0 +1,87 @@
+"""This module provides a benchmark of the time and memory taken to write reports."""
+import os
+import sys
+import time
+import random
+import shutil
+import logging
+import argparse
+import tempfile
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import reports  # pylint: disable=wrong-import-position
+from storage.base import (  # pylint: disable=wrong-import-position
+    PARTICIPANT_FIELDS, STANDING_FIELDS, DELTA_FIELDS)
+from storage.sqlite import SQLiteStorage  # pylint: disable=wrong-import-position
+
+logger = logging.getLogger(__name__)
+
+
+def fill(storage, participants, seed=0):
+    """
+    The function to store participants and record two sessions of standings.
+
+    Returns:
+        Returns a tuple of the times of the earlier and the later standings.
+    """
+    generator = random.Random(seed)
+    sessions = []
+    for _ in range(2):
+        if sessions:
+            while datetime.utcnow().replace(microsecond=0) == sessions[-1]:
+                time.sleep(0.05)
+        for start in range(0, participants, 1000):
+            storage.import_users('participants', [
+                (user_id, 'user%07d' % user_id, generator.randint(0, 50),
+                 generator.randint(0, 5000))
+                for user_id in range(start + 1, min(start + 1000, participants) + 1)])
+        sessions.append(storage.record_standings())
+    return sessions
+
+
+def reports_of(storage, sessions, top):
+    """Returns (name, columns, function returning the rows) for each kind of report."""
+    previous, latest = sessions
+    return [
+        ('totals', PARTICIPANT_FIELDS, storage.stream_participants),
+        ('top %s' % top, PARTICIPANT_FIELDS,
+         lambda: storage.stream_participants('session_points', limit=top)),
+        ('standings', STANDING_FIELDS, lambda: storage.stream_standings(latest)),
+        ('deltas', DELTA_FIELDS, lambda: storage.stream_standings_deltas(previous, latest))
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Time writing each report in each format and trace its peak memory.')
+    parser.add_argument('--participants', type=int, default=100000)
+    parser.add_argument('--top', type=int, default=100)
+    args = parser.parse_args(argv)
+    directory = tempfile.mkdtemp(prefix='bench-reports-')
+    try:
+        storage = SQLiteStorage('1', 'benchmark', os.path.join(directory, 'benchmark.db'))
+        sessions = fill(storage, args.participants)
+        for name, columns, rows in reports_of(storage, sessions, args.top):
+            for file_format in sorted(reports.FORMATS):
+                path = os.path.join(directory, 'report' + reports.FORMATS[file_format])
+                # Tracing slows the writers down, so the time comes from a separate run
+                start = time.perf_counter()
+                count = reports.write_report(path, columns, rows(), file_format)
+                elapsed = time.perf_counter() - start
+                tracemalloc.start()
+                reports.write_report(path, columns, rows(), file_format)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                logger.info('%-10s %-8s %7d rows %6.2f s  peak %6d KiB', name, file_format,
+                            count, elapsed, peak // 1024)
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    logging.basicConfig()
+    logger.setLevel(logging.INFO)
+    main()
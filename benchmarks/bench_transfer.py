@@ -0,0 +1,109 @@
+"""This module provides a benchmark of bulk importing and exporting users with transfer.py."""
+import os
+import sys
+import csv
+import time
+import random
+import shutil
+import logging
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from transfer import COLUMNS  # pylint: disable=wrong-import-position
+
+CHANNEL_ID = '1'
+CHANNEL_NAME = 'benchmark'
+
+logger = logging.getLogger(__name__)
+
+
+def write_users(path, rows, seed=0):
+    """
+    The function to write a CSV file of users to import.
+
+    Participants make up 98% of the rows and the rest are split between the
+    whitelist and blacklist, which is about the mix of a large channel.
+    """
+    generator = random.Random(seed)
+    with open(path, 'w', newline='') as file:
+        writer = csv.DictWriter(file, COLUMNS)
+        writer.writeheader()
+        for number in range(rows):
+            user_id = 100000 + number
+            kind = 'participants'
+            if number % 100 == 98:
+                kind = 'whitelist'
+            elif number % 100 == 99:
+                kind = 'blacklist'
+            row = {"kind": kind, "user_id": user_id, "username": 'user%07d' % number}
+            if kind == 'participants':
+                total = generator.randint(0, 5000)
+                row.update(session_points=generator.randint(0, min(total, 50)),
+                           total_points=total)
+            writer.writerow(row)
+
+
+def run(args, environment):
+    """
+    The function to run transfer.py in a child process.
+
+    Returns:
+        Returns a tuple of the seconds it took and its peak resident set size in MB.
+    """
+    start = time.monotonic()
+    process = subprocess.Popen([sys.executable, os.path.join(ROOT, 'transfer.py')] + args
+                               + ['--channel-id', CHANNEL_ID, '--progress', '0'],
+                               env=environment)
+    _, status, usage = os.wait4(process.pid, 0)
+    elapsed = time.monotonic() - start
+    if status:
+        raise RuntimeError('transfer.py %s failed' % ' '.join(args))
+    # ru_maxrss is in kilobytes on Linux
+    return elapsed, usage.ru_maxrss / 1024.0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Time importing and exporting users with transfer.py and measure the '
+                    'peak memory of each step.')
+    parser.add_argument('--rows', type=int, default=1000000,
+                        help='How many users to import and export')
+    parser.add_argument('--backend', choices=['sqlite', 'mongo'], default='sqlite',
+                        help='The storage backend. Mongo uses MONGODB_URI and keeps every user '
+                             'in one document, so it is limited to about 150k rows')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--directory', help='Where to write the files, a temporary directory '
+                                            'if not given')
+    args = parser.parse_args(argv)
+    directory = args.directory or tempfile.mkdtemp(prefix='bench-transfer-')
+    environment = dict(os.environ, STORAGE_BACKEND=args.backend, TWITCH_CHANNEL=CHANNEL_NAME,
+                       SQLITE_PATH=os.path.join(directory, 'benchmark.db'))
+    users = os.path.join(directory, 'users.csv')
+    write_users(users, args.rows)
+    batch = ['--batch-size', str(args.batch_size)]
+    steps = [
+        ('dry run', ['import', users, '--dry-run'] + batch),
+        ('import csv', ['import', users] + batch),
+        ('export csv', ['export', os.path.join(directory, 'export.csv')] + batch),
+        ('export jsonl', ['export', os.path.join(directory, 'export.jsonl')] + batch),
+        ('import jsonl --add', ['import', os.path.join(directory, 'export.jsonl'), '--add']
+         + batch),
+    ]
+    try:
+        for name, step in steps:
+            elapsed, peak = run(step, environment)
+            logger.info('%-20s %7.1f s  %8d rows/s  peak RSS %5.1f MB', name, elapsed,
+                        args.rows / elapsed, peak)
+    finally:
+        if not args.directory:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    logging.basicConfig()
+    logger.setLevel(logging.INFO)
+    main()
@@ -1,16 +1,35 @@
 import sys
 import os
 import logging
+import signal
 
 import irc.bot
-import requests
-import mongoengine as mongodb
+import irc.client
 
-from database.streamer import Streamer
-import customCommands
+import storage
 import defaultCommands
 import whitelistCommands
 import guessing_game
+import rate_limit
+import profiler
+import workers
+import helix
+import archive
+import chat
+import reconnect
+
+class SynchronizedConnection():
+    """Sends chat messages for worker threads while holding the reactor's lock."""
+    def __init__(self, bot):
+        self.bot = bot
+
+    def privmsg(self, target, text):
+        with self.bot.reactor.mutex:
+            try:
+                self.bot.connection.privmsg(target, text)
+            except irc.client.ServerNotConnectedError:
+                self.bot.logger.warning('Not connected, dropped message: %s', text)
+
 
 class TwitchBot(irc.bot.SingleServerIRCBot):
     def __init__(self, debug):
@@ -23,13 +42,31 @@ class TwitchBot(irc.bot.SingleServerIRCBot):
         self.channel = '#%s' % self.channel_name
 
         self.get_default_commands()
+        self.rate_limiter = rate_limit.RateLimiter()
+        self.init_profiler()
+        self.dispatcher = workers.CommandDispatcher(
+            int(os.environ.get('COMMAND_WORKERS', 4)), int(os.environ.get('COMMAND_QUEUE', 1000)))
+        self.sender = SynchronizedConnection(self)
+        self.helix = helix.HelixClient(self.client_id)
         self.get_channel_id()
         self.get_self_id()
+        self.gaps = reconnect.GapLog()
+        self.use_standby = os.environ.get('IRC_STANDBY', '1') == '1'
+        self.standby = None
+        self.standby_ready = False
+        self.retiring = None
+        self.recent_ids = reconnect.RecentIds()
         self.irc_connect()
-        self.database_connect()
-        self.get_streamer_from_database()
-        self.guessing_game = guessing_game.GuessingGame(self.streamer)
+        self.storage_connect()
+        self.get_custom_commands()
+        self.guessing_game = guessing_game.GuessingGame(self.storage)
         self.commands += self.guessing_game.commands
+        self.archiver = archive.SessionArchiver(
+            self.storage, archive.open_store(),
+            float(os.environ.get('ARCHIVE_AFTER_DAYS', 30)),
+            os.environ.get('ARCHIVE_COMPRESSION', 'gzip'),
+            int(os.environ.get('ARCHIVE_BATCH', 50)))
+        self.schedule_tasks()
 
     # Methods
     def init_logging(self, debug):
@@ -40,26 +77,24 @@ class TwitchBot(irc.bot.SingleServerIRCBot):
         else:
             self.logger.setLevel(logging.INFO)
 
+    def init_profiler(self):
+        self.profiler = profiler.SamplingProfiler()
+        if hasattr(signal, 'SIGUSR1'):
+            signal.signal(signal.SIGUSR1, self.on_profile_signal)
+
     def get_default_commands(self):
         self.default_commands = ['!addcom', '!delcom', '!editcom', '!hud']
         self.whitelist_commands = [
             '!hud add', '!hud remove', '!hud ban', '!hud unban'
             ]
-        self.commands = self.default_commands[:]
+        self.bot_commands = ['!profile', '!queue', '!archive', '!gaps']
+        self.commands = self.default_commands[:] + self.bot_commands
+        self.high_priority_commands = ['!guess', '!hud', '!song', '!start', '!finish']
+        self.read_only_commands = ['!points', '!stats', '!archive', '!gaps']
         self.logger.debug(self.commands)
 
     def get_user_id(self, username):
-        url = 'https://api.twitch.tv/helix/users?login=%s' % username
-        headers = {'Client-ID': self.client_id}
-        r = requests.get(url, headers=headers).json()
-
-        try:
-            user_id = r['data'][0]['id']
-        except IndexError:
-            self.logger.error('User not found by Twitch API')
-            return None
-        self.logger.debug('Found user ID %s', user_id)
-        return user_id
+        return self.helix.get_user_id(username)
 
     def get_channel_id(self):
         self.channel_id = self.get_user_id(self.channel_name)
@@ -70,67 +105,167 @@ class TwitchBot(irc.bot.SingleServerIRCBot):
         self.logger.debug('Self ID is %s', self.id)
 
     def irc_connect(self):
-        server = 'irc.chat.twitch.tv'
-        port = 6667
+        server = os.environ.get('IRC_SERVER', 'irc.chat.twitch.tv')
+        port = int(os.environ.get('IRC_PORT', 6667))
         self.logger.info('Connecting to %s on port %s...', server, port)
+        self.server = (server, port, self.token)
+        recon = reconnect.TwitchReconnect(float(os.environ.get('RECONNECT_FIRST', 0.5)),
+                                          float(os.environ.get('RECONNECT_MAX', 30)))
         irc.bot.SingleServerIRCBot.__init__(
-            self, [(server, port, self.token)], self.username, self.username)
+            self, [self.server], self.username, self.username, recon=recon)
         self.logger.info('Connecting to database...')
 
-    def database_connect(self):
-        try:
-            mongodb_uri = os.environ['MONGODB_URI']
-            mongodb.connect(host=mongodb_uri)
-            self.logger.debug('Connected to database.')
-        except mongodb.connection.MongoEngineConnectionError as e:
-            self.logger.error('Unable to connect to database!')
-            self.logger.error(e)
-            raise e
-
-    def get_streamer_from_database(self):
-        for streamer in Streamer.objects(channel_id=self.channel_id): #pylint: disable=no-member
-            self.streamer = streamer
-
-        if not hasattr(self, 'streamer'):
-            self.logger.debug(
-                'Unable to find streamer with ID %s in the database', self.channel_id)
-            self.logger.debug('Creating new entry for streamer with ID %s', self.channel_id)
-            self.streamer = Streamer(name = self.channel_name, channel_id = self.channel_id)
-            self.streamer.save()
-
-        for command in self.streamer.commands:
-            self.commands += [command.name]
+    def storage_connect(self):
+        self.storage = storage.connect(self.channel_id, self.channel_name)
+        self.storage.watch(float(os.environ.get('SETTINGS_POLL', 1)))
+
+    def get_custom_commands(self):
+        for name, _ in self.storage.list_commands():
+            self.commands += [name]
         self.logger.debug(self.commands)
 
-    def get_user_permissions(self, event):
-        mod = False
-        whitelist = False
-        blacklist = False
-
-        user_string = event.source.split('!')
-        for tag in event.tags:
-            if tag['key'] == 'user-id':
-                if tag['value'] == self.channel_id:
-                    mod = True
-                if Streamer.objects.filter( #pylint: disable=no-member
-                    channel_id=self.streamer.channel_id,
-                    whitelist__user_id=tag['value']):
-                        whitelist = True
-                if Streamer.objects.filter( #pylint: disable=no-member
-                    channel_id=self.streamer.channel_id,
-                    blacklist__user_id=tag['value']):
-                        blacklist = True
-            if tag['key'] == 'mod':
-                if tag['value'] == '1':
-                    mod = True
+    def schedule_tasks(self):
+        # Periodic tasks share the channel's lane with chat commands, so a run
+        # that has not started or finished yet is not queued again
+        self.reactor.scheduler.execute_every(
+            self.guessing_game.snapshot.interval,
+            lambda: self.submit_task(self.channel, self.guessing_game.checkpoint))
+        self.reactor.scheduler.execute_every(1, self.flush_deferred_commands)
+        self.reactor.scheduler.execute_every(
+            1, lambda: self.submit_task(self.channel, self.expire_guesses))
+        self.reactor.scheduler.execute_every(
+            1, lambda: self.submit_task(self.channel, self.guessing_game.publish_live))
+        self.reactor.scheduler.execute_every(
+            float(os.environ.get('POINTS_FLUSH_INTERVAL', 5)),
+            lambda: self.submit_task(self.channel, self.guessing_game.flush_points))
+        self.reactor.scheduler.execute_every(
+            int(os.environ.get('ARCHIVE_INTERVAL', 3600)),
+            lambda: self.submit_task('archive', self.archiver.run))
+
+    def submit_task(self, key, function):
+        if not self.dispatcher.submit(key, function, coalesce=True):
+            self.logger.warning('Task %s shed by full work queue', function.__name__)
+
+    def expire_guesses(self):
+        # Guesses cannot be seen or replaced while chat is unreachable, the
+        # gap is added to their deadlines once the bot is back
+        if self.gaps.in_gap():
+            return
+        message = self.guessing_game.expire_guesses()
+        if message:
+            self.sender.privmsg(self.channel, message)
+
+    def connect_server(self):
+        server, port, password = self.server
+        connection = self.reactor.server()
+        try:
+            connection.connect(server, port, self.username, password, ircname=self.username)
+        except irc.client.ServerConnectionError:
+            connection.close()
+            raise
+        return connection
+
+    def reconnect(self):
+        if self.promote_standby():
+            return
+        old = self.connection
+        try:
+            self.connection = self.connect_server()
+        except irc.client.ServerConnectionError as e:
+            self.logger.warning('Reconnect failed: %s', e)
+            self.recon.run(self)
+            return
+        self.retire(old)
+
+    def retire(self, connection):
+        # A connection Twitch asked to leave still delivers chat, keep reading
+        # it until the new connection has joined
+        self.close_retiring()
+        if connection.is_connected():
+            self.retiring = connection
+        else:
+            connection.close()
+
+    def close_retiring(self):
+        retiring, self.retiring = self.retiring, None
+        if retiring is not None:
+            retiring.close()
+
+    def open_standby(self):
+        if not self.use_standby or self.standby is not None or self.gaps.in_gap():
+            return
+        self.standby_ready = False
+        try:
+            self.standby = self.connect_server()
+        except irc.client.ServerConnectionError as e:
+            self.logger.warning('Could not open standby connection: %s', e)
+            self.reactor.scheduler.execute_after(
+                float(os.environ.get('STANDBY_RETRY', 30)), self.open_standby)
+
+    def promote_standby(self):
+        standby = self.standby
+        if standby is None or not self.standby_ready or not standby.is_connected():
+            return False
+        self.logger.info('Promoting standby connection')
+        self.retire(self.connection)
+        self.standby = None
+        self.connection = standby
+        standby.join(self.channel)
+        return True
+
+    def is_command(self, command_name):
+        if command_name in self.commands:
+            return True
+        # Custom commands added by another process are found in the storage's
+        # cache, so spam of unknown !words costs no reads on the reactor thread
+        return (command_name.startswith('!')
+                and self.storage.get_command(command_name) is not None)
+
+    def is_read_only(self, command_name):
+        if command_name in self.read_only_commands:
+            return True
+        return (command_name not in self.guessing_game.commands
+                and command_name not in self.default_commands
+                and command_name not in self.bot_commands)
+
+    def submit_command(self, message):
+        key = None if self.is_read_only(message.command_name) else self.channel
+        if not self.dispatcher.submit(key, self.do_command, message):
+            self.logger.warning('Command %s shed by full work queue', message.command_name)
+
+    def is_mod(self, message):
+        return message.is_mod() or message.user_id == self.channel_id
+
+    def admit_command(self, message):
+        if self.is_mod(message):
+            return True
+        low_priority = message.command_name not in self.high_priority_commands
+        verdict = self.rate_limiter.admit(message.user_id, message.command_name, low_priority)
+        if verdict == rate_limit.DEFER:
+            self.rate_limiter.defer(message.user_id, message.command_name, message)
+        if verdict != rate_limit.ACCEPT:
+            self.logger.debug('Command %s from user %s %s', message.command_name,
+                              message.user_id,
+                              'deferred' if verdict == rate_limit.DEFER else 'dropped')
+            return False
+        return True
+
+    def flush_deferred_commands(self):
+        for message in self.rate_limiter.flush():
+            self.submit_command(message)
+
+    def get_user_permissions(self, message):
+        user_id = message.user_id
         permissions = {
-            "mod": mod,
-            "whitelist": whitelist,
-            "blacklist": blacklist
+            "mod": self.is_mod(message),
+            "whitelist": (user_id is not None
+                          and self.storage.in_user_list('whitelist', user_id)),
+            "blacklist": (user_id is not None
+                          and self.storage.in_user_list('blacklist', user_id))
         }
         user = {
-            "username": user_string[0],
-            "user-id": self.get_user_id(user_string[0]),
+            "username": message.username,
+            "user-id": user_id or self.get_user_id(message.username),
             "channel-id": self.channel_id
         }
         self.logger.debug("User: %s, Permissions{ Mod: %s, Whitelist: %s, Blacklist: %s}",
@@ -140,54 +275,142 @@ class TwitchBot(irc.bot.SingleServerIRCBot):
                            permissions['blacklist'])
         return user, permissions
 
-    def do_command(self, event, command):
-        connection = self.connection
-        command_name = command[0].lower()
-        user, permissions = self.get_user_permissions(event)
+    def start_profiler(self, command):
+        try:
+            duration = int(command[1])
+        except (IndexError, ValueError):
+            duration = int(os.environ.get('PROFILE_SECONDS', 30))
+        if self.profiler.start(duration):
+            return 'Profiling for %s seconds' % min(duration, profiler.MAX_DURATION)
+        return 'Profiler already running'
+
+    def queue_stats(self):
+        stats = self.dispatcher.stats()
+        ledger = self.guessing_game.ledger
+        return ('Queue depth %s in %s lanes, wait avg %.1f ms max %.1f ms, %s rejected, '
+                '%s coalesced, points flush lag %.1f s (last %.1f s)'
+                % (stats['depth'], stats['lanes'], stats['wait-average'] * 1000,
+                   stats['wait-max'] * 1000, stats['rejected'], stats['coalesced'],
+                   ledger.lag(), ledger.metrics['flush-lag']))
 
-        if len(command) > 1:
-            sub_command = command[1].lower()
-            if (' '.join([command_name, sub_command]) in self.whitelist_commands
-                    and user['user-id'] == self.streamer.channel_id):
+    def do_command(self, message):
+        self.profiler.tag(message.command_name)
+        try:
+            self.run_command(message)
+        finally:
+            self.profiler.tag(None)
+
+    def run_command(self, chat_message):
+        connection = self.sender
+        command = chat_message.command
+        command_name = chat_message.command_name
+        user, permissions = self.get_user_permissions(chat_message)
+
+        if chat_message.sub_command is not None:
+            if (' '.join([command_name, chat_message.sub_command]) in self.whitelist_commands
+                    and user['user-id'] == self.storage.channel_id):
                 whitelistCommands.do_whitelist_command(self, connection, command)
                 return
         if command_name in self.guessing_game.commands:
-            message = self.guessing_game.do_command(user, permissions, command)
+            message = self.guessing_game.do_command(user, permissions, chat_message)
             if message:
-                self.connection.privmsg(self.channel, message)
+                connection.privmsg(self.channel, message)
+            return
+        if command_name == '!profile' and permissions['mod']:
+            connection.privmsg(self.channel, self.start_profiler(command))
+            return
+        if command_name == '!queue' and permissions['mod']:
+            connection.privmsg(self.channel, self.queue_stats())
+            return
+        if command_name == '!archive' and permissions['mod']:
+            connection.privmsg(self.channel, self.archiver.describe())
+            return
+        if command_name == '!gaps' and permissions['mod']:
+            connection.privmsg(self.channel, self.gaps.describe())
             return
         if command_name in self.default_commands and permissions['mod']:
             defaultCommands.do_default_command(self, connection, command)
             return
         self.logger.debug('Built-in command not found')
-        try:
-            streamer = Streamer.objects.get( #pylint: disable=no-member
-                channel_id = self.streamer.channel_id, commands__name = command_name)
-            for custom_command in streamer.commands:
-                if command_name == custom_command['name']:
-                    self.logger.info('Custom command %s received', custom_command.name)
-                    connection.privmsg(self.channel, custom_command.output)
-        except Streamer.DoesNotExist: #pylint: disable=no-member
+        output = self.storage.get_command(command_name)
+        if output is None:
             self.logger.error(
                 'Custom command %s not found in database but is in command list', command_name)
+            return
+        self.logger.info('Custom command %s received', command_name)
+        connection.privmsg(self.channel, output)
 
     # Events
+    def on_profile_signal(self, signum, frame):
+        self.start_profiler([])
+
     def on_welcome(self, connection, event):
-        self.logger.info('Joining %s', self.channel)
         self.logger.debug(event)
 
         connection.cap('REQ', ':twitch.tv/membership')
         connection.cap('REQ', ':twitch.tv/tags')
         connection.cap('REQ', ':twitch.tv/commands')
+        if connection is self.standby:
+            self.logger.info('Standby connection ready')
+            self.standby_ready = True
+            return
+        self.logger.info('Joining %s', self.channel)
         connection.join(self.channel)
 
+    def on_join(self, connection, event):
+        if connection is not self.connection or event.source.nick != self.username:
+            return
+        self.recon.reset()
+        self.close_retiring()
+        gap = self.gaps.end()
+        if gap is not None:
+            self.logger.warning('Rejoined %s after a %.2f second gap', self.channel, gap)
+            self.dispatcher.submit(self.channel, self.guessing_game.extend_guesses, gap)
+        self.open_standby()
+
+    def on_reconnect(self, connection, event):
+        if connection is self.standby:
+            self.logger.info('Standby connection asked to reconnect')
+            self.standby = None
+            connection.close()
+            self.open_standby()
+            return
+        self.logger.info('Twitch asked to reconnect')
+        self.gaps.start()
+        self.reconnect()
+
+    def _on_disconnect(self, connection, event):
+        if connection is self.standby:
+            self.logger.info('Standby connection lost')
+            self.standby = None
+            self.reactor.scheduler.execute_after(
+                float(os.environ.get('STANDBY_RETRY', 30)), self.open_standby)
+            return
+        if connection is self.retiring:
+            self.retiring = None
+            connection.close()
+            return
+        if connection is not self.connection:
+            return
+        self.logger.warning('Disconnected from chat')
+        self.channels.clear()
+        self.gaps.start()
+        if not self.promote_standby():
+            self.recon.run(self)
+
     def on_pubmsg(self, connection, event):
         self.logger.debug(event)
-        for tag in event.tags:
-            if tag['key'] == 'user-id':
-                if tag['value'] == self.id:
-                    self.logger.info('Ignoring message from self')
-                    return
-        command = event.arguments[0].split(' ')
-        if command[0].lower() in self.commands:
-            self.do_command(event, command)
+        if connection is not self.connection and connection is not self.retiring:
+            return
+        # Every command starts with !, so other chat is not worth parsing
+        if not event.arguments[0].startswith('!'):
+            return
+        message = chat.ChatMessage.from_event(event)
+        message_id = message.tags.get('id')
+        if message_id is not None and not self.recent_ids.add(message_id):
+            return
+        if message.user_id == self.id:
+            self.logger.info('Ignoring message from self')
+            return
+        if self.is_command(message.command_name) and self.admit_command(message):
+            self.submit_command(message)
@@ -0,0 +1,78 @@
+"""This module provides parsing of Twitch chat messages."""
+
+MOD = 1
+BROADCASTER = 2
+VIP = 4
+SUBSCRIBER = 8
+
+BADGE_FLAGS = {
+    "moderator": MOD,
+    "broadcaster": BROADCASTER,
+    "vip": VIP,
+    "subscriber": SUBSCRIBER,
+    "founder": SUBSCRIBER
+}
+
+
+def parse_badges(value):
+    """Returns a dictionary of badge names to versions from a badges tag."""
+    badges = {}
+    if value:
+        for badge in value.split(','):
+            name, _, version = badge.partition('/')
+            badges[name] = version
+    return badges
+
+
+class ChatMessage():
+    """
+    This is a class for a chat message and the IRCv3 tags Twitch sent with it.
+
+    Each message is parsed once when it arrives. The tags are kept as a
+    dictionary, the sender's roles are gathered into a bitmask of the flags in
+    this module, and the text is split into the command and its arguments with
+    the command name lowercased, so the checks made for every message do not
+    each scan the tags or split the text again.
+    """
+    __slots__ = ['tags', 'badges', 'user_id', 'username', 'flags', 'text', 'command',
+                 'command_name', 'sub_command']
+
+    def __init__(self, tags, username, text):
+        """
+        The constructor for ChatMessage class.
+
+        Parameters:
+            tags (dict): The message's tags as a dictionary of keys to values
+            username (string): The sender's login name
+            text (string): The message text
+        """
+        self.tags = tags
+        self.badges = parse_badges(tags.get('badges'))
+        self.user_id = tags.get('user-id')
+        self.username = username
+        flags = 0
+        for badge in self.badges:
+            flags |= BADGE_FLAGS.get(badge, 0)
+        if tags.get('mod') == '1':
+            flags |= MOD
+        if tags.get('subscriber') == '1':
+            flags |= SUBSCRIBER
+        self.flags = flags
+        self.text = text
+        self.command = text.split(' ')
+        self.command_name = self.command[0].lower()
+        self.sub_command = self.command[1].lower() if len(self.command) > 1 else None
+
+    @classmethod
+    def from_event(cls, event):
+        """Returns the message of an IRC pubmsg event."""
+        return cls({tag['key']: tag['value'] for tag in event.tags or ()},
+                   event.source.split('!', 1)[0], event.arguments[0])
+
+    def has(self, flags):
+        """Returns whether the sender has any of the given flags."""
+        return bool(self.flags & flags)
+
+    def is_mod(self):
+        """Returns whether the sender is a moderator or the broadcaster."""
+        return bool(self.flags & (MOD | BROADCASTER))
@@ -0,0 +1,54 @@
+"""This module provides the clocks the guessing game reads the time from."""
+import time
+from datetime import datetime, timedelta
+
+
+class Clock():
+    """This is a class for reading the system's wall clock and monotonic clock."""
+    def now(self):
+        """Returns the current local date and time."""
+        return datetime.now()
+
+    def time(self):
+        """Returns the current wall clock time in seconds since the epoch."""
+        return time.time()
+
+    def monotonic(self):
+        """Returns the time in seconds of a clock that never goes backwards."""
+        return time.monotonic()
+
+
+class SimulatedClock(Clock):
+    """
+    This is a class for a clock that only moves when it is advanced.
+
+    A game given a simulated clock sees time pass as fast as the clock is
+    advanced, so hours of play can be run in minutes with guesses expiring,
+    snapshots falling due and timestamps being written as they would live.
+    """
+    def __init__(self, start=None):
+        """
+        The constructor for SimulatedClock class.
+
+        Parameters:
+            start (datetime): The local date and time the clock starts at, now if None
+        """
+        self.start = start or datetime.now()
+        self.epoch = time.mktime(self.start.timetuple()) + self.start.microsecond / 1e6
+        self.elapsed = 0.0
+
+    def advance(self, seconds):
+        """The function to move the clock forward."""
+        self.elapsed += seconds
+
+    def now(self):
+        return self.start + timedelta(seconds=self.elapsed)
+
+    def time(self):
+        return self.epoch + self.elapsed
+
+    def monotonic(self):
+        return self.elapsed
+
+
+SYSTEM = Clock()
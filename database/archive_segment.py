@@ -0,0 +1,17 @@
+import mongoengine as mongodb
+
+
+class ArchiveSegment(mongodb.Document):
+    channel_id = mongodb.StringField(required=True)
+    name = mongodb.StringField(required=True, unique=True)
+    compression = mongodb.StringField(required=True)
+    sessions = mongodb.IntField(required=True)
+    first = mongodb.DateTimeField(required=True)
+    last = mongodb.DateTimeField(required=True)
+    size = mongodb.IntField()
+    created = mongodb.DateTimeField(required=True)
+    meta = {
+        'indexes': [
+            ('channel_id', 'last')
+        ]
+    }
@@ -0,0 +1,6 @@
+import mongoengine as mongodb
+
+
+class CodeTableVersion(mongodb.Document):
+    version = mongodb.IntField(required=True, unique=True)
+    names = mongodb.DictField()
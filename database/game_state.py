@@ -0,0 +1,8 @@
+import mongoengine as mongodb
+
+
+class GameState(mongodb.Document):
+    channel_id = mongodb.StringField(required=True, unique=True)
+    snapshot = mongodb.BinaryField()
+    deltas = mongodb.ListField(mongodb.BinaryField())
+    updated = mongodb.DateTimeField()
@@ -0,0 +1,13 @@
+import mongoengine as mongodb
+
+
+class LiveState(mongodb.Document):
+    channel_id = mongodb.StringField(required=True)
+    name = mongodb.StringField(required=True)
+    data = mongodb.DictField()
+    updated = mongodb.DateTimeField()
+    meta = {
+        'indexes': [
+            {'fields': ['channel_id', 'name'], 'unique': True}
+        ]
+    }
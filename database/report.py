@@ -0,0 +1,19 @@
+import mongoengine as mongodb
+
+
+class Report(mongodb.Document):
+    channel_id = mongodb.StringField(required=True)
+    channel_name = mongodb.StringField(required=True)
+    report_type = mongodb.StringField(required=True)
+    key = mongodb.StringField(required=True, unique=True)
+    url = mongodb.StringField(required=True)
+    size = mongodb.IntField()
+    created = mongodb.DateTimeField(required=True)
+    meta = {
+        'indexes': [
+            '-created',
+            ('channel_name', '-created'),
+            ('report_type', '-created'),
+            ('channel_name', 'report_type', '-created')
+        ]
+    }
@@ -2,10 +2,12 @@ import mongoengine as mongodb
 import datetime
 
 class SessionLogEntry(mongodb.EmbeddedDocument):
-    timestamp = mongodb.DateTimeField(required=True, default=datetime.datetime.now())
+    timestamp = mongodb.DateTimeField(required=True, default=datetime.datetime.now)
     participant = mongodb.IntField(required=True)
     participant_name = mongodb.StringField(required=True)
     guess_type = mongodb.StringField(required=True, default='No Type')
-    guess = mongodb.StringField(required=True)
+    guess = mongodb.StringField()
+    codes = mongodb.ListField(mongodb.IntField(), default=None)
+    code_version = mongodb.IntField()
     session_points = mongodb.IntField(required=True)
     total_points = mongodb.IntField(required=True)
@@ -0,0 +1,16 @@
+import mongoengine as mongodb
+
+
+class SessionStanding(mongodb.Document):
+    channel_id = mongodb.StringField(required=True)
+    session = mongodb.DateTimeField(required=True)
+    user_id = mongodb.IntField(required=True)
+    username = mongodb.StringField(required=True)
+    points = mongodb.IntField(default=0)
+    total_points = mongodb.IntField(default=0)
+    meta = {
+        'indexes': [
+            ('channel_id', '-session', '-points'),
+            ('channel_id', 'session', 'user_id')
+        ]
+    }
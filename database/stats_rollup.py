@@ -0,0 +1,18 @@
+import mongoengine as mongodb
+
+
+class StatsRollup(mongodb.Document):
+    channel_id = mongodb.StringField(required=True)
+    kind = mongodb.StringField(required=True)
+    key = mongodb.StringField(required=True)
+    name = mongodb.StringField(required=True)
+    guesses = mongodb.IntField(default=0)
+    hits = mongodb.IntField(default=0)
+    first = mongodb.IntField(default=0)
+    meta = {
+        'indexes': [
+            {'fields': ['channel_id', 'kind', 'key'], 'unique': True},
+            ('channel_id', 'kind', 'name'),
+            ('channel_id', 'kind', '-guesses')
+        ]
+    }
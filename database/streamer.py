@@ -10,6 +10,10 @@ class Streamer(mongodb.Document):
     channel_id = mongodb.StringField(required=True, unique=True)
     first_bonus = mongodb.IntField(default=1)
     points = mongodb.IntField(default=1)
+    guess_expiry = mongodb.IntField(default=15)
+    expiry_notice = mongodb.BooleanField(default=False)
+    version = mongodb.IntField(default=0)
+    ledger_sequence = mongodb.IntField(default=0)
     commands = mongodb.ListField(mongodb.EmbeddedDocumentField(Command))
     participants = mongodb.ListField(mongodb.EmbeddedDocumentField(Participant))
     whitelist = mongodb.ListField(mongodb.EmbeddedDocumentField(WhitelistUser))
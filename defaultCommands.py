@@ -22,7 +22,7 @@ def do_default_command(twitch_bot, connection, command):
         # New command is valid
         elif len(command) > 2:
             message = 'Added custom command %s' % custom_command_name
-            customCommands.add_command(twitch_bot.streamer, custom_command_name, command[2:])
+            customCommands.add_command(twitch_bot.storage, custom_command_name, command[2:])
             twitch_bot.commands += [custom_command_name]
             twitch_bot.logger.info(message + ' with output %s' % ' '.join(command[2:]))
             connection.privmsg(twitch_bot.channel, message)
@@ -52,7 +52,7 @@ def do_default_command(twitch_bot, connection, command):
         # Delete given command
         else:
             message = 'Removed custom command %s' % custom_command_name
-            customCommands.remove_command(twitch_bot.streamer, custom_command_name)
+            customCommands.remove_command(twitch_bot.storage, custom_command_name)
             twitch_bot.commands.remove(custom_command_name)
             twitch_bot.logger.info(message)
             connection.privmsg(twitch_bot.channel, message)
@@ -78,7 +78,7 @@ def do_default_command(twitch_bot, connection, command):
         # Edited command is valid
         elif len(command) > 2:
             message = 'Edited custom command %s' % custom_command_name
-            customCommands.edit_command(twitch_bot.streamer, custom_command_name, command[2:])
+            customCommands.edit_command(twitch_bot.storage, custom_command_name, command[2:])
             twitch_bot.logger.info(message)
             connection.privmsg(twitch_bot.channel, message)
             twitch_bot.logger.debug(twitch_bot.commands)
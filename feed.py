@@ -0,0 +1,96 @@
+"""This module provides a relay from the live change feed to web clients."""
+import logging
+import threading
+import time
+
+
+def server_sent_event(event_id, name, text):
+    """Returns text formatted as a server-sent event."""
+    lines = ['id: %s' % event_id, 'event: %s' % name]
+    lines += ['data: %s' % line for line in text.splitlines()]
+    return '\n'.join(lines) + '\n\n'
+
+
+class FeedRelay():
+    """
+    This is a class for sharing the live change feed between web clients.
+
+    A single daemon thread follows the feed and renders each event once. Clients
+    then wait on the relay for the latest rendering of their channel, so the
+    number of clients watching has no effect on the number of database reads
+    or renders.
+    """
+    def __init__(self, follow, render, retry=5):
+        """
+        The constructor for FeedRelay class.
+
+        Parameters:
+            follow (callable): Called with the last position seen, or None, to get a
+                generator of (position, channel_name, name, data) events
+            render (callable): Called with a channel name, event name and event data
+                to get the HTML to show for it
+            retry (float): How many seconds to wait before following the feed again
+                after an error
+        """
+        self.logger = logging.getLogger(__name__)
+        self.follow = follow
+        self.render = render
+        self.retry = retry
+        self.condition = threading.Condition()
+        self.latest = {}
+        self.version = 0
+        self.thread = None
+
+    def start(self):
+        """The function to start following the feed if it is not already."""
+        with self.condition:
+            if self.thread is not None:
+                return
+            self.thread = threading.Thread(target=self._run, name='feed-relay', daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        position = None
+        while True:
+            try:
+                for position, channel_name, name, data in self.follow(position):
+                    html = self.render(channel_name, name, data)
+                    with self.condition:
+                        self.version += 1
+                        self.latest[channel_name] = (
+                            self.version, html, server_sent_event(self.version, name, html))
+                        self.condition.notify_all()
+            except Exception: #pylint: disable=broad-except
+                self.logger.exception('Lost the live feed, following again in %s seconds',
+                                      self.retry)
+                time.sleep(self.retry)
+
+    def current(self, channel_name):
+        """Returns the latest HTML rendered for a channel or None."""
+        with self.condition:
+            latest = self.latest.get(channel_name)
+        return latest[1] if latest else None
+
+    def wait(self, channel_name, version, timeout):
+        """
+        The function to wait for a channel to change.
+
+        Parameters:
+            channel_name (string): The channel to wait for
+            version (int): The version the client already has, or None
+            timeout (float): The most seconds to wait
+
+        Returns:
+            Returns a tuple of the newest version and its server-sent event, or the
+            version passed in and None if nothing changed before the timeout.
+        """
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            while True:
+                latest = self.latest.get(channel_name)
+                if latest is not None and latest[0] != version:
+                    return latest[0], latest[2]
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return version, None
+                self.condition.wait(remaining)
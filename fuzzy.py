@@ -0,0 +1,142 @@
+"""This module provides typo tolerant lookups of guess codes and names."""
+from functools import lru_cache
+
+
+def normalize(text):
+    """Returns text lowercased with everything but letters and digits removed."""
+    return ''.join(character for character in text.lower() if character.isalnum())
+
+
+def max_distance_for(length):
+    """Returns how many typos a guess of a given length may contain."""
+    if length <= 3:
+        return 0
+    if length <= 5:
+        return 1
+    return 2
+
+
+def deletes(word, distance):
+    """Returns the set of strings made by deleting up to distance characters from word."""
+    variants = {word}
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {variant[:i] + variant[i + 1:]
+                    for variant in frontier for i in range(len(variant))}
+        variants |= frontier
+    return variants
+
+
+def edit_distance(first, second, limit):
+    """
+    The function to find the edit distance between two strings.
+
+    Insertions, deletions, substitutions and swaps of adjacent characters each
+    count as one edit. Typos are usually local, so the common prefix and suffix
+    are skipped before filling in the table.
+
+    Returns:
+        Returns the distance, or limit + 1 if it is greater than limit.
+    """
+    if abs(len(first) - len(second)) > limit:
+        return limit + 1
+    start = 0
+    while start < len(first) and start < len(second) and first[start] == second[start]:
+        start += 1
+    end = 0
+    while (end < len(first) - start and end < len(second) - start
+           and first[-1 - end] == second[-1 - end]):
+        end += 1
+    first = first[start:len(first) - end]
+    second = second[start:len(second) - end]
+    if not first or not second:
+        return len(first) + len(second)
+    previous_row = None
+    row = list(range(len(second) + 1))
+    for i in range(1, len(first) + 1):
+        before, previous_row, row = previous_row, row, [i] + [0] * len(second)
+        for j in range(1, len(second) + 1):
+            cost = 0 if first[i - 1] == second[j - 1] else 1
+            row[j] = min(previous_row[j] + 1, row[j - 1] + 1, previous_row[j - 1] + cost)
+            if (i > 1 and j > 1 and first[i - 1] == second[j - 2]
+                    and first[i - 2] == second[j - 1]):
+                row[j] = min(row[j], before[j - 2] + 1)
+        if min(row) > limit and min(previous_row) > limit:
+            return limit + 1
+    return row[-1]
+
+
+class FuzzyIndex():
+    """
+    This is a class for resolving possibly misspelled guesses to names.
+
+    The index is built once from a mapping of keys, such as guess codes and item
+    names, to the names they stand for. Every key is stored along with every
+    string that can be made by deleting up to max_distance characters from it,
+    so a lookup only has to generate the deletions of the guess and check the
+    few keys that share one, rather than compare the guess with every key.
+    Results are cached since chat tends to repeat the same typos.
+    """
+    def __init__(self, entries, max_distance=2, cache_size=4096):
+        """
+        The constructor for FuzzyIndex class.
+
+        Parameters:
+            entries (dict): A mapping of keys to lists of the names they stand for
+            max_distance (int): The most typos any guess may contain
+            cache_size (int): The number of recent lookups to remember
+        """
+        self.max_distance = max_distance
+        self.exact = {}
+        for key, names in entries.items():
+            key_names = self.exact.setdefault(normalize(key), [])
+            key_names.extend(name for name in names if name not in key_names)
+        variants = {}
+        for key in self.exact:
+            for variant in deletes(key, max_distance):
+                variants.setdefault(variant, []).append(key)
+        self.variants = {variant: tuple(keys) for variant, keys in variants.items()}
+        self.resolve = lru_cache(maxsize=cache_size)(self._resolve)
+
+    def lookup(self, text):
+        """
+        The function to find the names a key stands for, allowing no typos.
+
+        Parameters:
+            text (string): The key as typed
+
+        Returns:
+            Returns a tuple of names, which is empty if no key matches exactly.
+        """
+        return tuple(self.exact.get(normalize(text), ()))
+
+    def _resolve(self, text):
+        """
+        The function to find the names a guess could stand for.
+
+        Parameters:
+            text (string): The guess as typed
+
+        Returns:
+            Returns a tuple of names, closest matches first, which is empty if no
+            key is within the allowed number of typos.
+        """
+        text = normalize(text)
+        names = self.exact.get(text)
+        if names:
+            return tuple(names)
+        limit = min(max_distance_for(len(text)), self.max_distance)
+        if not limit:
+            return ()
+        candidates = set()
+        for variant in deletes(text, limit):
+            candidates.update(self.variants.get(variant, ()))
+        matches = []
+        for key in candidates:
+            distance = edit_distance(text, key, limit)
+            if distance <= limit:
+                matches.append((distance, key))
+        resolved = []
+        for _, key in sorted(matches):
+            resolved.extend(name for name in self.exact[key] if name not in resolved)
+        return tuple(resolved)
@@ -0,0 +1,82 @@
+"""This module provides compact records for pending guesses."""
+import json
+import zlib
+
+import clocks
+
+NONE = 255
+
+
+def monotonic_seconds(clock=None):
+    """Returns a clock's monotonic time in whole seconds, the system clock's by default."""
+    return int((clock or clocks.SYSTEM).monotonic())
+
+
+class CodeTable():
+    """
+    This is a class for mapping items, dungeons and songs to small integer codes.
+
+    Codes are positions in the lists the table is built from, so they fit in a
+    single byte and a guess can hold its codes in a bytes object. The version is
+    a checksum of the lists, so codes stored with a version can still be decoded
+    after the item definitions change.
+    """
+    def __init__(self, items, dungeons, songs):
+        """The constructor for CodeTable class."""
+        self.names = {
+            "item": [item['name'] for item in items],
+            "dungeon": list(dungeons),
+            "song": list(songs)
+        }
+        self.ids = {
+            kind: {name: code for code, name in enumerate(names)}
+            for kind, names in self.names.items()
+        }
+        self.version = zlib.crc32(
+            json.dumps(self.names, sort_keys=True).encode('utf-8')) & 0x7fffffff
+
+    def encode(self, kind, names):
+        """Returns the codes for a list of names, using NONE for None."""
+        return bytes(NONE if name is None else self.ids[kind][name] for name in names)
+
+    def decode(self, kind, codes):
+        """Returns the names for a list of codes, using None for NONE."""
+        return [None if code == NONE else self.names[kind][code] for code in codes]
+
+
+class Guess():
+    """
+    This is a class for a single pending guess.
+
+    Item guesses hold item codes, medal guesses hold one dungeon code per medal
+    and song guesses hold one location code per song. Times are monotonic
+    seconds.
+    """
+    __slots__ = ('user_id', 'username', 'timestamp', 'deadline', 'codes')
+
+    def __init__(self, user_id, username, timestamp, deadline, codes):
+        """The constructor for Guess class."""
+        self.user_id = user_id
+        self.username = username
+        self.timestamp = timestamp
+        self.deadline = deadline
+        self.codes = codes
+
+    def __repr__(self):
+        return 'Guess(%s, %s, %s)' % (self.user_id, self.username, list(self.codes))
+
+    def dump(self, clock=None):
+        """Returns the guess as a list with its times converted to wall clock seconds."""
+        clock = clock or clocks.SYSTEM
+        offset = clock.time() - monotonic_seconds(clock)
+        return [self.user_id, self.username, self.timestamp + offset,
+                self.deadline + offset, list(self.codes)]
+
+    @classmethod
+    def load(cls, data, clock=None):
+        """Returns a guess from a list created by dump."""
+        clock = clock or clocks.SYSTEM
+        offset = clock.time() - monotonic_seconds(clock)
+        user_id, username, timestamp, deadline, codes = data
+        return cls(user_id, username, int(timestamp - offset), int(deadline - offset),
+                   bytes(codes))
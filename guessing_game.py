@@ -1,41 +1,82 @@
 """This module provides an interface for running a guessing game."""
 import logging
 import os.path
-import errno
-from datetime import datetime, timedelta
-from collections import deque, OrderedDict
-import csv
+import heapq
+from collections import OrderedDict, Counter
+from urllib.parse import quote
 
 import boto3
 import jstyleson
 
-from database.streamer import Streamer
-from database.participant import Participant
 from database.session import Session
 from database.session_log_entry import SessionLogEntry
+from snapshot import GameSnapshot, SNAPSHOT_VERSION
+import journal
+import stats
+import reports
+from reports import (REPORT_LOG, REPORT_SESSION, REPORT_TOTALS, REPORT_TOP, REPORT_STANDINGS,
+                     REPORT_DELTAS)
+import clocks
+from ledger import PointsLedger
+from storage.base import PARTICIPANT_FIELDS, STANDING_FIELDS, DELTA_FIELDS
+import fuzzy
+from guesses import CodeTable, Guess, NONE, monotonic_seconds
+
+MULTIGUESS_LIMIT = 3
+MAX_GUESS_WORDS = 3
+LEADERBOARD_SIZE = 10
+REPORT_TOP_SIZE = 100
+LOG_COLUMNS = ['timestamp', 'user_id', 'username', 'guess_type', 'guess', 'session_points',
+               'total_points']
+ODDS_LIMIT = 5
+MEDAL_ORDER = ['forest', 'fire', 'water', 'spirit', 'shadow', 'light']
+SONG_ORDER = [
+    "Zelda's Lullaby", "Epona's Song", "Saria's Song", "Sun's Song", "Song of Time",
+    "Song of Storms", "Minuet of Forest", "Bolero of Fire", "Serenade of Water",
+    "Requiem of Spirit", "Nocturne of Shadow", "Prelude of Light"
+]
 
 class GuessingGame():
     """This is a class for running a guessing game."""
-    def __init__(self, streamer):
-        """The constructor for GuessingGame class."""
+    def __init__(self, storage, clock=None):
+        """
+        The constructor for GuessingGame class.
+
+        Parameters:
+            storage (Storage): The storage backend bound to the streamer's channel
+            clock (Clock): The clock the game reads the time from, the system's if None
+        """
         logging.basicConfig()
         self.logger = logging.getLogger(__name__)
+        self.clock = clock or clocks.SYSTEM
         self.database = {
-            "streamer": streamer,
-            "channel-id": streamer.channel_id,
-            "current-session": None,
-            "latest-session": None
+            "storage": storage,
+            "channel-id": storage.channel_id,
+            "session-log": [],
+            "latest-session": None,
+            "latest-journal": None
         }
         with open('items.json') as items:
             self.items = jstyleson.load(items)
         self.commands = [
             '!guess', '!hud', '!points', '!guesspoints', '!firstguess', '!start', '!mode',
-            '!modedel', '!song', '!finish', '!report'
+            '!modedel', '!song', '!finish', '!report', '!guesstime', '!guessnotice', '!stats',
+            '!odds'
         ]
         self.guesses = {
-            "item": deque(),
-            "medal": deque(),
-            "song": deque()
+            "item": OrderedDict(),
+            "medal": OrderedDict(),
+            "song": OrderedDict()
+        }
+        self.expiry = {
+            "heap": [],
+            "sequence": 0
+        }
+        self.odds = {
+            "counts": Counter()
+        }
+        self.live = {
+            "dirty": True
         }
         self.guessables = {
             "blacklist": [
@@ -56,6 +97,10 @@ class GuessingGame():
         }
         self.guessables['dungeons'] += [
             medal for medal in self.guessables['medals'] if medal != 'light']
+        self.codes = self._build_code_index()
+        self.resolvers = self._build_resolvers()
+        self.code_table = CodeTable(
+            self.items, self.guessables['dungeons'], self.guessables['songs'])
         self.state = {
             "running": False,
             "freebie": None,
@@ -78,35 +123,338 @@ class GuessingGame():
                 {
                     "name": "ocarina",
                     "items": ["Ocarina"]
+                },
+                {
+                    "name": "multiguess",
+                    "items": []
                 }
             ]
         }
 
+        storage.add_code_table(self.code_table.version, self.code_table.names)
+        migrated = storage.migrate_session_logs(['Medal', 'Song'], self._migrate_log_entry)
+        if migrated:
+            self.logger.info('Encoded %s medal and song log entries', migrated)
         self.database['latest-session'] = self._get_sessions()
+        self.snapshot = GameSnapshot(storage.channel_id, clock=self.clock)
+        self.ledger = PointsLedger(storage, clock=self.clock)
+        self.journal_writer = None
+        self._restore_state()
+        self.stats = stats.StatsCollector()
+        if storage.get_stats(stats.CHANNEL, stats.CHANNEL) is None:
+            storage.rebuild_stats()
 
         self.logger.setLevel(logging.DEBUG)
 
     def _get_sessions(self):
-        self.database['current-session'] = Session()
-        if self.database['streamer'].sessions:
-            return self.database['streamer'].sessions[len(self.database['streamer'].sessions) - 1]
-        return None
+        self.database['session-log'] = []
+        return self.database['storage'].latest_session()
 
-    def do_command(self, user, permissions, command):
+    def _dump_state(self):
+        return {
+            "running": self.state['running'],
+            "freebie": self.state['freebie'],
+            "mode": self.state['mode'],
+            "songs": self.state['songs'],
+            "medals": self.state['medals'],
+            "guesses": {
+                guess_type: list(guesses.values())
+                for guess_type, guesses in self.guesses.items()
+            },
+            "session": self.database['session-log'],
+            "journal": self.journal_writer.path if self.journal_writer else None
+        }
+
+    def _session_json(self):
+        return '{"guesses": [%s]}' % ', '.join(self.database['session-log'])
+
+    def _save_state(self):
+        self.snapshot.save(self._dump_state())
+        self.live['dirty'] = True
+
+    def _restore_state(self):
+        state, deltas = self.snapshot.load()
+        if state is None:
+            self._save_state()
+            return
+        self.state['running'] = state['running']
+        self.state['freebie'] = state['freebie']
+        self.state['mode'] = state['mode']
+        self.state['songs'] = state['songs']
+        self.state['medals'] = state['medals']
+        legacy = state['version'] < SNAPSHOT_VERSION
+        for guess_type, guesses in state['guesses'].items():
+            for guess in guesses:
+                self._restore_guess(guess_type, guess, legacy)
+        self.database['session-log'] = [
+            entry.to_json() for entry in Session.from_json(state['session']).guesses]
+        if state.get('journal'):
+            self.journal_writer = journal.JournalWriter(state['journal'], clock=self.clock)
+        for delta in deltas:
+            self._restore_guess(delta['type'], delta['guess'], legacy)
+            self.database['session-log'].append(delta['log'])
+        self.logger.info('Restored guessing game with %s pending guesses',
+                         sum(len(guesses) for guesses in self.guesses.values()))
+        if legacy:
+            # Rewrite the snapshot so no old format deltas are left behind
+            self.logger.info('Converted version %s snapshot', state['version'])
+            self._save_state()
+
+    def _restore_guess(self, guess_type, guess, legacy):
+        if legacy:
+            guess = self._convert_legacy_guess(guess_type, guess)
+            if guess is None:
+                return
+        self._add_guess(guess_type, guess)
+
+    def _convert_legacy_guess(self, guess_type, guess):
+        """
+        The function to convert a pending guess from a version 1 snapshot.
+
+        Parameters:
+            guess_type (string): The guess queue the guess was in
+            guess (dict): The guess as returned by snapshot.decode_legacy_guess
+
+        Returns:
+            Returns a Guess, or None if the guess could not be converted.
+        """
+        try:
+            deadline = guess.get('deadline')
+            if deadline is None:
+                deadline = (guess['timestamp']
+                            + self.database['storage'].settings['guess_expiry'] * 60)
+            if guess_type == 'item':
+                items = guess['guess']
+                if isinstance(items, str):
+                    items = [items]
+                codes = self.code_table.encode('item', items)
+            else:
+                kind, order = ('dungeon', MEDAL_ORDER) if guess_type == 'medal' else (
+                    'song', SONG_ORDER)
+                names = [guess.get(name) for name in order]
+                if not any(names):
+                    raise ValueError('No %ss guessed' % kind)
+                codes = self.code_table.encode(kind, names)
+            return Guess(int(guess['user-id']), guess['username'], guess['timestamp'],
+                         deadline, codes)
+        except (KeyError, TypeError, ValueError):
+            self.logger.warning('Dropping %s guess that could not be converted: %s',
+                                guess_type, guess)
+            return None
+
+    def _record_guess(self, guess_type, guess, log_entry):
+        # The session log is kept serialized, one entry at a time, so the
+        # entries' documents are not held in memory for the whole race
+        log_entry = log_entry.to_json()
+        self.database['session-log'].append(log_entry)
+        self._journal(journal.GUESS, {
+            "type": guess_type,
+            "user-id": guess.user_id,
+            "username": guess.username,
+            "codes": list(guess.codes)
+        })
+        if self.snapshot.record_guess(guess_type, guess, log_entry):
+            self._save_state()
+
+    def _journal(self, event, data):
+        if self.journal_writer is None:
+            self.journal_writer = journal.JournalWriter(
+                journal.session_path(self.database['channel-id'], clock=self.clock),
+                clock=self.clock)
+            self.logger.info('Writing session journal to %s', self.journal_writer.path)
+        self.journal_writer.append(event, data)
+
+    def _add_guess(self, guess_type, guess):
+        queue = self.guesses[guess_type]
+        replaced = queue.pop(guess.user_id, None)
+        if replaced is not None:
+            self._count_guess(guess_type, replaced.codes, -1)
+        queue[guess.user_id] = guess
+        self._count_guess(guess_type, guess.codes, 1)
+        self.expiry['sequence'] += 1
+        heapq.heappush(self.expiry['heap'], (
+            guess.deadline, self.expiry['sequence'], guess_type, guess.user_id))
+        # Replaced and scored guesses leave stale entries behind until their
+        # deadline, so the heap is rebuilt once they outnumber the live ones
+        # two to one
+        live = sum(len(guesses) for guesses in self.guesses.values())
+        if len(self.expiry['heap']) > 3 * live:
+            self._rebuild_expiry()
+
+    def _rebuild_expiry(self):
+        """The function to rebuild the expiry heap from the pending guesses alone."""
+        heap = []
+        for guess_type, guesses in self.guesses.items():
+            for guess in guesses.values():
+                self.expiry['sequence'] += 1
+                heap.append((guess.deadline, self.expiry['sequence'], guess_type, guess.user_id))
+        heapq.heapify(heap)
+        self.expiry['heap'] = heap
+        return len(heap)
+
+    def _clear_guesses(self):
+        for guesses in self.guesses.values():
+            guesses.clear()
+        self.expiry['heap'] = []
+        self.odds['counts'].clear()
+        self.live['dirty'] = True
+
+    def _count_guess(self, guess_type, codes, delta):
+        """Adjusts the live count of pending item guesses for each item code."""
+        if guess_type != 'item':
+            return
+        counts = self.odds['counts']
+        for code in codes:
+            counts[code] += delta
+            if counts[code] <= 0:
+                del counts[code]
+        self.live['dirty'] = True
+
+    def _new_guess(self, user, codes):
+        now = monotonic_seconds(self.clock)
+        return Guess(int(user['user-id']), user['username'], now,
+                     now + self.database['storage'].settings['guess_expiry'] * 60, codes)
+
+    def expire_guesses(self):
+        """
+        The function to drop pending guesses whose deadline has passed.
+
+        Only guesses at the front of the expiry heap are looked at, so the
+        pending guesses are never rescanned.
+
+        Returns:
+            Returns a string naming the users whose guesses expired if the streamer
+            has expiry notices turned on, otherwise None.
+        """
+        now = monotonic_seconds(self.clock)
+        heap = self.expiry['heap']
+        expired = []
+        while heap and heap[0][0] <= now:
+            deadline, _, guess_type, user_id = heapq.heappop(heap)
+            guess = self.guesses[guess_type].get(user_id)
+            if guess is None or guess.deadline != deadline:
+                continue
+            del self.guesses[guess_type][user_id]
+            self._count_guess(guess_type, guess.codes, -1)
+            expired.append(guess.username)
+            self._journal(journal.EXPIRE, {"type": guess_type, "user-id": user_id})
+        if not expired:
+            return None
+        self.logger.info('%s guesses expired', len(expired))
+        if not self.database['storage'].settings['expiry_notice']:
+            return None
+        names = ', '.join(expired[:20])
+        if len(expired) > 20:
+            names += ' and %s more' % (len(expired) - 20)
+        return 'Guesses expired for %s' % names
+
+    def extend_guesses(self, seconds):
+        """
+        The function to push back the deadline of every pending guess.
+
+        Used after the bot was disconnected from chat, so guesses are not
+        expired for time in which their owners could not see or replace them.
+
+        Parameters:
+            seconds (float): How long the bot was disconnected
+
+        Returns:
+            Returns the number of guesses whose deadline was moved.
+        """
+        extension = int(round(seconds))
+        if extension <= 0:
+            return 0
+        for guesses in self.guesses.values():
+            for guess in guesses.values():
+                guess.deadline += extension
+        extended = self._rebuild_expiry()
+        if not extended:
+            return 0
+        self._save_state()
+        self.logger.info('Extended %s guesses by %s seconds', extended, extension)
+        return extended
+
+    def odds_summary(self, limit=None):
+        """
+        The function to summarize the pending item guesses.
+
+        Reads only the live counts, never the pending guesses themselves.
+
+        Parameters:
+            limit (int): The most items to include, all of them if None
+
+        Returns:
+            Returns a dict of the number of users with a pending item guess and a
+            list of [item, count] pairs, most guessed first.
+        """
+        return {
+            "pending": len(self.guesses['item']),
+            "items": [[self.code_table.names['item'][code], count]
+                      for code, count in self.odds['counts'].most_common(limit)]
+        }
+
+    def publish_live(self):
+        """
+        The function to push the live game to the dashboard.
+
+        Publishes the guess counts, and the leaderboard and game state to the
+        change feed the live page follows. Meant to be called periodically;
+        nothing is written unless the game changed since the last call.
+        """
+        if not self.live['dirty']:
+            return
+        self.live['dirty'] = False
+        storage = self.database['storage']
+        odds = self.odds_summary()
+        storage.publish_live('odds', odds)
+        storage.publish_event('live', {
+            "running": self.state['running'],
+            "mode": self.state['mode'],
+            "medals": self.state['medals'],
+            "songs": self.state['songs'],
+            "odds": {"pending": odds['pending'], "items": odds['items'][:ODDS_LIMIT]},
+            "leaderboard": [[participant.username, participant.session_points]
+                            for participant in storage.top_participants(LEADERBOARD_SIZE)]
+        })
+
+    def flush_points(self):
+        """
+        The function to write the points ledger's pending deltas to storage.
+
+        Meant to be called every few seconds. The live leaderboard is read from
+        storage, so it is republished after points are written.
+        """
+        if self.ledger.flush():
+            self.live['dirty'] = True
+
+    def checkpoint(self):
+        """
+        The function to write a snapshot of the game if one is due.
+
+        Meant to be called periodically so the delta log stays short.
+        """
+        if self.snapshot.due():
+            self._save_state()
+        self.stats.flush(self.database['storage'])
+        if self.journal_writer:
+            self.journal_writer.sync()
+
+    def do_command(self, user, permissions, message):
         """
         The function to parse a command.
 
         Parameters:
             user (dict): A dictionary containing the username and user_id of the sender
             permissions (dict): A dictionary containing the user permissions of the sender
-            command (string[]): A list containing the command and its arguments
+            message (ChatMessage): The parsed chat message containing the command
 
         Returns:
             Returns a string meant to be sent to Twitch chat. If a falsy value is returned
             no message is sent to chat.
         """
+        command = message.command
         try:
-            command_name = command[0]
+            command_name = message.command_name
             if (command_name == '!guesspoints'
                     and (permissions['whitelist'] or permissions['mod'])
                     and not permissions['blacklist']):
@@ -117,12 +465,28 @@ class GuessingGame():
                     and not permissions['blacklist']):
                 return self._set_first_guess(command)
 
+            if (command_name == '!guesstime'
+                    and (permissions['whitelist'] or permissions['mod'])
+                    and not permissions['blacklist']):
+                return self._set_guess_time(command)
+
+            if (command_name == '!guessnotice'
+                    and (permissions['whitelist'] or permissions['mod'])
+                    and not permissions['blacklist']):
+                return self._set_guess_notice(command)
+
             if command_name == '!guess':
                 return self._guess_command(command, user)
 
             if command_name == '!points':
                 return self._points_command(command, user)
 
+            if command_name == '!stats':
+                return self._stats_command(command)
+
+            if command_name == '!odds':
+                return self._odds_command(command)
+
             if (command_name == '!mode'
                     and (permissions['whitelist'] or permissions['mod'])
                     and not permissions['blacklist']):
@@ -161,94 +525,97 @@ class GuessingGame():
             self.logger.error('Command missing arguments')
         return None
 
-    def _complete_guess(self, item):
+    def _complete_guesses(self, items):
         if not self.state['running']:
             self.logger.info('Guessing game not running')
             return
-        if not item:
-            self.logger.info('Item %s not found', item)
+        if not items:
+            self.logger.info('No items found')
             return
-        expiration = datetime.now() - timedelta(minutes=15)
-        new_guess_deque = deque()
-        first_guess = False
-        for guess in self.guesses['item']:
-            if guess['timestamp'] < expiration:
+        self.expire_guesses()
+        self._journal(journal.HUD, {"items": items})
+        item_codes = self.code_table.encode('item', items)
+        first_guesses = set()
+        awards = OrderedDict()
+        for guess in list(self.guesses['item'].values()):
+            correct = [code for code in guess.codes if code in item_codes]
+            if not correct:
                 continue
-            if guess['guess'] is not item:
-                new_guess_deque.append(guess)
+            points = self.database['storage'].settings['points'] * len(correct)
+            for code in correct:
+                first = code not in first_guesses
+                self.stats.record_hit(guess.user_id, guess.username,
+                                      self.code_table.names['item'][code], first)
+                if first:
+                    first_guesses.add(code)
+                    points += self.database['storage'].settings['first_bonus']
+                    self.logger.info('User %s made the first correct guess for %s earning %s \
+                                     extra points', guess.username,
+                                     self.code_table.names['item'][code],
+                                     self.database['storage'].settings['first_bonus'])
+            awards[guess.user_id] = [guess.username, points]
+            self.logger.info('User %s guessed %s correctly and earned %s points',
+                             guess.username,
+                             ', '.join(self.code_table.decode('item', correct)), points)
+            remaining = bytes(code for code in guess.codes if code not in item_codes)
+            self._count_guess('item', correct, -1)
+            if remaining:
+                guess.codes = remaining
+            else:
+                del self.guesses['item'][guess.user_id]
+        self._award_points(awards)
+        self.stats.flush(self.database['storage'])
+        self.logger.info('Guesses completed for %s', ', '.join(items))
+        self._save_state()
+
+    def _award_points(self, awards):
+        """Adds the [username, points] owed to each user ID to the points ledger."""
+        for user_id, (username, points) in awards.items():
+            if not points:
                 continue
-            if not first_guess:
-                Streamer.objects.filter( #pylint: disable=no-member
-                    channel_id=self.database['streamer'].channel_id,
-                    participants__user_id=guess['user-id']).update(
-                        inc__participants__S__session_points=
-                        self.database['streamer'].first_bonus,
-                        inc__participants__S__total_points=
-                        self.database['streamer'].first_bonus)
-                self.logger.info('User %s made the first correct guess earning %s extra points',
-                                 guess['username'], self.database['streamer'].first_bonus)
-                first_guess = True
-            Streamer.objects.filter( #pylint: disable=no-member
-                channel_id=self.database['streamer'].channel_id,
-                participants__user_id=guess['user-id']).modify(
-                    inc__participants__S__session_points=
-                    self.database['streamer'].points,
-                    inc__participants__S__total_points=
-                    self.database['streamer'].points)
-            self.logger.info('User %s guessed correctly and earned %s points',
-                             guess['username'], self.database['streamer'].points)
-            self.guesses['item'] = new_guess_deque
-            self.logger.info('Guesses completed')
+            self._journal(journal.AWARD, {
+                "user-id": user_id,
+                "username": username,
+                "points": points
+            })
+        self.ledger.award(awards)
 
     def _do_points_check(self, username):
-        try:
-            streamer = Streamer.objects.get( #pylint: disable=no-member
-                channel_id=self.database['channel-id'], participants__username=username)
-            for participant in streamer.participants:
-                if participant.username == username:
-                    return '%s has %s points' % (username, participant.session_points)
-        except Streamer.DoesNotExist: #pylint: disable=no-member
+        participant = self.ledger.find_participant(username)
+        if participant is None:
             self.logger.error('Participant with username %s does not exist in the database',
                               username)
-        return None
+            return None
+        return '%s has %s points' % (username, participant.session_points)
 
     def _do_total_points_check(self, username):
-        try:
-            streamer = Streamer.objects.get( #pylint: disable=no-member
-                channel_id=self.database['channel-id'], participants__username=username)
-            for participant in streamer.participants:
-                if participant.username == username:
-                    return '%s has %s points' % (username, participant.total_points)
-        except Streamer.DoesNotExist: #pylint: disable=no-member
+        participant = self.ledger.find_participant(username)
+        if participant is None:
             self.logger.error('Participant with username %s does not exist in the database',
                               username)
-        return None
+            return None
+        return '%s has %s points' % (username, participant.total_points)
 
-    def _do_item_guess(self, user, item, participant):
-        if not item:
-            self.logger.info('Item %s not found', item)
+    def _do_item_guess(self, user, items, participant):
+        if not items:
+            self.logger.info('No items found')
             return
-        self.guesses['item'] = self._remove_stale_guesses(self.guesses['item'], user['username'])
-        now = datetime.now()
-        item_guess = {
-            "timestamp": now,
-            "user-id": user['user-id'],
-            "username": user['username'],
-            "guess": item
-        }
-        print(participant)
+        now = self.clock.now()
+        item_guess = self._new_guess(user, self.code_table.encode('item', items))
         guess = SessionLogEntry(
-            timestamp=datetime.now(),
+            timestamp=now,
             participant=participant.user_id,
             participant_name=participant.username,
             guess_type="Item",
-            guess=item,
+            guess=', '.join(items),
             session_points=participant.session_points,
             total_points=participant.total_points
         )
-        self.database['current-session'].guesses.append(guess)
-        self.guesses['item'].append(item_guess)
-        self.logger.info('%s Item %s guessed by user %s', now, item, user['username'])
+        self.stats.record_guess(item_guess.user_id, item_guess.username, items)
+        self._add_guess('item', item_guess)
+        self._record_guess('item', item_guess, guess)
+        self.logger.info('%s Items %s guessed by user %s', now, ', '.join(items),
+                         user['username'])
         self.logger.debug(self.guesses['item'])
 
     def _do_medal_guess(self, user, medals, participant):
@@ -256,14 +623,7 @@ class GuessingGame():
             self.logger.info('Medal command incomplete')
             self.logger.debug(medals)
             return
-        self.guesses['medal'] = self._remove_stale_guesses(self.guesses['medal'], user['username'])
-        medal_guess = OrderedDict()
-        medal_guess["forest"] = None
-        medal_guess["fire"] = None
-        medal_guess["water"] = None
-        medal_guess["spirit"] = None
-        medal_guess["shadow"] = None
-        medal_guess["light"] = None
+        medal_guess = OrderedDict((medal, None) for medal in MEDAL_ORDER)
         i = 0
         for medal in medal_guess:
             guess = medals[i]
@@ -275,40 +635,26 @@ class GuessingGame():
             medal_guess[medal] = guess
             i += 1
         guess = SessionLogEntry(
-            timestamp=datetime.now(),
+            timestamp=self.clock.now(),
             participant=participant.user_id,
             participant_name=participant.username,
             guess_type="Medal",
-            guess=jstyleson.dumps(medal_guess).replace(',', '\n'),
+            codes=list(self.code_table.encode('dungeon', medal_guess.values())),
+            code_version=self.code_table.version,
             session_points=participant.session_points,
             total_points=participant.total_points
         )
-        self.database['current-session'].guesses.append(guess)
-        medal_guess['user-id'] = user['user-id']
-        medal_guess['username'] = user['username']
-        medal_guess['timestamp'] = datetime.now()
-        self.guesses['medal'].append(medal_guess)
         self.logger.debug(medal_guess)
+        medal_guess = self._new_guess(user, bytes(guess.codes))
+        self._add_guess('medal', medal_guess)
+        self._record_guess('medal', medal_guess, guess)
 
     def _do_song_guess(self, user, songs, participant):
         if len(songs) < 12:
             self.logger.info('song command incomplete')
             self.logger.debug(songs)
             return
-        self.guesses['song'] = self._remove_stale_guesses(self.guesses['song'], user['username'])
-        song_guess = OrderedDict()
-        song_guess["Zelda's Lullaby"] = None
-        song_guess["Epona's Song"] = None
-        song_guess["Saria's Song"] = None
-        song_guess["Sun's Song"] = None
-        song_guess["Song of Time"] = None
-        song_guess["Song of Storms"] = None
-        song_guess["Minuet of Forest"] = None
-        song_guess["Bolero of Fire"] = None
-        song_guess["Serenade of Water"] = None
-        song_guess["Requiem of Spirit"] = None
-        song_guess["Nocturne of Shadow"] = None
-        song_guess["Prelude of Light"] = None
+        song_guess = OrderedDict((song, None) for song in SONG_ORDER)
         i = 0
         for song in song_guess:
             guess = songs[i]
@@ -319,28 +665,26 @@ class GuessingGame():
             song_guess[song] = songname
             i += 1
         guess = SessionLogEntry(
-            timestamp=datetime.now(),
+            timestamp=self.clock.now(),
             participant=participant.user_id,
             participant_name=participant.username,
             guess_type="Song",
-            guess=jstyleson.dumps(song_guess).replace(',', '\n'),
+            codes=list(self.code_table.encode('song', song_guess.values())),
+            code_version=self.code_table.version,
             session_points=participant.session_points,
             total_points=participant.total_points
         )
-        self.database['current-session'].guesses.append(guess)
-        song_guess['user-id'] = user['user-id']
-        song_guess['username'] = user['username']
-        song_guess['timestamp'] = datetime.now()
-        self.guesses['song'].append(song_guess)
         self.logger.debug(song_guess)
+        song_guess = self._new_guess(user, bytes(guess.codes))
+        self._add_guess('song', song_guess)
+        self._record_guess('song', song_guess, guess)
 
     def _set_guess_points(self, command):
         try:
             command_value = command[1]
             if int(command_value) > 0:
                 message = 'Set points value to %s' % command_value
-                self.database['streamer'].points = int(command_value)
-                self.database['streamer'].save()
+                self.database['storage'].update_setting('points', int(command_value))
                 self.logger.info(message)
                 return message
             message = 'Cannot set points value lower than 0'
@@ -356,8 +700,7 @@ class GuessingGame():
             command_value = command[1]
             if int(command_value) > 0:
                 message = 'Set first guess bonus to %s' % command_value
-                self.database['streamer'].first_bonus = int(command_value)
-                self.database['streamer'].save()
+                self.database['storage'].update_setting('first_bonus', int(command_value))
                 self.logger.info(message)
                 return message
             message = 'Cannot set first guess bonus lower than 0'
@@ -368,23 +711,37 @@ class GuessingGame():
             self.logger.error(message)
             return message
 
+    def _set_guess_time(self, command):
+        try:
+            command_value = command[1]
+            if int(command_value) > 0:
+                message = 'Set guess expiry to %s minutes' % command_value
+                self.database['storage'].update_setting('guess_expiry', int(command_value))
+                self.logger.info(message)
+                return message
+            message = 'Cannot set guess expiry lower than 1 minute'
+            self.logger.info(message)
+            return message
+        except ValueError:
+            message = 'Cannot convert %s to an integer' % command_value
+            self.logger.error(message)
+            return message
+
+    def _set_guess_notice(self, command):
+        command_value = command[1].lower()
+        if command_value not in ['on', 'off']:
+            message = 'Guess expiry notices can only be turned on or off'
+            self.logger.info(message)
+            return message
+        message = 'Turned guess expiry notices %s' % command_value
+        self.database['storage'].update_setting('expiry_notice', command_value == 'on')
+        self.logger.info(message)
+        return message
+
     def _guess_command(self, command, user):
-        guesser = None
-        for participant in self.database['streamer'].participants:
-            if participant.user_id == int(user['user-id']):
-                guesser = participant
+        guesser = self.ledger.get_participant(user['user-id'])
         if guesser is None:
-            self.database['streamer'].reload()
-            participant = Participant(
-                username=user['username'],
-                user_id=user['user-id'],
-                session_points=0,
-                total_points=0)
-            self.database['streamer'].participants.append(participant)
-            self.database['streamer'].save()
-            for participant in self.database['streamer'].participants:
-                if participant.user_id == int(user['user-id']):
-                    guesser = participant
+            guesser = self.ledger.add_participant(user['user-id'], user['username'])
             self.logger.info(
                 'Participant with ID %s does not exist in the database. Creating participant.',
                 user['user-id'])
@@ -397,9 +754,11 @@ class GuessingGame():
                 return self._do_song_guess(user, command_value, guesser)
         if not self.state['running']:
             return None
-        command_value = command[1].lower()
-        item = self._parse_item(command_value)
-        return self._do_item_guess(user, item, guesser)
+        limit = 1
+        if 'multiguess' in self.state['mode']:
+            limit = MULTIGUESS_LIMIT
+        items = self._parse_items(command[1:], limit)
+        return self._do_item_guess(user, items, guesser)
 
     def _points_command(self, command, user):
         if len(command) == 1:
@@ -414,6 +773,42 @@ class GuessingGame():
             return self._do_total_points_check(command[1])
         return None
 
+    def _stats_command(self, command):
+        storage = self.database['storage']
+        if len(command) == 1:
+            channel_stats = storage.get_stats(stats.CHANNEL, stats.CHANNEL)
+            if channel_stats is None:
+                return None
+            most_guessed = storage.top_stats(stats.ITEM, 1)
+            return stats.describe(channel_stats, most_guessed[0] if most_guessed else None)
+        item = next(iter(self.resolvers['items'].lookup(' '.join(command[1:]))), None)
+        if item:
+            item_stats = storage.get_stats(stats.ITEM, item)
+            if item_stats is None:
+                return '%s has not been guessed yet' % item
+            return stats.describe(item_stats)
+        user_stats = storage.get_stats(stats.USER, command[1].lower())
+        if user_stats is None:
+            self.logger.info('No stats for %s', command[1])
+            return None
+        return stats.describe(user_stats)
+
+    def _odds_command(self, command):
+        pending = len(self.guesses['item'])
+        if not pending:
+            return 'No pending item guesses'
+        if len(command) == 1:
+            summary = self.odds_summary(ODDS_LIMIT)
+            return 'Most guessed: %s' % ', '.join(
+                '%s %s%% (%s)' % (item, int(round(100.0 * count / pending)), count)
+                for item, count in summary['items'])
+        item = self._parse_item(' '.join(command[1:]))
+        if not item:
+            return None
+        count = self.odds['counts'][self.code_table.ids['item'][item]]
+        return '%s of %s pending guesses (%s%%) are on %s' % (
+            count, pending, int(round(100.0 * count / pending)), item)
+
     def _mode_command(self, command, user):
         if self.state['running']:
             self.logger.info('Guessing game already started')
@@ -427,12 +822,16 @@ class GuessingGame():
             message = 'Mode reset to normal by %s' % user['username']
             print(message)
             self.state['mode'].clear()
+            self._journal(journal.MODE, {"mode": self.state['mode']})
+            self._save_state()
             self.logger.info(message)
             return message
         for modes in self.state['modes']:
             if mode in modes['name'] and mode not in self.state['mode']:
                 message = 'Mode %s added by %s' % (mode, user['username'])
                 self.state['mode'] += [mode]
+                self._journal(journal.MODE, {"mode": self.state['mode']})
+                self._save_state()
                 self.logger.info(message)
                 return message
         return None
@@ -449,34 +848,98 @@ class GuessingGame():
         if mode in self.state['mode']:
             message = 'Mode %s removed by %s' % (mode, user['username'])
             self.state['mode'].remove(mode)
+            self._journal(journal.MODE, {"mode": self.state['mode']})
+            self._save_state()
             self.logger.info(message)
             return message
         return None
 
     def _report_command(self, command):
-        if len(command) > 1:
-            if command[1] == 'totals':
-                self._report_totals()
+        if len(command) < 2:
+            return None
+        arguments = command[2:]
+        file_format = 'csv'
+        if arguments and arguments[-1] in reports.FORMATS:
+            file_format = arguments.pop()
+        if command[1] == REPORT_TOTALS:
+            self._report_totals(file_format)
+        elif command[1] == REPORT_SESSION:
+            self._report_session(file_format)
+        elif command[1] == REPORT_TOP:
+            try:
+                limit = int(arguments[0]) if arguments else REPORT_TOP_SIZE
+            except ValueError:
                 return None
+            self._report_top(limit, file_format)
+        elif command[1] == REPORT_STANDINGS:
+            return self._report_standings(file_format)
+        elif command[1] == REPORT_DELTAS:
+            return self._report_deltas(file_format)
         return None
 
-    def _report_totals(self):
+    def _write_report(self, report_type, columns, rows, file_format='csv'):
+        """Writes rows to a report file in the given format and uploads it."""
+        file = reports.report_path(report_type, file_format)
+        count = reports.write_report(file, columns, rows, file_format)
+        self.logger.info('Wrote %s report of %s rows to %s', report_type, count, file)
+        self._upload_report(file, os.path.basename(file), report_type)
+
+    def _report_session(self, file_format='csv'):
+        if self.journal_writer:
+            self.journal_writer.sync()
+            path = self.journal_writer.path
+        else:
+            path = self.database['latest-journal']
+        if not path:
+            self.logger.info('No session journal to report on')
+            return
+        totals = journal.JournalReader(path).points_totals()
+        self._write_report(REPORT_SESSION, ['user_id', 'username', 'points'],
+                           ((user_id, username, points)
+                            for user_id, (username, points) in totals.items()), file_format)
+
+    def _upload_report(self, file, key, report_type):
+        """Uploads a report to the S3 bucket and adds it to the report index."""
+        bucket_name = os.environ.get('S3_BUCKET')
+        if not bucket_name:
+            self.logger.info('S3_BUCKET not set, keeping %s local', file)
+            return
         amazon_s3 = boto3.resource('s3')
-        filename = str(datetime.now()).replace(':', '_')
-        file = os.path.join(os.path.curdir, 'reports', filename + ' totals' + '.csv')
-        if not os.path.exists(file):
-            try:
-                os.makedirs(os.path.dirname(file))
-            except OSError as exc:
-                if exc.errno != errno.EEXIST:
-                    raise
-        report_writer = csv.writer(
-            open(file, 'w', newline=''))
-        for participant in self.database['streamer'].participants:
-            report_writer.writerow([participant.user_id, participant.username,
-                                    participant.total_points])
-        bucket = amazon_s3.Bucket(os.environ('S3_BUCKET'))
-        bucket.upload_file(file, str(datetime.now()) + '.csv', ExtraArgs={'ACL':'public-read'})
+        bucket = amazon_s3.Bucket(bucket_name)
+        bucket.upload_file(file, key, ExtraArgs={'ACL':'public-read'})
+        self.database['storage'].add_report(
+            report_type, key, 'https://%s.s3.amazonaws.com/%s' % (bucket_name, quote(key)),
+            os.path.getsize(file))
+
+    def _report_totals(self, file_format='csv'):
+        self.ledger.flush()
+        self._write_report(REPORT_TOTALS, PARTICIPANT_FIELDS,
+                           self.database['storage'].stream_participants(), file_format)
+
+    def _report_top(self, limit, file_format='csv'):
+        self.ledger.flush()
+        self._write_report(REPORT_TOP, PARTICIPANT_FIELDS,
+                           self.database['storage'].stream_participants(limit=limit),
+                           file_format)
+
+    def _report_standings(self, file_format='csv'):
+        storage = self.database['storage']
+        sessions = storage.standings_sessions(1)
+        if not sessions:
+            return 'No finished sessions to report on'
+        self._write_report(REPORT_STANDINGS, STANDING_FIELDS,
+                           storage.stream_standings(sessions[0]), file_format)
+        return None
+
+    def _report_deltas(self, file_format='csv'):
+        storage = self.database['storage']
+        sessions = storage.standings_sessions(2)
+        if len(sessions) < 2:
+            return 'Points deltas need two finished sessions'
+        self._write_report(REPORT_DELTAS, DELTA_FIELDS,
+                           storage.stream_standings_deltas(sessions[1], sessions[0]),
+                           file_format)
+        return None
 
     def _hud_command(self, command):
         if len(command) > 1:
@@ -486,9 +949,8 @@ class GuessingGame():
         if not self.state['running']:
             self.logger.info('Guessing game not running')
             return None
-        command_value = command[1].lower()
-        item = self._parse_item(command_value)
-        return self._complete_guess(item)
+        items = self._parse_items(command[1:], exact=True)
+        return self._complete_guesses(items)
 
     def _song_command(self, command):
         if not self.state['running']:
@@ -505,8 +967,13 @@ class GuessingGame():
             return None
         if command[1] not in self.guessables['dungeons'] and command[1] == 'free':
             self.state['freebie'] = command[0]
+            self._journal(journal.MEDAL, {"medal": command[0], "dungeon": 'free'})
+            self._save_state()
             self.logger.info('Medal %s set to freebie', command[0])
             return None
+        if command[1] not in self.guessables['dungeons']:
+            self.logger.info('Invalid dungeon %s', command[1])
+            return None
         if command[0] in self.guessables['medals']:
             if command[0] in self.state['medals']:
                 self.logger.info('Medal %s already in guesses')
@@ -515,48 +982,43 @@ class GuessingGame():
                     self.logger.info('Medal %s set to dungeon %s', command[0], command[1])
             self.state['medals'][command[0]] = command[1]
             self.logger.info('Medal %s set to dungeon %s', command[0], command[1])
+            self._journal(journal.MEDAL, {"medal": command[0], "dungeon": command[1]})
+        self._save_state()
         if ((self.state['freebie'] and len(self.state['medals']) == 5)
                 or len(self.state['medals']) == 6):
             freebie = False
             if self.state['freebie']:
                 freebie = True
-            for guess in self.guesses['medal']:
+            self.expire_guesses()
+            settings = self.database['storage'].settings
+            awards = OrderedDict()
+            finals = self.code_table.encode(
+                'dungeon', [self.state['medals'].get(medal) for medal in MEDAL_ORDER])
+            for guess in self.guesses['medal'].values():
                 count = 0
-                for final in self.state['medals']:
-                    if guess[final] == self.state['medals'][final]:
+                for code, final in zip(guess.codes, finals):
+                    if final != NONE and code == final:
                         count += 1
-                Streamer.objects.filter( #pylint: disable=no-member
-                    channel_id=self.database['streamer'].channel_id,
-                    participants__user_id=guess['user-id']).modify(
-                        inc__participants__S__session_points=
-                        self.database['streamer'].points * count,
-                        inc__participants__S__total_points=
-                        self.database['streamer'].points * count)
+                awards[guess.user_id] = [guess.username, settings['points'] * count]
                 self.logger.info('User %s guessed %s medals correctly and \
                                  earned %s points',
-                                 guess['username'], count,
-                                 self.database['streamer'].points * count)
+                                 guess.username, count, settings['points'] * count)
                 if ((count == 5 and freebie) or (count == 6)):
-                    Streamer.objects.filter( #pylint: disable=no-member
-                        channel_id=self.database['streamer'].channel_id,
-                        participants__user_id=guess['user-id']).update(
-                            inc__participants__S__session_points=
-                            self.database['streamer'].first_bonus,
-                            inc__participants__S__total_points=
-                            self.database['streamer'].first_bonus)
+                    awards[guess.user_id][1] += settings['first_bonus']
                     self.logger.info('User %s guessed all medals correctly and \
                                       earned %s bonus points',
-                                     guess['username'], self.database['streamer'].first_bonus)
-                self.database['streamer'].save()
-                self.guesses['medal'] = deque()
-                self.logger.info('Medal guesses completed')
+                                     guess.username, settings['first_bonus'])
+            self._award_points(awards)
+            self.guesses['medal'].clear()
+            self.logger.info('Medal guesses completed')
+            self._save_state()
 
     def _complete_song_guess(self, command):
         if len(command) < 2:
             self.logger.info('Not enough arguments for song')
             return None
-        new_song = self._parse_songs(command[0])
-        new_location = self._parse_songs(command[1])
+        new_song = self._parse_songs(command[0], exact=True)
+        new_location = self._parse_songs(command[1], exact=True)
         if not new_song or not new_location:
             return None
         if new_song in self.guessables['songs']:
@@ -567,43 +1029,40 @@ class GuessingGame():
                     self.logger.info('Song %s set to location %s', new_song, new_location)
             self.state['songs'][new_song] = new_location
             self.logger.info('Song %s set to location %s', new_song, new_location)
+            self._journal(journal.SONG, {"song": new_song, "location": new_location})
+        self._save_state()
         if len(self.state['songs']) == 12:
-            for guess in self.guesses['songs']:
+            self.expire_guesses()
+            settings = self.database['storage'].settings
+            awards = OrderedDict()
+            finals = self.code_table.encode(
+                'song', [self.state['songs'].get(song) for song in SONG_ORDER])
+            for guess in self.guesses['song'].values():
                 count = 0
-                for final in self.state['songs']:
-                    if guess[final] == self.state['songs'][final]:
+                for code, final in zip(guess.codes, finals):
+                    if final != NONE and code == final:
                         count += 1
-                Streamer.objects.filter( #pylint: disable=no-member
-                    channel_id=self.database['streamer'].channel_id,
-                    participants__user_id=guess['user-id']).modify(
-                        inc__participants__S__session_points=
-                        self.database['streamer'].points * count,
-                        inc__participants__S__total_points=
-                        self.database['streamer'].points * count)
+                awards[guess.user_id] = [guess.username, settings['points'] * count]
                 self.logger.info('User %s guessed %s songs correctly and \
                                  earned %s points',
-                                 guess['username'], count,
-                                 self.database['streamer'].points * count)
+                                 guess.username, count, settings['points'] * count)
                 if count == 12:
-                    Streamer.objects.filter( #pylint: disable=no-member
-                        channel_id=self.database['streamer'].channel_id,
-                        participants__user_id=guess['user-id']).update(
-                            inc__participants__S__session_points=
-                            self.database['streamer'].first_bonus,
-                            inc__participants__S__total_points=
-                            self.database['streamer'].first_bonus)
+                    awards[guess.user_id][1] += settings['first_bonus']
                     self.logger.info('User %s guessed all songs correctly and \
                                       earned %s bonus points',
-                                     guess['username'], self.database['streamer'].first_bonus)
-                self.database['streamer'].save()
-                self.guesses['song'] = deque()
-                self.logger.info('Song guesses completed')
+                                     guess.username, settings['first_bonus'])
+            self._award_points(awards)
+            self.guesses['song'].clear()
+            self.logger.info('Song guesses completed')
+            self._save_state()
 
     def _start_guessing_game(self, user):
         if self.state['running']:
             self.logger.info('Guessing game already running')
             return None
         self.state['running'] = True
+        self._journal(journal.START, {"username": user['username']})
+        self._save_state()
         message = 'Guessing game started by %s' % user['username']
         self.logger.info(message)
         return message
@@ -612,41 +1071,62 @@ class GuessingGame():
         if not self.state['running']:
             self.logger.info('Guessing game not running')
             return None
-        self.guesses['item'] = deque()
-        self.guesses['medal'] = deque()
-        self.guesses['song'] = deque()
+        self._clear_guesses()
+        self.stats.flush(self.database['storage'])
+        self._journal(journal.FINISH, {"username": user['username']})
+        self.journal_writer.close()
+        self.database['latest-journal'] = self.journal_writer.path
+        self.journal_writer = None
         self.state['running'] = False
         self.state['freebie'] = None
         self.state['mode'].clear()
         self.state['songs'].clear()
         self.state['medals'].clear()
-        self.database['streamer'].sessions.append(self.database['current-session'])
-        self.database['streamer'].save()
-        self.database['latest-session'] = self.database['current-session']
-        self.database['current-session'] = Session()
-        for participant in self.database['streamer'].participants:
-            participant.session_points = 0
-        self.database['streamer'].save()
-        filename = str(datetime.now()).replace(':', '_')
-        file = os.path.join(os.path.curdir, 'reports', filename + '.csv')
-        amazon_s3 = boto3.resource('s3')
-        if not os.path.exists(file):
-            try:
-                os.makedirs(os.path.dirname(file))
-            except OSError as exc:
-                if exc.errno != errno.EEXIST:
-                    raise
-        report_writer = csv.writer(open(file, 'w', newline=''))
-        for guess in self.database['latest-session'].guesses:
-            report_writer.writerow([guess.timestamp, guess.participant, guess.participant_name,
-                                    guess.guess_type, guess.guess, guess.session_points,
-                                    guess.total_points])
-        bucket = amazon_s3.Bucket(os.environ['S3_BUCKET'])
-        bucket.upload_file(file, str(datetime.now()) + '.csv', ExtraArgs={'ACL':'public-read'})
+        session = Session.from_json(self._session_json())
+        self.database['storage'].append_session(session)
+        self.database['latest-session'] = session
+        self.database['session-log'] = []
+        self._save_state()
+        self.ledger.flush()
+        self.database['storage'].record_standings()
+        self.ledger.reset_session()
+        self._write_report(REPORT_LOG, LOG_COLUMNS, (
+            (guess.timestamp, guess.participant, guess.participant_name, guess.guess_type,
+             self._describe_log_entry(guess), guess.session_points, guess.total_points)
+            for guess in self.database['latest-session'].guesses))
         message = 'Guessing game ended by %s' % user['username']
         self.logger.info(message)
         return message
 
+    def _migrate_log_entry(self, entry):
+        kind, order = ('dungeon', MEDAL_ORDER) if entry.guess_type == 'Medal' else (
+            'song', SONG_ORDER)
+        try:
+            names = jstyleson.loads((entry.guess or '').replace('\n', ','))
+        except ValueError:
+            names = None
+        if not isinstance(names, dict) or not any(slot in names for slot in order):
+            self.logger.warning('Could not parse %s log entry %r, leaving it as it is',
+                                kind, entry.guess)
+            return
+        ids = self.code_table.ids[kind]
+        entry.codes = [ids.get(names.get(slot), NONE) for slot in order]
+        entry.code_version = self.code_table.version
+        entry.guess = None
+
+    def _describe_log_entry(self, entry):
+        if entry.codes is None:
+            return entry.guess
+        kind, order = ('dungeon', MEDAL_ORDER) if entry.guess_type == 'Medal' else (
+            'song', SONG_ORDER)
+        if entry.code_version == self.code_table.version:
+            names = self.code_table.names[kind]
+        else:
+            names = (self.database['storage'].get_code_table(entry.code_version) or {}).get(
+                kind, [])
+        return '\n'.join('%s: %s' % (slot, names[code] if code < len(names) else None)
+                         for slot, code in zip(order, entry.codes))
+
     def _check_items_allowed(self, item):
         if any(skip in item for skip in self.guessables['blacklist']):
             return False
@@ -655,53 +1135,85 @@ class GuessingGame():
                 return False
         return True
 
-    @staticmethod
-    def _remove_stale_guesses(guess_queue, username):
-        new_queue = deque()
-        expiration = datetime.now() - timedelta(minutes=15)
-        for guess in guess_queue:
-            if guess['timestamp'] < expiration:
-                continue
-            if guess['username'] == username:
-                continue
-            new_queue.append(guess)
-        return new_queue
-
-    # Integrate with the database in the future
-    def _parse_songs(self, songcode):
-        for item in self.items:
-            if 'name' in item:
-                if not item['name'] in self.guessables['songs']:
-                    continue
-            if 'stages' in item:
-                codes = []
-                for stage in item['stages']:
-                    if 'codes' in stage:
-                        if any(code in stage['codes'].split(',') for code in codes):
-                            continue
-                        for code in stage['codes'].split(','):
-                            codes += [code.strip()]
-                if songcode in codes:
-                    return item['name']
-        return None
-
-    def _parse_item(self, guess):
+    def _build_code_index(self):
+        codes = {
+            "items": {},
+            "songs": {}
+        }
         for item in self.items:
-            if 'name' in item:
-                if not self._check_items_allowed(item['name']):
-                    continue
             if 'codes' in item:
-                for code in item['codes'].split(','):
-                    if guess in [code.strip()]:
-                        return item['name']
+                item_codes = [code.strip() for code in item['codes'].split(',')]
             elif 'stages' in item:
-                codes = []
+                item_codes = []
                 for stage in item['stages']:
                     if 'codes' in stage:
-                        if any(code in stage['codes'].split(',') for code in codes):
+                        if any(code in stage['codes'].split(',') for code in item_codes):
                             continue
                         for code in stage['codes'].split(','):
-                            codes += [code.strip()]
-                if guess in codes:
-                    return item['name']
+                            item_codes += [code.strip()]
+            else:
+                continue
+            for code in item_codes:
+                codes['items'].setdefault(code, [])
+                if item['name'] not in codes['items'][code]:
+                    codes['items'][code].append(item['name'])
+                if 'stages' in item and item['name'] in self.guessables['songs']:
+                    codes['songs'].setdefault(code, item['name'])
+        return codes
+
+    def _build_resolvers(self):
+        resolvers = {}
+        for kind, codes in self.codes.items():
+            entries = {
+                code: names if isinstance(names, list) else [names]
+                for code, names in codes.items()
+            }
+            for names in list(entries.values()):
+                for name in names:
+                    entries.setdefault(name, [name])
+            resolvers[kind] = fuzzy.FuzzyIndex(entries)
+        return resolvers
+
+    # Integrate with the database in the future
+    def _resolve(self, kind, text, exact=False):
+        resolver = self.resolvers[kind]
+        return resolver.lookup(text) if exact else resolver.resolve(text)
+
+    def _parse_songs(self, songcode, exact=False):
+        songs = self._resolve('songs', songcode, exact)
+        return songs[0] if songs else None
+
+    def _parse_item(self, guess, exact=False):
+        for name in self._resolve('items', guess, exact):
+            if self._check_items_allowed(name):
+                return name
         return None
+
+    def _parse_items(self, guesses, limit=None, exact=False):
+        """
+        The function to resolve the words of a guess to items.
+
+        An item may be named by a code or by its full name, so each position is
+        tried with up to MAX_GUESS_WORDS words, longest first. Chatters' guesses
+        may contain typos, but the results mods report must match exactly.
+
+        Parameters:
+            guesses (string[]): The words of the guess
+            limit (int): The most items to return, no limit if None
+            exact (bool): Whether to only accept codes and names without typos
+
+        Returns:
+            Returns a list of distinct allowed item names.
+        """
+        items = []
+        position = 0
+        while position < len(guesses) and (limit is None or len(items) < limit):
+            item = None
+            for end in range(min(len(guesses), position + MAX_GUESS_WORDS), position, -1):
+                item = self._parse_item(' '.join(guesses[position:end]), exact)
+                if item:
+                    break
+            position = end
+            if item and item not in items:
+                items.append(item)
+        return items
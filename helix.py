@@ -0,0 +1,171 @@
+"""This module provides a pooled client for the Twitch Helix API."""
+import logging
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from cachetools import TTLCache
+
+HELIX_URL = 'https://api.twitch.tv/helix'
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class _Call():
+    """This is a class for a request that other threads may be waiting on."""
+    __slots__ = ('done', 'result')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+
+class HelixClient():
+    """
+    This is a class for making requests to the Twitch Helix API.
+
+    Requests share one keep-alive session so connections are reused. Failed
+    requests are retried with jittered exponential backoff, and when the
+    Ratelimit-Remaining header says the bucket is empty requests wait until
+    Ratelimit-Reset. Concurrent lookups of the same user are merged into one
+    request and found user IDs are cached for cache_ttl seconds.
+    """
+    def __init__(self, client_id, token=None, base_url=None, timeout=(3.05, 10), retries=3,
+                 backoff=0.5, cache_ttl=300, cache_size=1024, pool_size=8):
+        """
+        The constructor for HelixClient class.
+
+        Parameters:
+            client_id (string): The Twitch application's client ID
+            token (string): An optional OAuth token sent as a bearer token
+            base_url (string): The API root, HELIX_URL or the Twitch API if not given
+            timeout (tuple): The connect and read timeouts in seconds
+            retries (int): How many times to retry a failed request
+            backoff (float): The base delay in seconds between retries
+            cache_ttl (int): How many seconds to cache user IDs for
+            cache_size (int): The most user IDs to cache
+            pool_size (int): The most connections to keep open
+        """
+        self.logger = logging.getLogger(__name__)
+        self.base_url = (base_url or os.environ.get('HELIX_URL', HELIX_URL)).rstrip('/')
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(pool_maxsize=pool_size))
+        self.session.mount('http://', HTTPAdapter(pool_maxsize=pool_size))
+        self.session.headers['Client-ID'] = client_id
+        if token:
+            self.session.headers['Authorization'] = 'Bearer %s' % token
+        self.lock = threading.Lock()
+        self.cache = TTLCache(cache_size, cache_ttl)
+        self.in_flight = {}
+        self.rate_limit = {"remaining": None, "reset": 0.0}
+
+    def get_user_id(self, username):
+        """
+        The function to look up a user's ID from their username.
+
+        Parameters:
+            username (string): The user's login name
+
+        Returns:
+            Returns the user ID as a string, or None if the user was not found or
+            the API could not be reached.
+        """
+        login = username.lower()
+        with self.lock:
+            user_id = self.cache.get(login)
+            if user_id is not None:
+                return user_id
+            call = self.in_flight.get(login)
+            owner = call is None
+            if owner:
+                call = self.in_flight[login] = _Call()
+        if not owner:
+            call.done.wait()
+            return call.result
+        try:
+            call.result = self._lookup_user(login)
+        finally:
+            with self.lock:
+                del self.in_flight[login]
+                if call.result is not None:
+                    self.cache[login] = call.result
+            call.done.set()
+        return call.result
+
+    def _lookup_user(self, login):
+        response = self.get('users', {'login': login})
+        if response is None:
+            return None
+        users = response.get('data') or []
+        if not users:
+            self.logger.error('User %s not found by Twitch API', login)
+            return None
+        self.logger.debug('Found user ID %s', users[0]['id'])
+        return users[0]['id']
+
+    def get(self, path, params=None):
+        """
+        The function to make a GET request to the Helix API.
+
+        Parameters:
+            path (string): The endpoint path, such as 'users'
+            params (dict): The query string parameters
+
+        Returns:
+            Returns the decoded JSON response, or None if the request failed.
+        """
+        url = '%s/%s' % (self.base_url, path)
+        for attempt in range(self.retries + 1):
+            self._wait_for_rate_limit()
+            delay = self.backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self.logger.warning('Helix request to %s failed: %s', path, e)
+            else:
+                self._update_rate_limit(response)
+                if response.status_code == 429:
+                    delay = max(delay, self.rate_limit['reset'] - time.time())
+                if response.status_code not in RETRY_STATUSES:
+                    if response.status_code != 200:
+                        self.logger.error('Helix request to %s returned %s',
+                                          path, response.status_code)
+                        return None
+                    try:
+                        return response.json()
+                    except ValueError:
+                        self.logger.error('Helix request to %s returned invalid JSON', path)
+                        return None
+                self.logger.warning('Helix request to %s returned %s',
+                                    path, response.status_code)
+            if attempt < self.retries:
+                time.sleep(delay)
+        self.logger.error('Giving up on Helix request to %s', path)
+        return None
+
+    def _wait_for_rate_limit(self):
+        with self.lock:
+            remaining = self.rate_limit['remaining']
+            wait = self.rate_limit['reset'] - time.time()
+            if remaining is not None:
+                self.rate_limit['remaining'] = remaining - 1
+        if remaining is not None and remaining <= 0 and wait > 0:
+            self.logger.info('Helix rate limit reached, waiting %.1f seconds', wait)
+            time.sleep(wait)
+
+    def _update_rate_limit(self, response):
+        remaining = response.headers.get('Ratelimit-Remaining')
+        reset = response.headers.get('Ratelimit-Reset')
+        if remaining is None or reset is None:
+            return
+        with self.lock:
+            try:
+                self.rate_limit['remaining'] = int(remaining)
+                self.rate_limit['reset'] = float(reset)
+            except ValueError:
+                self.logger.warning('Invalid Helix rate limit headers')
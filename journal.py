@@ -0,0 +1,196 @@
+"""This module provides an append-only journal of guessing game events."""
+import logging
+import os
+import errno
+import json
+import mmap
+import struct
+import time
+from collections import OrderedDict
+
+import clocks
+
+MAGIC = b'GGJ1'
+RECORD_HEADER = struct.Struct('<IBd')
+
+START = 1
+GUESS = 2
+HUD = 3
+MEDAL = 4
+SONG = 5
+AWARD = 6
+EXPIRE = 7
+MODE = 8
+FINISH = 9
+
+EVENT_NAMES = {
+    START: 'start',
+    GUESS: 'guess',
+    HUD: 'hud',
+    MEDAL: 'medal',
+    SONG: 'song',
+    AWARD: 'award',
+    EXPIRE: 'expire',
+    MODE: 'mode',
+    FINISH: 'finish'
+}
+
+
+def session_path(channel_id, directory=None, clock=None):
+    """Returns the path of a new journal file for a session starting now."""
+    if directory is None:
+        directory = os.environ.get('JOURNAL_DIR', os.path.join(os.path.curdir, 'journals'))
+    filename = (clock or clocks.SYSTEM).now().strftime('%Y%m%d-%H%M%S') + '.journal'
+    return os.path.join(directory, str(channel_id), filename)
+
+
+class JournalWriter():
+    """
+    This is a class for appending events to a journal file.
+
+    Each record is a length, an event type and a wall clock timestamp followed by
+    a JSON payload. Every record is flushed to the file as it is appended, and
+    records are fsynced as a group once sync_every records are pending or
+    sync_interval seconds have passed since the last fsync. A record left partly
+    written by a crash is cut off when the journal is opened again, so new
+    records start where the last complete one ends.
+    """
+    def __init__(self, path, sync_every=64, sync_interval=1.0, clock=None):
+        """The constructor for JournalWriter class."""
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+        self.clock = clock or clocks.SYSTEM
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        try:
+            os.makedirs(os.path.dirname(path))
+        except OSError as exc:
+            if exc.errno != errno.EEXIST:
+                raise
+        self.file = open(path, 'ab')
+        size = self.file.tell()
+        if size < len(MAGIC):
+            self.file.truncate(0)
+            self.file.write(MAGIC)
+            self.file.flush()
+        else:
+            end = JournalReader(path).complete_end()
+            if end < size:
+                self.logger.warning('Cutting %s bytes of a partly written record off %s',
+                                    size - end, path)
+                self.file.truncate(end)
+        self.pending = 0
+        self.last_sync = time.monotonic()
+
+    def append(self, event, data):
+        """
+        The function to append an event to the journal.
+
+        Parameters:
+            event (int): The event type
+            data (dict): The JSON serializable event payload
+        """
+        payload = json.dumps(data, separators=(',', ':')).encode('utf-8')
+        self.file.write(RECORD_HEADER.pack(len(payload), event, self.clock.time()))
+        self.file.write(payload)
+        self.file.flush()
+        self.pending += 1
+        if (self.pending >= self.sync_every
+                or time.monotonic() - self.last_sync >= self.sync_interval):
+            self.sync()
+
+    def sync(self):
+        """The function to fsync any pending records."""
+        if not self.pending:
+            return
+        os.fsync(self.file.fileno())
+        self.logger.debug('Synced %s journal records', self.pending)
+        self.pending = 0
+        self.last_sync = time.monotonic()
+
+    def close(self):
+        """The function to sync and close the journal file."""
+        self.sync()
+        self.file.close()
+
+
+class JournalReader():
+    """This is a class for scanning a journal file through a memory map."""
+    def __init__(self, path):
+        """The constructor for JournalReader class."""
+        self.path = path
+
+    def read_from(self, offset=len(MAGIC)):
+        """
+        The function to read the records written after an offset.
+
+        A record that is only partly written is left for the next call, so a
+        caller can tail a journal by passing back the last offset it saw.
+
+        Parameters:
+            offset (int): The byte offset of the first record to read
+
+        Returns:
+            Returns a generator of (offset, event, timestamp, data) tuples where
+            offset is the position just past the record.
+        """
+        with open(self.path, 'rb') as file:
+            size = os.fstat(file.fileno()).st_size
+            if size <= offset:
+                return
+            with mmap.mmap(file.fileno(), size, access=mmap.ACCESS_READ) as journal:
+                if journal[:len(MAGIC)] != MAGIC:
+                    raise ValueError('%s is not a journal file' % self.path)
+                while offset + RECORD_HEADER.size <= size:
+                    length, event, timestamp = RECORD_HEADER.unpack_from(journal, offset)
+                    end = offset + RECORD_HEADER.size + length
+                    if end > size:
+                        return
+                    data = json.loads(journal[offset + RECORD_HEADER.size:end].decode('utf-8'))
+                    offset = end
+                    yield offset, event, timestamp, data
+
+    def complete_end(self):
+        """
+        The function to find where the last complete record ends.
+
+        Returns:
+            Returns the byte offset just past the last complete record, or just past
+            the header if there are none.
+
+        Raises:
+            ValueError: The file is not a journal.
+        """
+        with open(self.path, 'rb') as file:
+            if file.read(len(MAGIC)) != MAGIC:
+                raise ValueError('%s is not a journal file' % self.path)
+        end = len(MAGIC)
+        records = self.read_from()
+        while True:
+            try:
+                end = next(records)[0]
+            except StopIteration:
+                return end
+            except ValueError:
+                # The payload of a torn record that happened to fit is not JSON
+                return end
+
+    def __iter__(self):
+        for _, event, timestamp, data in self.read_from():
+            yield event, timestamp, data
+
+    def points_totals(self):
+        """
+        The function to rebuild the points earned during the session.
+
+        Returns:
+            Returns an OrderedDict mapping user IDs to [username, points] in the
+            order users were first awarded points.
+        """
+        totals = OrderedDict()
+        for event, _, data in self:
+            if event != AWARD:
+                continue
+            total = totals.setdefault(data['user-id'], [data['username'], 0])
+            total[1] += data['points']
+        return totals
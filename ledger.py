@@ -0,0 +1,174 @@
+"""This module provides an in-memory ledger of participants' points."""
+import logging
+import os
+import time
+import threading
+from collections import OrderedDict
+
+import journal
+import clocks
+
+
+def ledger_path(channel_id, directory=None):
+    """Returns the path of the ledger journal for a channel."""
+    if directory is None:
+        directory = os.environ.get('LEDGER_DIR', os.path.join(os.path.curdir, 'ledger'))
+    return os.path.join(directory, '%s.ledger' % channel_id)
+
+
+class PointsLedger():
+    """
+    This is a class for keeping participants' points in memory.
+
+    Awards are added to the balances held in memory straight away and gathered
+    as per-participant deltas, which flush writes to storage as one update
+    every few seconds rather than one write per award. Every award is first
+    appended to a local journal and fsynced, numbered with a sequence number
+    that storage records in the same update as the points. After a crash the
+    awards in the journal that storage has not recorded are applied again, and
+    the journal is emptied after every flush.
+    """
+    def __init__(self, storage, path=None, clock=None):
+        """
+        The constructor for PointsLedger class.
+
+        Parameters:
+            storage (Storage): The storage backend bound to the streamer's channel
+            path (string): The path of the ledger journal
+            clock (Clock): The clock the flush lag is measured on, the system's if None
+        """
+        self.logger = logging.getLogger(__name__)
+        self.storage = storage
+        self.clock = clock or clocks.SYSTEM
+        self.path = path or ledger_path(storage.channel_id)
+        self.lock = threading.RLock()
+        self.pending = OrderedDict()
+        self.balances = {}
+        self.names = {}
+        self.oldest = None
+        self.sequence = self.flushed = storage.ledger_sequence()
+        self.metrics = {
+            "flushes": 0,
+            "flush-lag": 0.0,
+            "flush-time": 0.0
+        }
+        # Opening the writer first cuts off an award left partly written by a crash
+        self.writer = journal.JournalWriter(self.path, clock=self.clock)
+        recovered = self._recover()
+        if recovered:
+            self.logger.warning('Recovered %s unflushed point awards from %s', recovered,
+                                self.path)
+            self.flush()
+
+    def _recover(self):
+        recovered = 0
+        for event, _, data in journal.JournalReader(self.path):
+            if event != journal.AWARD or data['sequence'] <= self.flushed:
+                continue
+            self._add(data['user-id'], data['username'], data['points'])
+            self.sequence = max(self.sequence, data['sequence'])
+            recovered += 1
+        return recovered
+
+    def _add(self, user_id, username, points):
+        delta = self.pending.setdefault(user_id, [username, 0])
+        delta[1] += points
+        if self.oldest is None:
+            self.oldest = self.clock.monotonic()
+        participant = self.balances.get(user_id)
+        if participant is not None:
+            participant.session_points += points
+            participant.total_points += points
+
+    def _cache(self, participant):
+        if participant is None:
+            return None
+        delta = self.pending.get(participant.user_id)
+        if delta:
+            participant.session_points += delta[1]
+            participant.total_points += delta[1]
+        self.balances[participant.user_id] = participant
+        self.names[participant.username] = participant.user_id
+        return participant
+
+    def award(self, awards):
+        """
+        The function to add points to participants' balances.
+
+        Parameters:
+            awards (dict): A mapping of user IDs to [username, points]
+        """
+        with self.lock:
+            for user_id, (username, points) in awards.items():
+                if not points:
+                    continue
+                self.sequence += 1
+                self.writer.append(journal.AWARD, {
+                    "sequence": self.sequence,
+                    "user-id": user_id,
+                    "username": username,
+                    "points": points
+                })
+                self._add(user_id, username, points)
+            self.writer.sync()
+
+    def get_participant(self, user_id):
+        """Returns the participant with the given user ID, with up to date points, or None."""
+        with self.lock:
+            participant = self.balances.get(int(user_id))
+            if participant is None:
+                participant = self._cache(self.storage.get_participant(user_id))
+            return participant
+
+    def find_participant(self, username):
+        """Returns the participant with the given username, with up to date points, or None."""
+        with self.lock:
+            user_id = self.names.get(username)
+            if user_id is not None:
+                return self.balances[user_id]
+            return self._cache(self.storage.find_participant(username))
+
+    def add_participant(self, user_id, username):
+        """Creates a participant with no points and returns it."""
+        with self.lock:
+            return self._cache(self.storage.add_participant(user_id, username))
+
+    def flush(self):
+        """
+        The function to write the pending deltas to storage in one update.
+
+        Returns:
+            Returns the number of participants whose points were written.
+        """
+        with self.lock:
+            if not self.pending:
+                return 0
+            start = time.monotonic()
+            self.storage.award_points(
+                OrderedDict((user_id, delta[1]) for user_id, delta in self.pending.items()),
+                self.sequence)
+            count = len(self.pending)
+            self.metrics['flushes'] += 1
+            self.metrics['flush-lag'] = self.clock.monotonic() - self.oldest
+            self.metrics['flush-time'] = time.monotonic() - start
+            self.flushed = self.sequence
+            self.pending = OrderedDict()
+            self.oldest = None
+            self.writer.close()
+            open(self.path, 'wb').close()
+            self.writer = journal.JournalWriter(self.path, clock=self.clock)
+        self.logger.debug('Flushed points for %s participants', count)
+        return count
+
+    def reset_session(self):
+        """The function to flush the pending deltas and set every session's points to 0."""
+        with self.lock:
+            self.flush()
+            self.storage.reset_session_points()
+            for participant in self.balances.values():
+                participant.session_points = 0
+
+    def lag(self):
+        """Returns how many seconds the oldest unflushed award has been waiting."""
+        oldest = self.oldest
+        return self.clock.monotonic() - oldest if oldest is not None else 0.0
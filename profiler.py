@@ -0,0 +1,102 @@
+"""This module provides an on-demand sampling profiler for the bot."""
+import logging
+import os
+import errno
+import sys
+import threading
+import time
+from collections import Counter
+
+MAX_DURATION = 300
+
+
+class SamplingProfiler():
+    """
+    This is a class for sampling the stacks of the bot's threads.
+
+    Nothing runs until start is called. A daemon thread then samples the stack
+    of every other thread at a fixed rate for the requested number of seconds
+    and writes the samples in collapsed-stack format, one line per unique stack,
+    ready for flamegraph.pl or speedscope. Each stack is rooted at the tag its
+    thread had when it was sampled, which the bot sets to the running command.
+    """
+    def __init__(self, rate=None, directory=None):
+        """
+        The constructor for SamplingProfiler class.
+
+        Parameters:
+            rate (int): Samples per second, PROFILE_RATE or 100 if not given
+            directory (string): Where to write profiles, PROFILE_DIR or ./profiles
+        """
+        self.logger = logging.getLogger(__name__)
+        self.rate = rate or int(os.environ.get('PROFILE_RATE', 100))
+        self.directory = directory or os.environ.get(
+            'PROFILE_DIR', os.path.join(os.path.curdir, 'profiles'))
+        self.tags = {}
+        self.sampler = None
+
+    def tag(self, tag):
+        """Sets the tag for samples of the calling thread, None to clear it."""
+        if tag is None:
+            self.tags.pop(threading.get_ident(), None)
+        else:
+            self.tags[threading.get_ident()] = tag
+
+    @property
+    def running(self):
+        """Returns True while a profile is being taken."""
+        return self.sampler is not None and self.sampler.is_alive()
+
+    def start(self, duration):
+        """
+        The function to start profiling.
+
+        Parameters:
+            duration (float): How many seconds to profile for, capped at MAX_DURATION
+
+        Returns:
+            Returns False if a profile is already being taken, otherwise True.
+        """
+        if self.running:
+            self.logger.info('Profiler already running')
+            return False
+        duration = min(max(duration, 0), MAX_DURATION)
+        self.sampler = threading.Thread(
+            target=self._sample, args=(duration,), name='profiler', daemon=True)
+        self.sampler.start()
+        self.logger.info('Profiling for %s seconds at %s Hz', duration, self.rate)
+        return True
+
+    def _sample(self, duration):
+        samples = Counter()
+        interval = 1.0 / self.rate
+        deadline = time.monotonic() + duration
+        sampler_id = threading.get_ident()
+        while time.monotonic() < deadline:
+            frames = sys._current_frames() #pylint: disable=protected-access
+            for thread_id, frame in frames.items():
+                if thread_id == sampler_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append('%s (%s:%s)' % (
+                        code.co_name, os.path.basename(code.co_filename), code.co_firstlineno))
+                    frame = frame.f_back
+                stack.append(self.tags.get(thread_id, 'idle'))
+                samples[';'.join(reversed(stack))] += 1
+            del frames
+            time.sleep(interval)
+        self._write(samples)
+
+    def _write(self, samples):
+        try:
+            os.makedirs(self.directory)
+        except OSError as exc:
+            if exc.errno != errno.EEXIST:
+                raise
+        path = os.path.join(self.directory, time.strftime('%Y%m%d-%H%M%S') + '.folded')
+        with open(path, 'w') as profile:
+            for stack, count in samples.most_common():
+                profile.write('%s %s\n' % (stack, count))
+        self.logger.info('Wrote %s samples to %s', sum(samples.values()), path)
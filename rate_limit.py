@@ -0,0 +1,149 @@
+"""This module provides ingress rate limiting and load shedding for chat commands."""
+import logging
+import time
+from collections import Counter, OrderedDict
+
+ACCEPT = 'accept'
+DEFER = 'defer'
+DROP = 'drop'
+
+
+class TokenBucket():
+    """This is a class for a token bucket refilled at a fixed rate."""
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate, capacity, now):
+        """The constructor for TokenBucket class."""
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, now):
+        """Returns True and removes a token if one is available."""
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def full(self, now):
+        """Returns True if the bucket would be full at the given time."""
+        return self.tokens + (now - self.updated) * self.rate >= self.capacity
+
+
+class RateLimiter():
+    """
+    This is a class for limiting commands per user and per command.
+
+    Each user gets a token bucket per command. Commands listed as mergeable are
+    not dropped when a user runs out of tokens; only the latest one is kept and
+    handed back by flush once the merge window has passed. A global bucket
+    detects overload, during which low priority commands are shed outright.
+    """
+    def __init__(self, rate=0.5, burst=3, merge_window=2.0, overload_rate=50,
+                 overload_cooldown=10.0, mergeable=None):
+        """The constructor for RateLimiter class."""
+        self.logger = logging.getLogger(__name__)
+        self.rate = rate
+        self.burst = burst
+        self.merge_window = merge_window
+        self.overload_cooldown = overload_cooldown
+        self.mergeable = mergeable or ['!guess']
+        self.buckets = {}
+        self.deferred = OrderedDict()
+        self.overload = {
+            "bucket": TokenBucket(overload_rate, overload_rate, time.monotonic()),
+            "until": 0.0
+        }
+        self.shed = Counter()
+
+    def overloaded(self, now=None):
+        """Returns True while the limiter is shedding low priority commands."""
+        if now is None:
+            now = time.monotonic()
+        return now < self.overload['until']
+
+    def admit(self, user_id, command_name, low_priority=False):
+        """
+        The function to decide what to do with an incoming command.
+
+        Parameters:
+            user_id (string): The Twitch user ID of the sender
+            command_name (string): The lowercased command name
+            low_priority (bool): Whether the command may be shed under overload
+
+        Returns:
+            Returns ACCEPT if the command should run now, DEFER if the caller should
+            hand it to defer, or DROP if it should be discarded.
+        """
+        now = time.monotonic()
+        if not self.overload['bucket'].take(now):
+            if not self.overloaded(now):
+                self.logger.info('Entering overload mode, shed so far: %s', dict(self.shed))
+            self.overload['until'] = now + self.overload_cooldown
+        if low_priority and self.overloaded(now):
+            self.shed['overload ' + command_name] += 1
+            return DROP
+        key = (user_id, command_name)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = TokenBucket(self.rate, self.burst, now)
+        if key not in self.deferred and bucket.take(now):
+            return ACCEPT
+        if command_name in self.mergeable:
+            return DEFER
+        self.shed['limit ' + command_name] += 1
+        return DROP
+
+    def defer(self, user_id, command_name, command):
+        """
+        The function to hold a command until the merge window passes.
+
+        A command of the same name already held for the user is replaced, so
+        only the latest one is run. The user's other commands are not held.
+
+        Parameters:
+            user_id (string): The Twitch user ID of the sender
+            command_name (string): The lowercased command name
+            command (object): The command to hand back from flush
+        """
+        key = (user_id, command_name)
+        if key in self.deferred:
+            deadline = self.deferred[key][0]
+            self.shed['merged'] += 1
+        else:
+            deadline = time.monotonic() + self.merge_window
+        self.deferred[key] = (deadline, command)
+
+    def flush(self):
+        """
+        The function to release held commands whose merge window has passed.
+
+        Returns:
+            Returns a list of the released commands in the order they were held.
+        """
+        now = time.monotonic()
+        released = []
+        while self.deferred:
+            key, (deadline, command) = next(iter(self.deferred.items()))
+            if deadline > now:
+                break
+            del self.deferred[key]
+            released.append(command)
+        for key in [key for key, bucket in self.buckets.items() if bucket.full(now)]:
+            del self.buckets[key]
+        return released
+
+    def stats(self):
+        """Returns a dictionary of shed counters and limiter state."""
+        return {
+            "shed": dict(self.shed),
+            "deferred": len(self.deferred),
+            "buckets": len(self.buckets),
+            "overloaded": self.overloaded()
+        }
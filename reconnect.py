@@ -0,0 +1,153 @@
+"""This module provides reconnecting to Twitch chat quickly after a disconnect."""
+import logging
+import random
+import time
+from collections import deque
+from datetime import datetime
+
+import irc.bot
+
+
+class TwitchReconnect(irc.bot.ReconnectStrategy):
+    """
+    This is a class for scheduling reconnect attempts with exponential backoff.
+
+    The first retry is made within first_interval seconds, under a second by
+    default, and each retry after that waits twice as long as the one before,
+    up to max_interval. The waits are jittered so bots dropped together do not
+    retry together. The count of attempts is reset once the bot is back in its
+    channel.
+    """
+    def __init__(self, first_interval=0.5, max_interval=30):
+        """
+        The constructor for TwitchReconnect class.
+
+        Parameters:
+            first_interval (float): The longest wait in seconds before the first retry
+            max_interval (float): The longest wait in seconds between retries
+        """
+        self.logger = logging.getLogger(__name__)
+        self.first_interval = first_interval
+        self.max_interval = max_interval
+        self.attempts = 0
+        self.scheduled = False
+        self.bot = None
+
+    def next_interval(self):
+        """Returns how many seconds to wait before the next attempt."""
+        interval = min(self.first_interval * 2 ** self.attempts, self.max_interval)
+        self.attempts += 1
+        return interval * random.uniform(0.5, 1)
+
+    def run(self, bot):
+        """The function to schedule a reconnect attempt unless one is already scheduled."""
+        self.bot = bot
+        if self.scheduled:
+            return
+        self.scheduled = True
+        interval = self.next_interval()
+        self.logger.info('Reconnecting in %.2f seconds', interval)
+        bot.reactor.scheduler.execute_after(interval, self.check)
+
+    def check(self):
+        """The function to reconnect if the bot is still disconnected."""
+        self.scheduled = False
+        if not self.bot.connection.is_connected():
+            self.bot.reconnect()
+
+    def reset(self):
+        """The function to start the backoff over after a successful reconnect."""
+        self.attempts = 0
+
+
+class GapLog():
+    """
+    This is a class for timing the gaps in chat while the bot is disconnected.
+
+    A gap starts when the connection to chat is lost or Twitch asks the bot to
+    reconnect, and ends once the bot has joined its channel again. The most
+    recent gaps are kept along with running totals.
+    """
+    def __init__(self, size=20):
+        """
+        The constructor for GapLog class.
+
+        Parameters:
+            size (int): How many of the most recent gaps to keep
+        """
+        self.started = None
+        self.gaps = deque(maxlen=size)
+        self.metrics = {
+            "gaps": 0,
+            "total": 0.0,
+            "longest": 0.0
+        }
+
+    def start(self):
+        """The function to mark the start of a gap, unless one has already started."""
+        if self.started is None:
+            self.started = time.monotonic()
+
+    def end(self):
+        """
+        The function to mark the end of the current gap.
+
+        Returns:
+            Returns the length of the gap in seconds, or None if there was no gap.
+        """
+        if self.started is None:
+            return None
+        gap = time.monotonic() - self.started
+        self.started = None
+        self.gaps.append((datetime.now(), gap))
+        self.metrics['gaps'] += 1
+        self.metrics['total'] += gap
+        self.metrics['longest'] = max(self.metrics['longest'], gap)
+        return gap
+
+    def in_gap(self):
+        """Returns whether the bot is disconnected from chat."""
+        return self.started is not None
+
+    def describe(self):
+        """Returns the gap metrics formatted for chat."""
+        if not self.gaps:
+            return 'No disconnects since start'
+        return '%s disconnects, last %.2f s at %s, longest %.2f s, total %.2f s' % (
+            self.metrics['gaps'], self.gaps[-1][1], self.gaps[-1][0].strftime('%H:%M:%S'),
+            self.metrics['longest'], self.metrics['total'])
+
+
+class RecentIds():
+    """
+    This is a class for recognising chat messages that were already received.
+
+    While a new connection takes over from an old one, both can be sent the
+    same message. Twitch gives every message a unique id tag, and the most
+    recent ids are remembered so the copy is dropped.
+    """
+    def __init__(self, size=512):
+        """
+        The constructor for RecentIds class.
+
+        Parameters:
+            size (int): How many of the most recent ids to remember
+        """
+        self.order = deque()
+        self.ids = set()
+        self.size = size
+
+    def add(self, message_id):
+        """
+        The function to remember a message id.
+
+        Returns:
+            Returns False if the id was already remembered, otherwise True.
+        """
+        if message_id in self.ids:
+            return False
+        self.ids.add(message_id)
+        self.order.append(message_id)
+        if len(self.order) > self.size:
+            self.ids.discard(self.order.popleft())
+        return True
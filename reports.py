@@ -0,0 +1,129 @@
+"""This module provides streamed writing of reports in several formats."""
+import os
+import errno
+import csv
+import gzip
+import json
+import shutil
+import tempfile
+from datetime import datetime
+from collections import OrderedDict
+
+FORMATS = {
+    "csv": '.csv',
+    "jsonl": '.jsonl.gz',
+    "columns": '.columns.json.gz'
+}
+REPORT_LOG = 'log'
+REPORT_SESSION = 'session'
+REPORT_TOTALS = 'totals'
+REPORT_TOP = 'top'
+REPORT_STANDINGS = 'standings'
+REPORT_DELTAS = 'deltas'
+# Every type of report the game uploads, with the label the report index shows for it
+REPORT_TYPES = OrderedDict([
+    (REPORT_LOG, 'Session logs'),
+    (REPORT_SESSION, 'Session points'),
+    (REPORT_TOTALS, 'Point totals'),
+    (REPORT_TOP, 'Top participants'),
+    (REPORT_STANDINGS, 'Standings'),
+    (REPORT_DELTAS, 'Standings changes')
+])
+
+
+def report_path(name, file_format, directory=None):
+    """Returns a new path in the reports directory for a report of a given name and format."""
+    if directory is None:
+        directory = os.path.join(os.path.curdir, 'reports')
+    try:
+        os.makedirs(directory)
+    except OSError as exc:
+        if exc.errno != errno.EEXIST:
+            raise
+    filename = '%s %s%s' % (str(datetime.now()).replace(':', '_'), name, FORMATS[file_format])
+    return os.path.join(directory, filename)
+
+
+def _json_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+ENCODER = json.JSONEncoder(separators=(',', ':'), default=_json_value)
+
+
+def write_csv(path, columns, rows):
+    """The function to write rows to a CSV file with a header row."""
+    count = 0
+    with open(path, 'w', newline='') as report:
+        writer = csv.writer(report)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def write_jsonl(path, columns, rows):
+    """The function to write rows to a gzip compressed file of JSON objects, one per line."""
+    count = 0
+    with gzip.open(path, 'wt', encoding='utf-8') as report:
+        for row in rows:
+            report.write(ENCODER.encode(dict(zip(columns, row))) + '\n')
+            count += 1
+    return count
+
+
+def write_columns(path, columns, rows):
+    """
+    The function to write rows column by column to a gzip compressed JSON file.
+
+    The file holds one object with the row count and a list of values per
+    column. Each column is spilled to its own temporary file while the rows are
+    read and the spills are joined at the end, so only one row is held in
+    memory at a time.
+    """
+    spills = [tempfile.TemporaryFile(mode='w+', encoding='utf-8') for _ in columns]
+    count = 0
+    try:
+        for row in rows:
+            separator = ',' if count else ''
+            for spill, value in zip(spills, row):
+                spill.write(separator + ENCODER.encode(value))
+            count += 1
+        with gzip.open(path, 'wt', encoding='utf-8') as report:
+            report.write('{"rows":%s,"columns":{' % count)
+            for number, (column, spill) in enumerate(zip(columns, spills)):
+                report.write('%s%s:[' % (',' if number else '', json.dumps(column)))
+                spill.seek(0)
+                shutil.copyfileobj(spill, report)
+                report.write(']')
+            report.write('}}')
+    finally:
+        for spill in spills:
+            spill.close()
+    return count
+
+
+WRITERS = {
+    "csv": write_csv,
+    "jsonl": write_jsonl,
+    "columns": write_columns
+}
+
+
+def write_report(path, columns, rows, file_format='csv'):
+    """
+    The function to write a report from an iterator of rows.
+
+    Parameters:
+        path (string): The file to write
+        columns (string[]): The names of the columns
+        rows (iterable): Tuples of values in the order of columns
+        file_format (string): 'csv', 'jsonl' or 'columns'
+
+    Returns:
+        Returns the number of rows written.
+    """
+    return WRITERS[file_format](path, columns, rows)
@@ -0,0 +1,270 @@
+"""This module provides crash-safe snapshots of an in-flight guessing game."""
+import logging
+import os
+import errno
+import json
+import time
+import zlib
+from datetime import datetime
+from collections import OrderedDict
+
+from database.game_state import GameState
+from guesses import Guess, monotonic_seconds
+import clocks
+
+# Version 1 snapshots held each pending guess as a dict with its times in
+# epoch seconds and carried no version. Version 2 holds them as Guess records.
+SNAPSHOT_VERSION = 2
+
+
+class DiskSnapshotStore():
+    """This is a class for keeping game snapshots and deltas on local disk."""
+    def __init__(self, channel_id, directory):
+        self.paths = {
+            "snapshot": os.path.join(directory, '%s.snapshot' % channel_id),
+            "deltas": os.path.join(directory, '%s.deltas' % channel_id)
+        }
+        try:
+            os.makedirs(directory)
+        except OSError as exc:
+            if exc.errno != errno.EEXIST:
+                raise
+
+    def write_snapshot(self, data):
+        """Atomically replaces the snapshot and truncates the delta log."""
+        temp = self.paths['snapshot'] + '.tmp'
+        with open(temp, 'wb') as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp, self.paths['snapshot'])
+        open(self.paths['deltas'], 'wb').close()
+
+    def append_delta(self, data):
+        """Appends a single delta to the delta log."""
+        with open(self.paths['deltas'], 'ab') as file:
+            file.write(data + b'\n')
+
+    def load(self):
+        """Returns the stored snapshot and the deltas written after it."""
+        snapshot = None
+        deltas = []
+        if os.path.exists(self.paths['snapshot']):
+            with open(self.paths['snapshot'], 'rb') as file:
+                snapshot = file.read()
+        if os.path.exists(self.paths['deltas']):
+            with open(self.paths['deltas'], 'rb') as file:
+                deltas = [line for line in file.read().split(b'\n') if line]
+        return snapshot, deltas
+
+
+class MongoSnapshotStore():
+    """This is a class for keeping game snapshots and deltas in MongoDB."""
+    def __init__(self, channel_id):
+        self.channel_id = channel_id
+
+    def write_snapshot(self, data):
+        """Replaces the snapshot and clears the delta log in one update."""
+        GameState.objects(channel_id=self.channel_id).update_one( #pylint: disable=no-member
+            set__snapshot=data, set__deltas=[], set__updated=datetime.now(), upsert=True)
+
+    def append_delta(self, data):
+        """Appends a single delta to the delta log."""
+        GameState.objects(channel_id=self.channel_id).update_one( #pylint: disable=no-member
+            push__deltas=data, set__updated=datetime.now(), upsert=True)
+
+    def load(self):
+        """Returns the stored snapshot and the deltas written after it."""
+        try:
+            state = GameState.objects.get(channel_id=self.channel_id) #pylint: disable=no-member
+        except GameState.DoesNotExist: #pylint: disable=no-member
+            return None, []
+        return state.snapshot, list(state.deltas)
+
+
+class GameSnapshot():
+    """
+    This is a class for persisting and restoring the state of a GuessingGame.
+
+    A full snapshot is written at most once per interval, or sooner once the delta
+    log holds max_deltas entries. Guesses made in between are appended to the delta
+    log so a restart only has to load one snapshot and replay a short log.
+
+    The session log only ever grows during a race, so it is compressed as it
+    grows rather than with every snapshot. Each snapshot is the compressed state
+    followed by a copy of the session log's compressed stream, flushed.
+
+    load returns the state with its format version. The pending guesses of a
+    version 1 snapshot and its deltas are returned as dicts for the game to
+    convert.
+    """
+    def __init__(self, channel_id, store=None, interval=30, max_deltas=500, clock=None):
+        """The constructor for GameSnapshot class."""
+        self.logger = logging.getLogger(__name__)
+        if store is None:
+            store = self._default_store(channel_id)
+        self.store = store
+        self.interval = interval
+        self.max_deltas = max_deltas
+        self.clock = clock or clocks.SYSTEM
+        self.last_saved = self.clock.monotonic()
+        self.deltas = 0
+        self.session = {
+            "entries": None,
+            "count": 0,
+            "stream": None,
+            "compressed": []
+        }
+        self.metrics = {
+            "snapshots": 0,
+            "snapshot-bytes": 0,
+            "snapshot-seconds": 0.0,
+            "delta-bytes": 0,
+            "restore-seconds": 0.0
+        }
+
+    @staticmethod
+    def _default_store(channel_id):
+        default = 'disk' if os.environ.get('STORAGE_BACKEND') == 'sqlite' else 'mongo'
+        if os.environ.get('SNAPSHOT_STORE', default) == 'disk':
+            directory = os.environ.get(
+                'SNAPSHOT_DIR', os.path.join(os.path.curdir, 'snapshots'))
+            return DiskSnapshotStore(channel_id, directory)
+        return MongoSnapshotStore(channel_id)
+
+    def record_guess(self, guess_type, guess, log_entry):
+        """
+        The function to append a guess to the delta log.
+
+        Parameters:
+            guess_type (string): The guess queue the guess was added to
+            guess (dict): The pending guess
+            log_entry (string): The session log entry written for the guess, as JSON
+        """
+        delta = {
+            "type": guess_type,
+            "guess": encode_guess(guess, self.clock),
+            "log": log_entry
+        }
+        data = json.dumps(delta, separators=(',', ':')).encode('utf-8')
+        self.store.append_delta(data)
+        self.deltas += 1
+        self.metrics['delta-bytes'] += len(data)
+        if self.deltas >= self.max_deltas:
+            self.logger.debug('Delta log full, writing snapshot')
+            return True
+        return False
+
+    def due(self):
+        """Returns True if there are deltas older than the snapshot interval."""
+        return self.deltas > 0 and self.clock.monotonic() - self.last_saved >= self.interval
+
+    def _compress_session(self, entries):
+        session = self.session
+        if entries is not session['entries'] or len(entries) < session['count']:
+            session['entries'] = entries
+            session['count'] = 0
+            session['stream'] = zlib.compressobj()
+            session['compressed'] = []
+        new = entries[session['count']:]
+        if new:
+            text = ', '.join(new)
+            if session['count']:
+                text = ', ' + text
+            session['compressed'].append(session['stream'].compress(text.encode('utf-8')))
+            session['count'] = len(entries)
+        return b''.join(session['compressed']) + session['stream'].copy().flush()
+
+    def save(self, state):
+        """
+        The function to write a full snapshot.
+
+        Parameters:
+            state (dict): The serializable state returned by GuessingGame, with the
+                session log as a list of its entries as JSON
+        """
+        start = time.perf_counter()
+        state = dict(state)
+        state['version'] = SNAPSHOT_VERSION
+        state['guesses'] = {
+            guess_type: [encode_guess(guess, self.clock) for guess in guesses]
+            for guess_type, guesses in state['guesses'].items()
+        }
+        session = self._compress_session(state.pop('session'))
+        data = zlib.compress(json.dumps(state, separators=(',', ':')).encode('utf-8')) + session
+        self.store.write_snapshot(data)
+        elapsed = time.perf_counter() - start
+        self.last_saved = self.clock.monotonic()
+        self.deltas = 0
+        self.metrics['snapshots'] += 1
+        self.metrics['snapshot-bytes'] = len(data)
+        self.metrics['snapshot-seconds'] = elapsed
+        self.logger.debug('Wrote %s byte snapshot in %.2f ms', len(data), elapsed * 1000)
+
+    def load(self):
+        """
+        The function to load the latest snapshot and its deltas.
+
+        Returns:
+            Returns a tuple of the snapshot state, or None if there is no snapshot,
+            and a list of the deltas written after it.
+        """
+        start = time.perf_counter()
+        data, raw_deltas = self.store.load()
+        if data is None:
+            return None, []
+        decompressor = zlib.decompressobj()
+        state = json.loads(decompressor.decompress(data).decode('utf-8'),
+                           object_pairs_hook=OrderedDict)
+        # Snapshots written before the session log was compressed on its own
+        # hold it in the state
+        if 'session' not in state:
+            state['session'] = '{"guesses": [%s]}' % zlib.decompress(
+                decompressor.unused_data).decode('utf-8')
+        deltas = [json.loads(raw_delta.decode('utf-8'), object_pairs_hook=OrderedDict)
+                  for raw_delta in raw_deltas]
+        if 'version' not in state:
+            state['version'] = snapshot_version(state, deltas)
+        decode = decode_guess if state['version'] >= 2 else decode_legacy_guess
+        for delta in deltas:
+            delta['guess'] = decode(delta['guess'], self.clock)
+        for guess_type in state['guesses']:
+            state['guesses'][guess_type] = [
+                decode(guess, self.clock) for guess in state['guesses'][guess_type]]
+        self.deltas = len(deltas)
+        self.metrics['restore-seconds'] = time.perf_counter() - start
+        self.logger.info('Loaded snapshot with %s deltas in %.2f ms',
+                         len(deltas), self.metrics['restore-seconds'] * 1000)
+        return state, deltas
+
+
+def encode_guess(guess, clock=None):
+    """Returns a pending guess as a JSON serializable list."""
+    return guess.dump(clock)
+
+
+def decode_guess(guess, clock=None):
+    """Returns a pending guess from a list created by encode_guess."""
+    return Guess.load(guess, clock)
+
+
+def snapshot_version(state, deltas):
+    """Returns the format version of a snapshot written without one."""
+    guesses = [guess for queue in state['guesses'].values() for guess in queue]
+    guesses += [delta['guess'] for delta in deltas]
+    return 1 if any(isinstance(guess, dict) for guess in guesses) else 2
+
+
+def decode_legacy_guess(guess, clock=None):
+    """
+    Returns a version 1 pending guess as a dict with its times in monotonic seconds.
+
+    Guesses saved before deadlines were added have no deadline.
+    """
+    clock = clock or clocks.SYSTEM
+    offset = clock.time() - monotonic_seconds(clock)
+    guess = dict(guess)
+    guess['timestamp'] = int(guess['timestamp'] - offset)
+    if guess.get('deadline') is not None:
+        guess['deadline'] = int(guess['deadline'] - offset)
+    return guess
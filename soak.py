@@ -0,0 +1,396 @@
+"""This module provides a soak test that plays a long race against a simulated clock."""
+import os
+import sys
+import time
+import random
+import shutil
+import logging
+import argparse
+import tempfile
+import tracemalloc
+from itertools import accumulate
+
+import chat
+import clocks
+from storage.sqlite import SQLiteStorage
+from guessing_game import GuessingGame
+
+CHANNEL_ID = '1'
+CHANNEL_NAME = 'soak'
+HOUR = 3600
+MIN_CALLS = 20
+DRIFT_FLOOR = 0.001
+FINISH_BUDGET = 2000
+MOD_USER = {
+    "username": CHANNEL_NAME,
+    "user-id": CHANNEL_ID,
+    "channel-id": CHANNEL_ID
+}
+MOD_TAGS = {
+    "badges": 'broadcaster/1',
+    "user-id": CHANNEL_ID
+}
+MOD_PERMISSIONS = {
+    "mod": True,
+    "whitelist": False,
+    "blacklist": False
+}
+USER_PERMISSIONS = {
+    "mod": False,
+    "whitelist": False,
+    "blacklist": False
+}
+# Share of chat commands of each kind outside of bursts
+MIX = [
+    ('item', 0.82),
+    ('points', 0.08),
+    ('medal', 0.05),
+    ('song', 0.03),
+    ('odds', 0.02)
+]
+
+logger = logging.getLogger(__name__)
+
+
+def percentile(values, fraction):
+    """Returns the value below which the given fraction of the sorted values fall."""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Chat():
+    """
+    This is a class for the chat of a race with many participants.
+
+    A few participants guess far more often than the rest, with how often each
+    one speaks drawn from a Pareto distribution. Commands arrive at random at
+    an average rate that jumps for a while after every completed item, when
+    chat rushes to guess the next one.
+    """
+    def __init__(self, game, rng, participants, rate, burst_rate, burst_length):
+        """
+        The constructor for Chat class.
+
+        Parameters:
+            game (GuessingGame): The game the race is played against
+            rng (Random): The source of randomness
+            participants (int): How many participants are in chat
+            rate (float): The average commands per second outside of bursts
+            burst_rate (float): The average commands per second during a burst
+            burst_length (float): How many seconds a burst lasts
+        """
+        self.rng = rng
+        self.rate = rate
+        self.burst_rate = burst_rate
+        self.burst_length = burst_length
+        self.burst_until = 0.0
+        self.next_at = 0.0
+        self.users = [(str(100000 + number), 'soaker%05d' % number)
+                      for number in range(participants)]
+        self.weights = list(accumulate(rng.paretovariate(1.16) for _ in self.users))
+        self.kinds = [kind for kind, _ in MIX]
+        self.mix = list(accumulate(share for _, share in MIX))
+        self.item_codes = sorted(
+            code for code, names in game.codes['items'].items()
+            if any(game._check_items_allowed(name) for name in names))
+        self.song_codes = sorted(game.codes['songs'])
+        self.songs = {}
+        for code in self.song_codes:
+            self.songs.setdefault(game.codes['songs'][code], code)
+        self.guessed = set()
+        self.dungeons = list(game.guessables['dungeons'])
+
+    def burst(self, now):
+        """The function to start a burst of guesses."""
+        self.burst_until = now + self.burst_length
+
+    def _text(self, kind):
+        if kind == 'item':
+            return '!guess %s' % self.rng.choice(self.item_codes)
+        if kind == 'medal':
+            return '!guess medal %s' % ' '.join(
+                self.rng.choice(self.dungeons) for _ in range(6))
+        if kind == 'song':
+            return '!guess song %s' % ' '.join(
+                self.rng.choice(self.song_codes) for _ in range(12))
+        return '!%s' % kind
+
+    def messages(self, now):
+        """Returns the messages sent to chat up to the given simulated time."""
+        messages = []
+        while self.next_at <= now:
+            bursting = self.next_at < self.burst_until
+            user_id, username = self.rng.choices(self.users, cum_weights=self.weights)[0]
+            kind = 'item' if bursting else self.rng.choices(self.kinds, cum_weights=self.mix)[0]
+            # Only participants who have guessed have points to check
+            if kind == 'points' and user_id not in self.guessed:
+                kind = 'item'
+            if kind != 'points' and kind != 'odds':
+                self.guessed.add(user_id)
+            messages.append(chat.ChatMessage({"user-id": user_id}, username, self._text(kind)))
+            self.next_at += self.rng.expovariate(self.burst_rate if bursting else self.rate)
+        return messages
+
+
+class Soak():
+    """
+    This is a class for playing a race against a game and measuring how it holds up.
+
+    The game reads the time from a simulated clock that the soak advances a
+    step at a time, sending chat's commands and running the bot's periodic
+    tasks as the clock passes them, so hours of race run in minutes. The time
+    each command takes is recorded per simulated hour, and the traced heap and
+    the size of the game's pending structures are sampled as the race goes on.
+    Finishing the race is timed on its own, as it grows with the whole race.
+    """
+    def __init__(self, game, clock, traffic, args):
+        """
+        The constructor for Soak class.
+
+        Parameters:
+            game (GuessingGame): The game to play the race against
+            clock (SimulatedClock): The clock the game reads the time from
+            traffic (Chat): The race's chat
+            args (Namespace): The soak's options
+        """
+        self.game = game
+        self.clock = clock
+        self.traffic = traffic
+        self.args = args
+        self.hour = 0
+        self.hours = []
+        self.tasks = {}
+        self.samples = []
+        self.finish = 0.0
+        duration = args.hours * HOUR
+        events = []
+        at = args.completion_interval
+        while at < duration:
+            events.append((at, 'item'))
+            at += args.completion_interval * traffic.rng.uniform(0.5, 1.5)
+        medals = list(game.guessables['medals'])
+        events += [(duration * (number + 1) / (len(medals) + 1), 'medal %s' % medal)
+                   for number, medal in enumerate(medals)]
+        songs = sorted(traffic.songs.values())
+        events += [(duration * (number + 1) / (len(songs) + 1), 'song %s' % song)
+                   for number, song in enumerate(songs)]
+        self.events = sorted(events, reverse=True)
+
+    def _time(self, name, function, *args):
+        start = time.perf_counter()
+        function(*args)
+        elapsed = time.perf_counter() - start
+        while len(self.hours) <= self.hour:
+            self.hours.append({})
+        self.hours[self.hour].setdefault(name, []).append(elapsed)
+
+    def command(self, message, user=None, permissions=USER_PERMISSIONS):
+        """The function to send a chat message to the game and time it."""
+        if user is None:
+            user = {
+                "username": message.username,
+                "user-id": message.user_id,
+                "channel-id": CHANNEL_ID
+            }
+        self._time(message.command_name, self.game.do_command, user, permissions, message)
+
+    def mod_command(self, text):
+        """The function to send a command from the broadcaster."""
+        self.command(chat.ChatMessage(MOD_TAGS, CHANNEL_NAME, text), MOD_USER, MOD_PERMISSIONS)
+
+    def _complete(self, event):
+        rng = self.traffic.rng
+        if event == 'item':
+            self.mod_command('!hud %s' % rng.choice(self.traffic.item_codes))
+            self.traffic.burst(self.clock.monotonic())
+        elif event.startswith('medal'):
+            self.mod_command('!hud %s %s' % (event.split()[1], rng.choice(self.traffic.dungeons)))
+        else:
+            self.mod_command('!song %s %s' % (event.split()[1],
+                                              rng.choice(self.traffic.song_codes)))
+
+    def _run_tasks(self, now):
+        for name, interval, function in (
+                ('expire', 1, self.game.expire_guesses),
+                ('live', 1, self.game.publish_live),
+                ('flush', self.args.flush_interval, self.game.flush_points),
+                ('checkpoint', self.game.snapshot.interval, self.game.checkpoint)):
+            due = self.tasks.get(name, 0)
+            if now >= due:
+                self._time(name, function)
+                self.tasks[name] = due + interval
+
+    def sample(self):
+        """The function to record the traced heap and the size of the game's structures."""
+        current, peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+        game = self.game
+        sample = {
+            "hour": self.clock.monotonic() / HOUR,
+            "current": current,
+            "peak": peak,
+            "guesses": sum(len(guesses) for guesses in game.guesses.values()),
+            "heap": len(game.expiry['heap']),
+            "odds": len(game.odds['counts']),
+            "log": len(game.database['session-log']),
+            "ledger": len(game.ledger.balances)
+        }
+        self.samples.append(sample)
+        logger.info('%5.2f h heap %.1f MB (peak %.1f MB), %s pending guesses, expiry heap %s, '
+                    '%s odds, %s log entries, %s cached participants', sample['hour'],
+                    current / 2 ** 20, peak / 2 ** 20, sample['guesses'], sample['heap'],
+                    sample['odds'], sample['log'], sample['ledger'])
+
+    def run(self):
+        """The function to play the race from start to finish."""
+        duration = self.args.hours * HOUR
+        next_sample = 0
+        self.mod_command('!start')
+        while self.clock.monotonic() < duration:
+            self.hour = int(self.clock.monotonic() // HOUR)
+            self.clock.advance(self.args.step)
+            now = self.clock.monotonic()
+            while self.events and self.events[-1][0] <= now:
+                self._complete(self.events.pop()[1])
+            for message in self.traffic.messages(now):
+                self.command(message)
+            self._run_tasks(now)
+            if now >= next_sample:
+                self.sample()
+                next_sample += self.args.sample_interval
+        # Finishing writes the session and its report, which grow with the race,
+        # so it is held to its own budget rather than the per-hour one
+        start = time.perf_counter()
+        self.game.do_command(MOD_USER, MOD_PERMISSIONS,
+                             chat.ChatMessage(MOD_TAGS, CHANNEL_NAME, '!finish'))
+        self.finish = time.perf_counter() - start
+        self.sample()
+
+    def report(self):
+        """
+        The function to log the latency per simulated hour and check the budgets.
+
+        Returns:
+            Returns a list of the budgets that were exceeded.
+        """
+        failures = []
+        for hour, timings in enumerate(self.hours):
+            commands = sorted(elapsed for name, values in timings.items()
+                              if name.startswith('!') for elapsed in values)
+            p99 = percentile(commands, 0.99) * 1000
+            logger.info('Hour %s: %s commands, p50 %.2f ms, p99 %.2f ms, max %.2f ms', hour,
+                        len(commands), percentile(commands, 0.5) * 1000, p99,
+                        (commands[-1] if commands else 0) * 1000)
+            for name in sorted(timings):
+                values = sorted(timings[name])
+                logger.debug('  %s: %s calls, p50 %.2f ms, p99 %.2f ms', name, len(values),
+                             percentile(values, 0.5) * 1000, percentile(values, 0.99) * 1000)
+            if p99 > self.args.latency_budget:
+                failures.append('hour %s p99 %.2f ms over %.2f ms' % (
+                    hour, p99, self.args.latency_budget))
+        if len(self.hours) > 1:
+            first, last = self.hours[0], self.hours[-1]
+            # Commands and tasks rarely run in an hour are left out, their p99 is
+            # just their slowest call, and latencies under DRIFT_FLOOR are counted
+            # as DRIFT_FLOOR so a collection pause does not read as drift
+            for name in sorted(set(first) & set(last)):
+                if min(len(first[name]), len(last[name])) < MIN_CALLS:
+                    continue
+                before = max(percentile(sorted(first[name]), 0.99), DRIFT_FLOOR)
+                after = max(percentile(sorted(last[name]), 0.99), DRIFT_FLOOR)
+                drift = after / before
+                logger.info('%s p99 drift from first to last hour: %.2fx', name, drift)
+                if drift > self.args.max_drift:
+                    failures.append('%s p99 drift %.2fx over %.2fx' % (
+                        name, drift, self.args.max_drift))
+        finish = self.finish * 1000
+        logger.info('Finished the race in %.2f ms', finish)
+        if finish > self.args.finish_budget:
+            failures.append('!finish %.2f ms over %.2f ms' % (finish, self.args.finish_budget))
+        peak = max(sample['peak'] for sample in self.samples) / 2 ** 20
+        logger.info('Peak traced heap %.1f MB', peak)
+        if tracemalloc.is_tracing() and peak > self.args.memory_budget:
+            failures.append('peak heap %.1f MB over %.1f MB' % (peak, self.args.memory_budget))
+        return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Play a long race against the guessing game on a simulated clock and '
+                    'check its memory and command latency stay within budget.')
+    parser.add_argument('--hours', type=float, default=8)
+    parser.add_argument('--participants', type=int, default=20000)
+    parser.add_argument('--rate', type=float, default=1.5,
+                        help='Average chat commands per second')
+    parser.add_argument('--burst-rate', type=float, default=10,
+                        help='Average item guesses per second just after an item is found')
+    parser.add_argument('--burst-length', type=float, default=30,
+                        help='How many seconds a burst lasts')
+    parser.add_argument('--completion-interval', type=float, default=180,
+                        help='Average seconds between items being found')
+    parser.add_argument('--flush-interval', type=float, default=5,
+                        help='Seconds between writes of the points ledger')
+    parser.add_argument('--step', type=float, default=1,
+                        help='Simulated seconds the clock is advanced at a time')
+    parser.add_argument('--sample-interval', type=float, default=1800,
+                        help='Simulated seconds between memory samples')
+    parser.add_argument('--memory-budget', type=float, default=256,
+                        help='Most MB the traced heap may peak at')
+    parser.add_argument('--latency-budget', type=float, default=25,
+                        help='Most milliseconds the p99 command latency may reach in any hour')
+    parser.add_argument('--finish-budget', type=float, default=FINISH_BUDGET,
+                        help='Most milliseconds finishing the race may take')
+    parser.add_argument('--max-drift', type=float, default=2,
+                        help='Most the p99 latency of a command or task may grow from the first '
+                             'to the last hour')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-trace', action='store_true', default=False,
+                        help='Do not trace memory, for latencies without its overhead')
+    parser.add_argument('--verbose', action='store_true', default=False,
+                        help='Log the latency of each command and task per hour')
+    parser.add_argument('--keep', action='store_true', default=False,
+                        help='Keep the working directory with the database, journals and reports')
+    args = parser.parse_args(argv)
+    if args.verbose:
+        logger.setLevel(logging.DEBUG)
+
+    items = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'items.json')
+    workdir = tempfile.mkdtemp(prefix='soak-')
+    shutil.copy(items, workdir)
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    for name, directory in (('SNAPSHOT_DIR', 'snapshots'), ('JOURNAL_DIR', 'journals'),
+                            ('LEDGER_DIR', 'ledger')):
+        os.environ[name] = os.path.join(workdir, directory)
+    os.environ['SNAPSHOT_STORE'] = 'disk'
+    os.environ.pop('S3_BUCKET', None)
+    try:
+        if not args.no_trace:
+            tracemalloc.start()
+        clock = clocks.SimulatedClock()
+        game = GuessingGame(SQLiteStorage(CHANNEL_ID, CHANNEL_NAME, 'soak.db'), clock=clock)
+        logging.getLogger('guessing_game').setLevel(logging.WARNING)
+        traffic = Chat(game, random.Random(args.seed), args.participants, args.rate,
+                       args.burst_rate, args.burst_length)
+        soak = Soak(game, clock, traffic, args)
+        start = time.monotonic()
+        soak.run()
+        logger.info('Played %.1f simulated hours in %.1f seconds', args.hours,
+                    time.monotonic() - start)
+        failures = soak.report()
+    finally:
+        tracemalloc.stop()
+        os.chdir(cwd)
+        if args.keep:
+            logger.info('Kept %s', workdir)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+    for failure in failures:
+        logger.error('Over budget: %s', failure)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    logging.basicConfig()
+    logger.setLevel(logging.INFO)
+    sys.exit(main())
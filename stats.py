@@ -0,0 +1,123 @@
+"""This module provides running guess statistics for a channel."""
+import logging
+
+CHANNEL = 'channel'
+ITEM = 'item'
+USER = 'user'
+
+
+class StatsCollector():
+    """
+    This is a class for collecting guess statistics until they are written out.
+
+    Counts are kept per channel, per item and per user as increments of guesses,
+    correct guesses and first correct guesses. flush hands every pending
+    increment to the storage backend in one write, which adds them to the
+    rollups it keeps, so the rollups never need to be recomputed from the
+    session logs.
+    """
+    def __init__(self):
+        """The constructor for StatsCollector class."""
+        self.logger = logging.getLogger(__name__)
+        self.pending = {}
+
+    def _add(self, kind, key, name, guesses=0, hits=0, first=0):
+        counts = self.pending.get((kind, key))
+        if counts is None:
+            counts = self.pending[(kind, key)] = [name, 0, 0, 0]
+        counts[0] = name
+        counts[1] += guesses
+        counts[2] += hits
+        counts[3] += first
+
+    def record_guess(self, user_id, username, items):
+        """
+        The function to count an item guess.
+
+        Parameters:
+            user_id (int): The guesser's user ID
+            username (string): The guesser's username
+            items (string[]): The names of the items guessed
+        """
+        self._add(CHANNEL, CHANNEL, CHANNEL, guesses=len(items))
+        self._add(USER, str(user_id), username, guesses=len(items))
+        for item in items:
+            self._add(ITEM, item, item, guesses=1)
+
+    def record_hit(self, user_id, username, item, first):
+        """
+        The function to count a correct item guess.
+
+        Parameters:
+            user_id (int): The guesser's user ID
+            username (string): The guesser's username
+            item (string): The name of the item guessed correctly
+            first (bool): Whether this was the first correct guess for the item
+        """
+        first = int(first)
+        self._add(CHANNEL, CHANNEL, CHANNEL, hits=1, first=first)
+        self._add(USER, str(user_id), username, hits=1, first=first)
+        self._add(ITEM, item, item, hits=1, first=first)
+
+    def flush(self, storage):
+        """
+        The function to add the pending counts to the storage backend's rollups.
+
+        Parameters:
+            storage (Storage): The storage backend to write to
+        """
+        if not self.pending:
+            return
+        increments = [(kind, key) + tuple(counts)
+                      for (kind, key), counts in self.pending.items()]
+        storage.update_stats(increments)
+        self.logger.debug('Flushed %s stats increments', len(increments))
+        self.pending = {}
+
+
+def tracked(stats):
+    """Returns how many of a rollup's guesses were counted as they were made."""
+    return stats['guesses'] - stats.get('backfilled', 0)
+
+
+def hit_rate(stats):
+    """Returns the share of tracked guesses that were correct as a whole percentage."""
+    if not tracked(stats):
+        return 0
+    return int(round(100.0 * stats['hits'] / tracked(stats)))
+
+
+def _describe_hits(stats, first=True):
+    if stats['guesses'] and not tracked(stats):
+        return 'correct guesses not tracked yet'
+    message = '%s correct (%s%%)' % (stats['hits'], hit_rate(stats))
+    if first:
+        message += ', %s first correct guesses' % stats['first']
+    return message
+
+
+def describe(stats, most_guessed=None):
+    """
+    The function to format a rollup for chat.
+
+    Guesses backfilled from the session logs count towards the number of
+    guesses but not the hit rate, since the logs do not record hits.
+
+    Parameters:
+        stats (dict): A rollup as returned by Storage.get_stats
+        most_guessed (dict): The channel's most guessed item rollup, if describing
+            the channel
+
+    Returns:
+        Returns the message to send to chat.
+    """
+    if stats['kind'] == CHANNEL:
+        message = '%s guesses, %s' % (stats['guesses'], _describe_hits(stats, first=False))
+        if most_guessed:
+            message += ', most guessed item is %s (%s times)' % (
+                most_guessed['name'], most_guessed['guesses'])
+        return message
+    if stats['kind'] == ITEM:
+        return '%s was guessed %s times, %s' % (
+            stats['name'], stats['guesses'], _describe_hits(stats))
+    return '%s made %s guesses, %s' % (stats['name'], stats['guesses'], _describe_hits(stats))
@@ -0,0 +1,27 @@
+"""This package provides the storage backends for a streamer's guessing game data."""
+import os
+
+
+def connect(channel_id, channel_name):
+    """
+    The function to open the storage backend chosen by the environment.
+
+    STORAGE_BACKEND selects 'mongo', the default, which connects to MONGODB_URI,
+    or 'sqlite', which opens the database file at SQLITE_PATH.
+
+    Parameters:
+        channel_id (string): The Twitch channel ID of the streamer
+        channel_name (string): The Twitch channel name of the streamer
+
+    Returns:
+        Returns a Storage bound to the streamer.
+    """
+    backend = os.environ.get('STORAGE_BACKEND', 'mongo')
+    if backend == 'sqlite':
+        from storage.sqlite import SQLiteStorage
+        return SQLiteStorage(
+            channel_id, channel_name, os.environ.get('SQLITE_PATH', 'guessing_game.db'))
+    if backend == 'mongo':
+        from storage.mongo import MongoStorage
+        return MongoStorage(channel_id, channel_name, os.environ['MONGODB_URI'])
+    raise ValueError('Unknown storage backend %s' % backend)
@@ -0,0 +1,322 @@
+"""This module provides the interface shared by the storage backends."""
+
+SETTINGS = ['points', 'first_bonus', 'guess_expiry', 'expiry_notice']
+USER_LISTS = ['whitelist', 'blacklist']
+STATS_FIELDS = ['kind', 'key', 'name', 'guesses', 'hits', 'first', 'backfilled']
+REPORT_FIELDS = ['channel_name', 'report_type', 'key', 'url', 'size', 'created']
+ARCHIVE_FIELDS = ['name', 'compression', 'sessions', 'first', 'last', 'size']
+PARTICIPANT_FIELDS = ['user_id', 'username', 'session_points', 'total_points']
+USER_FIELDS = ['user_id', 'username']
+STANDING_FIELDS = ['user_id', 'username', 'points', 'total_points']
+DELTA_FIELDS = ['user_id', 'username', 'previous', 'latest', 'delta']
+
+
+class Storage():
+    """
+    This is the interface for storing a streamer's guessing game data.
+
+    A storage object is bound to one channel. Participants are returned as
+    Participant documents and sessions as Session documents so callers do not
+    need to know which backend they are talking to.
+
+    Attributes:
+        channel_id (string): The Twitch channel ID the storage is bound to
+        channel_name (string): The Twitch channel name the storage is bound to
+        settings (dict): The streamer's settings, keyed by the names in SETTINGS
+    """
+    channel_id = None
+    channel_name = None
+    settings = None
+
+    def watch(self, interval=1):
+        """
+        Starts keeping the cached settings and commands up to date with changes
+        made by other processes, within about interval seconds.
+        """
+        raise NotImplementedError
+
+    def update_setting(self, name, value):
+        """Sets one of the streamer's settings."""
+        raise NotImplementedError
+
+    def get_participant(self, user_id):
+        """Returns the participant with the given user ID or None."""
+        raise NotImplementedError
+
+    def find_participant(self, username):
+        """Returns the participant with the given username or None."""
+        raise NotImplementedError
+
+    def add_participant(self, user_id, username):
+        """Creates a participant with no points and returns it."""
+        raise NotImplementedError
+
+    def iter_participants(self):
+        """Returns an iterator over every participant."""
+        raise NotImplementedError
+
+    def award_points(self, awards, sequence=None):
+        """
+        Adds the points in a dict of user ID to points to both point totals.
+
+        Parameters:
+            awards (dict): A mapping of user IDs to points
+            sequence (int): The points ledger sequence number the awards go up to,
+                recorded in the same write. If given, the awards are skipped when a
+                sequence number at least as high is already recorded.
+        """
+        raise NotImplementedError
+
+    def ledger_sequence(self):
+        """Returns the last points ledger sequence number recorded by award_points."""
+        raise NotImplementedError
+
+    def reset_session_points(self):
+        """Sets every participant's session points to 0."""
+        raise NotImplementedError
+
+    def list_commands(self):
+        """Returns a list of (name, output) tuples for the custom commands."""
+        raise NotImplementedError
+
+    def get_command(self, name):
+        """Returns the output of a custom command or None, from the cache without I/O."""
+        raise NotImplementedError
+
+    def add_command(self, name, output):
+        """Adds a custom command."""
+        raise NotImplementedError
+
+    def remove_command(self, name):
+        """Removes a custom command."""
+        raise NotImplementedError
+
+    def edit_command(self, name, output):
+        """Changes the output of a custom command."""
+        raise NotImplementedError
+
+    def in_user_list(self, list_name, user_id):
+        """Returns True if the user ID is on the whitelist or blacklist."""
+        raise NotImplementedError
+
+    def add_to_user_list(self, list_name, user_id, username):
+        """Adds a user to the whitelist or blacklist. Returns False if already on it."""
+        raise NotImplementedError
+
+    def remove_from_user_list(self, list_name, user_id):
+        """Removes a user from the whitelist or blacklist. Returns False if not on it."""
+        raise NotImplementedError
+
+    def append_session(self, session):
+        """Stores a finished Session."""
+        raise NotImplementedError
+
+    def latest_session(self):
+        """Returns the most recently stored Session or None."""
+        raise NotImplementedError
+
+    def update_stats(self, increments):
+        """
+        Adds to the guess statistics rollups.
+
+        Parameters:
+            increments (list): (kind, key, name, guesses, hits, first) tuples where
+                kind is 'channel', 'item' or 'user'
+        """
+        raise NotImplementedError
+
+    def get_stats(self, kind, name):
+        """Returns the rollup dict of the channel, an item or a user by name, or None."""
+        raise NotImplementedError
+
+    def top_stats(self, kind, limit=1):
+        """Returns the rollup dicts of a kind with the most guesses."""
+        raise NotImplementedError
+
+    def rebuild_stats(self):
+        """
+        Replaces the rollups with guess counts backfilled from the stored sessions.
+
+        The session logs do not record which guesses were correct, so hits and
+        first are not backfilled. The backfilled guesses are counted in
+        backfilled instead, which leaves them out of hit rates.
+        """
+        raise NotImplementedError
+
+    def publish_live(self, name, data):
+        """Replaces the live data the dashboard shows under a name."""
+        raise NotImplementedError
+
+    def get_live(self, name):
+        """Returns a dict of the live data published under a name and when, or None."""
+        raise NotImplementedError
+
+    def add_report(self, report_type, key, url, size):
+        """Adds a report uploaded for the channel to the report index."""
+        raise NotImplementedError
+
+    def list_reports(self, channel=None, report_type=None, start=None, end=None,
+                     page=1, per_page=50):
+        """
+        Returns a page of the report index, newest first.
+
+        The index covers every channel, not just the one the storage is bound to.
+
+        Parameters:
+            channel (string): Only include reports for this channel name
+            report_type (string): Only include reports of this type
+            start (datetime): Only include reports created at or after this time
+            end (datetime): Only include reports created before this time
+            page (int): The page to return, starting from 1
+            per_page (int): The number of reports on a page
+
+        Returns:
+            Returns a tuple of a list of report dicts with the keys in REPORT_FIELDS
+            and the total number of matching reports.
+        """
+        raise NotImplementedError
+
+    def top_participants(self, limit):
+        """Returns the participants with the most session points, most first."""
+        raise NotImplementedError
+
+    def publish_event(self, name, data):
+        """Appends an event for the channel to the change feed the web app follows."""
+        raise NotImplementedError
+
+    def follow_events(self, position=None):
+        """
+        Follows the change feed of every channel.
+
+        Parameters:
+            position (object): The position of the last event already seen, or None
+                to start from the oldest event still in the feed
+
+        Returns:
+            Returns a generator of (position, channel_name, name, data) tuples that
+            blocks waiting for new events.
+        """
+        raise NotImplementedError
+
+    def add_code_table(self, version, names):
+        """Stores a version of the code table's names if it is not already stored."""
+        raise NotImplementedError
+
+    def get_code_table(self, version):
+        """Returns the names of a stored version of the code table or None."""
+        raise NotImplementedError
+
+    def migrate_session_logs(self, guess_types, migrate):
+        """
+        Rewrites stored session log entries that have no codes yet.
+
+        Parameters:
+            guess_types (string[]): The guess types of the entries to rewrite
+            migrate (callable): Called with each entry to set its codes in place.
+                Entries it leaves without codes are stored unchanged.
+
+        Returns:
+            Returns the number of entries rewritten.
+        """
+        raise NotImplementedError
+
+    def oldest_sessions(self, limit):
+        """Returns up to limit of the oldest sessions, never including the latest one."""
+        raise NotImplementedError
+
+    def remove_sessions(self, count):
+        """Removes the count oldest sessions. Returns False if the sessions changed first."""
+        raise NotImplementedError
+
+    def hot_size(self):
+        """Returns the size in bytes of the streamer's stored data, sessions included."""
+        raise NotImplementedError
+
+    def add_archive_segment(self, segment):
+        """Adds a dict of the fields in ARCHIVE_FIELDS to the archive manifest."""
+        raise NotImplementedError
+
+    def list_archive_segments(self, start=None, end=None):
+        """
+        Returns the archive manifest as a list of dicts, oldest first.
+
+        Parameters:
+            start (datetime): Leave out segments whose sessions all ended before this
+            end (datetime): Leave out segments whose sessions all ended after this
+        """
+        raise NotImplementedError
+
+    def export_users(self, kind, batch_size=1000):
+        """
+        Reads out the participants, whitelist or blacklist.
+
+        Parameters:
+            kind (string): 'participants' or one of the names in USER_LISTS
+            batch_size (int): How many users to fetch from the database at a time
+
+        Returns:
+            Returns a generator of tuples of the fields in PARTICIPANT_FIELDS for
+            participants or USER_FIELDS for a user list.
+        """
+        raise NotImplementedError
+
+    def import_users(self, kind, rows, add=False):
+        """
+        Adds a batch of users to the participants, whitelist or blacklist.
+
+        Users already stored are updated rather than added again.
+
+        Parameters:
+            kind (string): 'participants' or one of the names in USER_LISTS
+            rows (list): Tuples of the fields in PARTICIPANT_FIELDS for participants
+                or USER_FIELDS for a user list, with at most one per user ID
+            add (bool): Whether to add the points to a stored participant's points
+                rather than replace them
+        """
+        raise NotImplementedError
+
+    def stream_participants(self, order='total_points', limit=None, batch_size=1000):
+        """
+        Reads out the participants, sorted by the database.
+
+        Parameters:
+            order (string): 'total_points' or 'session_points', highest first
+            limit (int): The most participants to read, or None for all of them
+            batch_size (int): How many participants to fetch at a time
+
+        Returns:
+            Returns a generator of tuples of the fields in PARTICIPANT_FIELDS.
+        """
+        raise NotImplementedError
+
+    def record_standings(self):
+        """
+        Stores every participant's session points as the standings of a finished session.
+
+        Returns:
+            Returns the time the standings were recorded, which identifies them.
+        """
+        raise NotImplementedError
+
+    def standings_sessions(self, limit=2):
+        """Returns the times of the most recently recorded standings, newest first."""
+        raise NotImplementedError
+
+    def stream_standings(self, session, batch_size=1000):
+        """
+        Reads out a session's standings, most points first.
+
+        Returns:
+            Returns a generator of tuples of the fields in STANDING_FIELDS.
+        """
+        raise NotImplementedError
+
+    def stream_standings_deltas(self, previous, latest, batch_size=1000):
+        """
+        Reads out how each participant's points changed between two sessions.
+
+        Returns:
+            Returns a generator of tuples of the fields in DELTA_FIELDS, biggest
+            gain first.
+        """
+        raise NotImplementedError
@@ -0,0 +1,615 @@
+"""This module provides the MongoDB storage backend."""
+import logging
+import time
+import threading
+from datetime import datetime
+
+import mongoengine as mongodb
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from pymongo import UpdateOne, CursorType
+from pymongo.errors import CollectionInvalid, OperationFailure, PyMongoError
+
+from database.streamer import Streamer
+from database.command import Command
+from database.participant import Participant
+from database.session import Session
+from database.stats_rollup import StatsRollup
+from database.live_state import LiveState
+from database.report import Report
+from database.code_table_version import CodeTableVersion
+from database.archive_segment import ArchiveSegment
+from database.session_standing import SessionStanding
+from database.whitelist import WhitelistUser, BlacklistUser
+from storage.base import Storage, SETTINGS, USER_LISTS, STATS_FIELDS, REPORT_FIELDS, \
+    ARCHIVE_FIELDS, PARTICIPANT_FIELDS, USER_FIELDS, STANDING_FIELDS, DELTA_FIELDS
+from stats import CHANNEL, ITEM, USER
+
+LIST_DOCUMENTS = {
+    "whitelist": WhitelistUser,
+    "blacklist": BlacklistUser
+}
+UPDATE_ATTEMPTS = 3
+STATS_PROJECTION = dict(dict.fromkeys(STATS_FIELDS, 1), _id=0)
+REPORT_PROJECTION = dict(dict.fromkeys(REPORT_FIELDS, 1), _id=0)
+ARCHIVE_PROJECTION = dict(dict.fromkeys(ARCHIVE_FIELDS, 1), _id=0)
+STANDING_PROJECTION = dict(dict.fromkeys(STANDING_FIELDS, 1), _id=0)
+CACHE_PROJECTION = dict.fromkeys(
+    SETTINGS + ['version', 'commands'] + [name + '.user_id' for name in USER_LISTS], 1)
+FEED_COLLECTION = 'live_feed'
+FEED_SIZE = 8 * 1024 * 1024
+
+
+class MongoStorage(Storage):
+    """
+    This is a class for storing a streamer's data in a MongoDB Streamer document.
+
+    Every change is a single targeted update of the streamer's document rather
+    than a save of the whole document, and reads fetch only the fields they
+    need. Changes to settings, commands and user lists bump the document's
+    version, and settings are only written if the version is the one last
+    read, so a stale copy of the settings never overwrites a newer one.
+
+    Settings, custom commands and user list membership are cached. watch keeps
+    the cache coherent with changes made by other processes by following a
+    change stream for version bumps, which needs a replica set, or by polling
+    the version where change streams are not available.
+    """
+    def __init__(self, channel_id, channel_name, uri):
+        """The constructor for MongoStorage class."""
+        self.logger = logging.getLogger(__name__)
+        try:
+            mongodb.connect(host=uri)
+            self.logger.debug('Connected to database.')
+        except mongodb.connection.MongoEngineConnectionError as e:
+            self.logger.error('Unable to connect to database!')
+            self.logger.error(e)
+            raise e
+        self.channel_id = channel_id
+        self.channel_name = channel_name
+        self.collection = Streamer._get_collection() #pylint: disable=protected-access
+        self.stats = StatsRollup._get_collection() #pylint: disable=protected-access
+        self.live = LiveState._get_collection() #pylint: disable=protected-access
+        self.reports = Report._get_collection() #pylint: disable=protected-access
+        self.code_tables = CodeTableVersion._get_collection() #pylint: disable=protected-access
+        self.archive = ArchiveSegment._get_collection() #pylint: disable=protected-access
+        self.standings = SessionStanding._get_collection() #pylint: disable=protected-access
+        self.feed = self._feed_collection()
+        if self.collection.find_one({"channel_id": channel_id}, {"_id": 1}) is None:
+            self.logger.debug('Unable to find streamer with ID %s in the database', channel_id)
+            self.logger.debug('Creating new entry for streamer with ID %s', channel_id)
+            Streamer(name=channel_name, channel_id=channel_id).save()
+        self.collection.update_one({"channel_id": channel_id, "version": {"$exists": False}},
+                                   {"$set": {"version": 0}})
+        self.version = 0
+        self.settings = {}
+        self.commands = {}
+        self.user_lists = {}
+        self.watching = None
+        self._read_settings()
+
+    def _feed_collection(self):
+        database = self.collection.database
+        if FEED_COLLECTION not in database.list_collection_names():
+            try:
+                database.create_collection(FEED_COLLECTION, capped=True, size=FEED_SIZE)
+            except CollectionInvalid:
+                pass
+        return database[FEED_COLLECTION]
+
+    def _read_settings(self):
+        document = self.collection.find_one({"channel_id": self.channel_id}, CACHE_PROJECTION)
+        fields = Streamer._fields #pylint: disable=protected-access
+        self.settings = {name: document.get(name, fields[name].default) for name in SETTINGS}
+        self.commands = {command['name']: command['output']
+                         for command in document.get('commands', [])}
+        self.user_lists = {name: frozenset(user['user_id'] for user in document.get(name, []))
+                           for name in USER_LISTS}
+        self.document_id = document['_id']
+        self.version = document['version']
+
+    def watch(self, interval=1):
+        """
+        The function to start keeping the cache coherent in a daemon thread.
+
+        Parameters:
+            interval (float): How many seconds apart to poll the version if change
+                streams are not available
+        """
+        if self.watching is None:
+            self.watching = 'starting'
+            threading.Thread(target=self._watch, args=(interval,), name='settings-watch',
+                             daemon=True).start()
+
+    def _watch(self, interval):
+        while True:
+            try:
+                stream = self.collection.watch([{"$match": {
+                    "documentKey._id": self.document_id,
+                    "$or": [
+                        {"operationType": {"$in": ['replace', 'invalidate']}},
+                        {"updateDescription.updatedFields.version": {"$exists": True}}
+                    ]
+                }}], max_await_time_ms=int(interval * 1000))
+            except OperationFailure as e:
+                self.logger.info('Change streams are not available (%s), polling every %s '
+                                 'seconds for settings changes', e, interval)
+                self._poll(interval)
+                return
+            try:
+                with stream:
+                    self.watching = 'change stream'
+                    self._read_settings()
+                    for _ in stream:
+                        self._read_settings()
+            except PyMongoError:
+                self.logger.exception('Lost the settings change stream, following again')
+                time.sleep(interval)
+
+    def _poll(self, interval):
+        self.watching = 'polling'
+        while True:
+            time.sleep(interval)
+            try:
+                document = self.collection.find_one({"channel_id": self.channel_id},
+                                                    {"_id": 0, "version": 1})
+                if document['version'] != self.version:
+                    self._read_settings()
+            except PyMongoError:
+                self.logger.exception('Unable to poll for settings changes')
+
+    def _update(self, update, query=None, versioned=False):
+        """
+        The function to apply an update to the streamer's document.
+
+        Parameters:
+            update (dict): The update operators to apply
+            query (dict): Extra conditions the document must match
+            versioned (bool): Whether the update bumps the document's version
+
+        Returns:
+            Returns True if the document matched and was changed.
+        """
+        query = dict(query or {}, channel_id=self.channel_id)
+        if versioned:
+            update.setdefault('$inc', {})['version'] = 1
+        result = self.collection.update_one(query, update)
+        if versioned and result.modified_count:
+            self._read_settings()
+        return result.modified_count == 1
+
+    def _select(self, query, projection):
+        query = dict(query, channel_id=self.channel_id)
+        return self.collection.find_one(query, projection)
+
+    def update_setting(self, name, value):
+        if name not in SETTINGS:
+            raise ValueError('Unknown setting %s' % name)
+        for _ in range(UPDATE_ATTEMPTS):
+            if self._update({"$set": {name: value}}, {"version": self.version}, versioned=True):
+                return
+            self.logger.info('Streamer settings changed since version %s, rereading',
+                             self.version)
+            self._read_settings()
+        raise mongodb.OperationError('Unable to update %s, streamer keeps changing' % name)
+
+    def get_participant(self, user_id):
+        document = self._select(
+            {}, {"participants": {"$elemMatch": {"user_id": int(user_id)}}})
+        if document is None or not document.get('participants'):
+            return None
+        return Participant._from_son(document['participants'][0]) #pylint: disable=protected-access
+
+    def find_participant(self, username):
+        document = self._select(
+            {}, {"participants": {"$elemMatch": {"username": username}}})
+        if document is None or not document.get('participants'):
+            return None
+        return Participant._from_son(document['participants'][0]) #pylint: disable=protected-access
+
+    def add_participant(self, user_id, username):
+        participant = Participant(
+            username=username,
+            user_id=int(user_id),
+            session_points=0,
+            total_points=0)
+        self._update({"$push": {"participants": participant.to_mongo()}},
+                     {"participants.user_id": {"$ne": int(user_id)}})
+        return self.get_participant(user_id)
+
+    def iter_participants(self):
+        document = self._select({}, {"participants": 1})
+        return (Participant._from_son(participant) #pylint: disable=protected-access
+                for participant in document.get('participants', []))
+
+    def award_points(self, awards, sequence=None):
+        increments = {}
+        array_filters = []
+        for user_id, points in awards.items():
+            if not points:
+                continue
+            name = 'p%s' % len(array_filters)
+            increments['participants.$[%s].session_points' % name] = points
+            increments['participants.$[%s].total_points' % name] = points
+            array_filters.append({name + '.user_id': int(user_id)})
+        update = {"$inc": increments}
+        query = {"channel_id": self.channel_id}
+        if sequence is not None:
+            update['$set'] = {"ledger_sequence": sequence}
+            query['ledger_sequence'] = {"$not": {"$gte": sequence}}
+        if array_filters or sequence is not None:
+            self.collection.update_one(query, update, array_filters=array_filters or None)
+
+    def ledger_sequence(self):
+        document = self._select({}, {"_id": 0, "ledger_sequence": 1})
+        return document.get('ledger_sequence', 0)
+
+    def reset_session_points(self):
+        self._update({"$set": {"participants.$[].session_points": 0}})
+
+    def list_commands(self):
+        return list(self.commands.items())
+
+    def get_command(self, name):
+        return self.commands.get(name)
+
+    def add_command(self, name, output):
+        command = Command(name=name, output=output)
+        self._update({"$push": {"commands": command.to_mongo()}}, versioned=True)
+
+    def remove_command(self, name):
+        self._update({"$pull": {"commands": {"name": name}}}, versioned=True)
+
+    def edit_command(self, name, output):
+        self._update({"$set": {"commands.$.output": output}}, {"commands.name": name},
+                     versioned=True)
+
+    def in_user_list(self, list_name, user_id):
+        return int(user_id) in self.user_lists[list_name]
+
+    def add_to_user_list(self, list_name, user_id, username):
+        user = LIST_DOCUMENTS[list_name](username=username, user_id=int(user_id))
+        added = self._update({"$push": {list_name: user.to_mongo()}},
+                             {list_name + '.user_id': {"$ne": int(user_id)}}, versioned=True)
+        if not added:
+            self.logger.info('User with ID %s already exists in the database', user_id)
+        return added
+
+    def remove_from_user_list(self, list_name, user_id):
+        removed = self._update({"$pull": {list_name: {"user_id": int(user_id)}}},
+                               {list_name + '.user_id': int(user_id)}, versioned=True)
+        if not removed:
+            self.logger.error('User with ID %s does not exist in the database', user_id)
+        return removed
+
+    def append_session(self, session):
+        self._update({"$push": {"sessions": session.to_mongo()}})
+
+    def latest_session(self):
+        document = self._select({}, {"sessions": {"$slice": -1}, "participants": 0,
+                                     "commands": 0, "whitelist": 0, "blacklist": 0})
+        if document is None or not document.get('sessions'):
+            return None
+        return Session._from_son(document['sessions'][0]) #pylint: disable=protected-access
+
+    def update_stats(self, increments):
+        updates = [
+            UpdateOne(
+                {"channel_id": self.channel_id, "kind": kind, "key": key},
+                {"$set": {"name": name},
+                 "$inc": {"guesses": guesses, "hits": hits, "first": first},
+                 "$setOnInsert": {"backfilled": 0}},
+                upsert=True)
+            for kind, key, name, guesses, hits, first in increments
+        ]
+        if updates:
+            self.stats.bulk_write(updates, ordered=False)
+
+    def get_stats(self, kind, name):
+        return self.stats.find_one(
+            {"channel_id": self.channel_id, "kind": kind, "name": name}, STATS_PROJECTION)
+
+    def top_stats(self, kind, limit=1):
+        return list(self.stats.find({"channel_id": self.channel_id, "kind": kind},
+                                    STATS_PROJECTION).sort('guesses', -1).limit(limit))
+
+    def rebuild_stats(self):
+        pipeline = [
+            {"$match": {"channel_id": self.channel_id}},
+            {"$unwind": "$sessions"},
+            {"$unwind": "$sessions.guesses"},
+            {"$match": {"sessions.guesses.guess_type": "Item"}},
+            {"$project": {
+                "user_id": "$sessions.guesses.participant",
+                "username": "$sessions.guesses.participant_name",
+                "item": {"$split": ["$sessions.guesses.guess", ", "]}
+            }},
+            {"$unwind": "$item"},
+            {"$facet": {
+                ITEM: [{"$group": {"_id": "$item", "name": {"$last": "$item"},
+                                   "guesses": {"$sum": 1}}}],
+                USER: [{"$group": {"_id": "$user_id", "name": {"$last": "$username"},
+                                   "guesses": {"$sum": 1}}}],
+                CHANNEL: [{"$group": {"_id": CHANNEL, "name": {"$last": CHANNEL},
+                                      "guesses": {"$sum": 1}}}]
+            }}
+        ]
+        result = next(self.collection.aggregate(pipeline), {})
+        if not result.get(CHANNEL):
+            result[CHANNEL] = [{"_id": CHANNEL, "name": CHANNEL, "guesses": 0}]
+        rollups = [
+            {"channel_id": self.channel_id, "kind": kind, "key": str(row['_id']),
+             "name": row['name'], "guesses": row['guesses'], "hits": 0, "first": 0,
+             "backfilled": row['guesses']}
+            for kind in (CHANNEL, ITEM, USER) for row in result.get(kind, [])
+        ]
+        self.stats.delete_many({"channel_id": self.channel_id})
+        self.stats.insert_many(rollups)
+        self.logger.info('Rebuilt %s stats rollups from stored sessions', len(rollups))
+
+    def publish_live(self, name, data):
+        self.live.update_one({"channel_id": self.channel_id, "name": name},
+                             {"$set": {"data": data, "updated": datetime.utcnow()}}, upsert=True)
+
+    def get_live(self, name):
+        return self.live.find_one({"channel_id": self.channel_id, "name": name},
+                                  {"_id": 0, "data": 1, "updated": 1})
+
+    def add_report(self, report_type, key, url, size):
+        self.reports.insert_one({
+            "channel_id": self.channel_id,
+            "channel_name": self.channel_name,
+            "report_type": report_type,
+            "key": key,
+            "url": url,
+            "size": size,
+            "created": datetime.utcnow()
+        })
+
+    def list_reports(self, channel=None, report_type=None, start=None, end=None,
+                     page=1, per_page=50):
+        query = {}
+        if channel:
+            query['channel_name'] = channel
+        if report_type:
+            query['report_type'] = report_type
+        if start or end:
+            query['created'] = {}
+            if start:
+                query['created']['$gte'] = start
+            if end:
+                query['created']['$lt'] = end
+        total = self.reports.count_documents(query)
+        cursor = self.reports.find(query, REPORT_PROJECTION).sort('created', -1)
+        return list(cursor.skip((page - 1) * per_page).limit(per_page)), total
+
+    def top_participants(self, limit):
+        pipeline = [
+            {"$match": {"channel_id": self.channel_id}},
+            {"$project": {"participants": 1}},
+            {"$unwind": "$participants"},
+            {"$sort": {"participants.session_points": -1}},
+            {"$limit": limit},
+            {"$replaceRoot": {"newRoot": "$participants"}}
+        ]
+        return [Participant._from_son(participant) #pylint: disable=protected-access
+                for participant in self.collection.aggregate(pipeline)]
+
+    def publish_event(self, name, data):
+        self.feed.insert_one({
+            "channel_id": self.channel_id,
+            "channel_name": self.channel_name,
+            "name": name,
+            "data": data
+        })
+
+    def follow_events(self, position=None):
+        while True:
+            query = {} if position is None else {"_id": {"$gt": position}}
+            cursor = self.feed.find(query, cursor_type=CursorType.TAILABLE_AWAIT)
+            while cursor.alive:
+                for event in cursor:
+                    position = event['_id']
+                    yield position, event['channel_name'], event['name'], event['data']
+            time.sleep(1)
+
+    def add_code_table(self, version, names):
+        self.code_tables.update_one({"version": version}, {"$setOnInsert": {"names": names}},
+                                    upsert=True)
+
+    def get_code_table(self, version):
+        document = self.code_tables.find_one({"version": version}, {"_id": 0, "names": 1})
+        return document['names'] if document else None
+
+    def migrate_session_logs(self, guess_types, migrate):
+        document = self._select(
+            {"sessions.guesses": {"$elemMatch": {"guess_type": {"$in": guess_types},
+                                                 "codes": {"$exists": False}}}},
+            {"sessions": 1})
+        if document is None:
+            return 0
+        sessions = [Session._from_son(session) #pylint: disable=protected-access
+                    for session in document['sessions']]
+        migrated = 0
+        for session in sessions:
+            for entry in session.guesses:
+                if entry.guess_type in guess_types and entry.codes is None:
+                    migrate(entry)
+                    if entry.codes is not None:
+                        migrated += 1
+        if not migrated:
+            return 0
+        if not self._update({"$set": {"sessions": [session.to_mongo() for session in sessions]}},
+                            {"sessions": {"$size": len(sessions)}}):
+            self.logger.warning('Sessions changed while migrating, will retry next start')
+            return 0
+        return migrated
+
+    def oldest_sessions(self, limit):
+        document = self._select({}, {"sessions": {"$slice": limit + 1}, "participants": 0,
+                                     "commands": 0, "whitelist": 0, "blacklist": 0})
+        if document is None:
+            return []
+        sessions = document.get('sessions', [])
+        if len(sessions) <= limit:
+            sessions = sessions[:-1]
+        return [Session._from_son(session) #pylint: disable=protected-access
+                for session in sessions[:limit]]
+
+    def remove_sessions(self, count):
+        for _ in range(UPDATE_ATTEMPTS):
+            result = list(self.collection.aggregate([
+                {"$match": {"channel_id": self.channel_id}},
+                {"$project": {"_id": 0, "count": {"$size": "$sessions"}}}
+            ]))
+            total = result[0]['count'] if result else 0
+            if total <= count:
+                return False
+            if self._update({"$push": {"sessions": {"$each": [], "$slice": count - total}}},
+                            {"sessions": {"$size": total}}):
+                return True
+        return False
+
+    def hot_size(self):
+        collection = self.collection.with_options(
+            codec_options=CodecOptions(document_class=RawBSONDocument))
+        document = collection.find_one({"channel_id": self.channel_id})
+        return len(document.raw) if document else 0
+
+    def add_archive_segment(self, segment):
+        self.archive.insert_one(dict(segment, channel_id=self.channel_id,
+                                     created=datetime.utcnow()))
+
+    def list_archive_segments(self, start=None, end=None):
+        query = {"channel_id": self.channel_id}
+        if start:
+            query['last'] = {"$gte": start}
+        if end:
+            query['first'] = {"$lte": end}
+        return list(self.archive.find(query, ARCHIVE_PROJECTION).sort('last', 1))
+
+    def export_users(self, kind, batch_size=1000):
+        fields = PARTICIPANT_FIELDS if kind == 'participants' else USER_FIELDS
+        cursor = self.collection.aggregate([
+            {"$match": {"channel_id": self.channel_id}},
+            {"$project": dict(dict.fromkeys([kind + '.' + field for field in fields], 1), _id=0)},
+            {"$unwind": "$" + kind},
+            {"$replaceRoot": {"newRoot": "$" + kind}}
+        ], batchSize=batch_size)
+        for user in cursor:
+            yield tuple(user.get(field, 0) for field in fields)
+
+    def import_users(self, kind, rows, add=False):
+        fields = PARTICIPANT_FIELDS if kind == 'participants' else USER_FIELDS
+        user_ids = [row[0] for row in rows]
+        result = list(self.collection.aggregate([
+            {"$match": {"channel_id": self.channel_id}},
+            {"$project": {"_id": 0, "ids": {"$filter": {
+                "input": "$%s.user_id" % kind, "as": "id",
+                "cond": {"$in": ["$$id", user_ids]}}}}}
+        ]))
+        existing = set(result[0]['ids']) if result else set()
+        updates = []
+        added = []
+        for row in rows:
+            if row[0] not in existing:
+                added.append(dict(zip(fields, row)))
+                continue
+            update = {"$set": {kind + '.$.username': row[1]}}
+            points = {kind + '.$.' + field: value for field, value in zip(fields[2:], row[2:])}
+            if points and add:
+                update['$inc'] = points
+            else:
+                update['$set'].update(points)
+            updates.append(UpdateOne(
+                {"channel_id": self.channel_id, kind + '.user_id': row[0]}, update))
+        if updates:
+            self.collection.bulk_write(updates, ordered=False)
+        if added and not self._update(
+                {"$push": {kind: {"$each": added}}},
+                {kind + '.user_id': {"$nin": [user['user_id'] for user in added]}},
+                versioned=kind != 'participants'):
+            for user in added:
+                self._update({"$push": {kind: user}},
+                             {kind + '.user_id': {"$ne": user['user_id']}},
+                             versioned=kind != 'participants')
+
+    def _participants_pipeline(self):
+        return [
+            {"$match": {"channel_id": self.channel_id}},
+            {"$project": dict(dict.fromkeys(
+                ['participants.' + field for field in PARTICIPANT_FIELDS], 1), _id=0)},
+            {"$unwind": "$participants"},
+            {"$replaceRoot": {"newRoot": "$participants"}}
+        ]
+
+    def stream_participants(self, order='total_points', limit=None, batch_size=1000):
+        pipeline = self._participants_pipeline() + [{"$sort": {order: -1, "user_id": 1}}]
+        if limit:
+            pipeline.append({"$limit": limit})
+        cursor = self.collection.aggregate(pipeline, allowDiskUse=True, batchSize=batch_size)
+        for participant in cursor:
+            yield tuple(participant.get(field, 0) for field in PARTICIPANT_FIELDS)
+
+    def record_standings(self):
+        session = datetime.utcnow().replace(microsecond=0)
+        cursor = self.collection.aggregate(self._participants_pipeline() + [
+            {"$match": {"session_points": {"$gt": 0}}}
+        ], batchSize=1000)
+        batch = []
+        for participant in cursor:
+            batch.append({
+                "channel_id": self.channel_id,
+                "session": session,
+                "user_id": participant['user_id'],
+                "username": participant['username'],
+                "points": participant['session_points'],
+                "total_points": participant.get('total_points', 0)
+            })
+            if len(batch) == 1000:
+                self.standings.insert_many(batch, ordered=False)
+                batch = []
+        if batch:
+            self.standings.insert_many(batch, ordered=False)
+        return session
+
+    def standings_sessions(self, limit=2):
+        cursor = self.standings.aggregate([
+            {"$match": {"channel_id": self.channel_id}},
+            {"$group": {"_id": "$session"}},
+            {"$sort": {"_id": -1}},
+            {"$limit": limit}
+        ])
+        return [session['_id'] for session in cursor]
+
+    def stream_standings(self, session, batch_size=1000):
+        cursor = self.standings.find(
+            {"channel_id": self.channel_id, "session": session}, STANDING_PROJECTION
+        ).sort([('points', -1), ('user_id', 1)]).batch_size(batch_size)
+        for standing in cursor:
+            yield tuple(standing[field] for field in STANDING_FIELDS)
+
+    def stream_standings_deltas(self, previous, latest, batch_size=1000):
+        def points_in(session):
+            return {"$sum": {"$cond": [{"$eq": ["$session", session]}, "$points", 0]}}
+        cursor = self.standings.aggregate([
+            {"$match": {"channel_id": self.channel_id, "session": {"$in": [previous, latest]}}},
+            {"$sort": {"session": 1}},
+            {"$group": {
+                "_id": "$user_id",
+                "username": {"$last": "$username"},
+                "previous": points_in(previous),
+                "latest": points_in(latest)
+            }},
+            {"$project": {
+                "_id": 0,
+                "user_id": "$_id",
+                "username": 1,
+                "previous": 1,
+                "latest": 1,
+                "delta": {"$subtract": ["$latest", "$previous"]}
+            }},
+            {"$sort": {"delta": -1, "user_id": 1}}
+        ], allowDiskUse=True, batchSize=batch_size)
+        for delta in cursor:
+            yield tuple(delta[field] for field in DELTA_FIELDS)
@@ -0,0 +1,664 @@
+"""This module provides the embedded SQLite storage backend."""
+import logging
+import json
+import time
+from datetime import datetime
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from database.participant import Participant
+from database.session import Session
+from database.session_log_entry import SessionLogEntry
+from storage.base import Storage, SETTINGS, STATS_FIELDS, REPORT_FIELDS, ARCHIVE_FIELDS, \
+    PARTICIPANT_FIELDS, USER_FIELDS, STANDING_FIELDS
+from stats import StatsCollector, CHANNEL
+
+FEED_SIZE = 1000
+FEED_POLL = 0.5
+UPDATE_ATTEMPTS = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS streamers (
+    channel_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    first_bonus INTEGER NOT NULL DEFAULT 1,
+    points INTEGER NOT NULL DEFAULT 1,
+    guess_expiry INTEGER NOT NULL DEFAULT 15,
+    expiry_notice INTEGER NOT NULL DEFAULT 0,
+    ledger_sequence INTEGER NOT NULL DEFAULT 0,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS participants (
+    channel_id TEXT NOT NULL,
+    user_id INTEGER NOT NULL,
+    username TEXT NOT NULL,
+    session_points INTEGER NOT NULL DEFAULT 0,
+    total_points INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (channel_id, user_id)
+);
+CREATE INDEX IF NOT EXISTS participants_username ON participants (channel_id, username);
+CREATE TABLE IF NOT EXISTS commands (
+    channel_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    output TEXT NOT NULL,
+    PRIMARY KEY (channel_id, name)
+);
+CREATE TABLE IF NOT EXISTS user_lists (
+    channel_id TEXT NOT NULL,
+    list_name TEXT NOT NULL,
+    user_id INTEGER NOT NULL,
+    username TEXT NOT NULL,
+    PRIMARY KEY (channel_id, list_name, user_id)
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    channel_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_channel ON sessions (channel_id, id);
+CREATE TABLE IF NOT EXISTS session_log (
+    session_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    timestamp TIMESTAMP NOT NULL,
+    participant INTEGER NOT NULL,
+    participant_name TEXT NOT NULL,
+    guess_type TEXT NOT NULL,
+    guess TEXT NOT NULL,
+    session_points INTEGER NOT NULL,
+    total_points INTEGER NOT NULL,
+    codes BLOB,
+    code_version INTEGER,
+    PRIMARY KEY (session_id, position)
+);
+CREATE TABLE IF NOT EXISTS code_tables (
+    version INTEGER PRIMARY KEY,
+    names TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS stats (
+    channel_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    name TEXT NOT NULL,
+    guesses INTEGER NOT NULL DEFAULT 0,
+    hits INTEGER NOT NULL DEFAULT 0,
+    first INTEGER NOT NULL DEFAULT 0,
+    backfilled INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (channel_id, kind, key)
+);
+CREATE INDEX IF NOT EXISTS stats_name ON stats (channel_id, kind, name);
+CREATE INDEX IF NOT EXISTS stats_guesses ON stats (channel_id, kind, guesses);
+CREATE TABLE IF NOT EXISTS live_state (
+    channel_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    data TEXT NOT NULL,
+    updated TIMESTAMP NOT NULL,
+    PRIMARY KEY (channel_id, name)
+);
+CREATE INDEX IF NOT EXISTS participants_points ON participants (channel_id, session_points);
+CREATE INDEX IF NOT EXISTS participants_totals ON participants (channel_id, total_points);
+CREATE TABLE IF NOT EXISTS session_standings (
+    channel_id TEXT NOT NULL,
+    session TIMESTAMP NOT NULL,
+    user_id INTEGER NOT NULL,
+    username TEXT NOT NULL,
+    points INTEGER NOT NULL,
+    total_points INTEGER NOT NULL,
+    PRIMARY KEY (channel_id, session, user_id)
+);
+CREATE INDEX IF NOT EXISTS session_standings_points ON session_standings (channel_id, session, points);
+CREATE TABLE IF NOT EXISTS live_feed (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    channel_id TEXT NOT NULL,
+    channel_name TEXT NOT NULL,
+    name TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS reports (
+    key TEXT PRIMARY KEY,
+    channel_id TEXT NOT NULL,
+    channel_name TEXT NOT NULL,
+    report_type TEXT NOT NULL,
+    url TEXT NOT NULL,
+    size INTEGER,
+    created TIMESTAMP NOT NULL
+);
+CREATE INDEX IF NOT EXISTS reports_created ON reports (created);
+CREATE INDEX IF NOT EXISTS reports_channel ON reports (channel_name, created);
+CREATE TABLE IF NOT EXISTS archive_segments (
+    name TEXT PRIMARY KEY,
+    channel_id TEXT NOT NULL,
+    compression TEXT NOT NULL,
+    sessions INTEGER NOT NULL,
+    first TIMESTAMP NOT NULL,
+    last TIMESTAMP NOT NULL,
+    size INTEGER,
+    created TIMESTAMP NOT NULL
+);
+CREATE INDEX IF NOT EXISTS archive_segments_last ON archive_segments (channel_id, last);
+CREATE INDEX IF NOT EXISTS reports_type ON reports (report_type, created);
+"""
+
+
+class SQLiteStorage(Storage):
+    """
+    This is a class for storing a streamer's data in an embedded SQLite database.
+
+    The database runs in WAL mode so readers never wait on the writer. A single
+    connection is shared behind a lock so the storage can be used from several
+    threads. User lists are read from the database when needed. The settings
+    and commands are cached, since every chat command is checked against them,
+    and watch rereads them when another process changes the database. Reports stream through a connection of their own, so
+    a long report never holds the lock.
+    """
+    def __init__(self, channel_id, channel_name, path):
+        """The constructor for SQLiteStorage class."""
+        self.logger = logging.getLogger(__name__)
+        self.channel_id = channel_id
+        self.channel_name = channel_name
+        self.lock = threading.RLock()
+        self.path = path
+        self.connection = sqlite3.connect(
+            path, check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(SCHEMA)
+        self._add_columns('session_log', [('codes', 'BLOB'), ('code_version', 'INTEGER')])
+        self._add_columns('streamers', [('ledger_sequence', 'INTEGER NOT NULL DEFAULT 0'),
+                                        ('version', 'INTEGER NOT NULL DEFAULT 0')])
+        self._add_columns('stats', [('backfilled', 'INTEGER NOT NULL DEFAULT 0')])
+        with self._transaction() as cursor:
+            cursor.execute('INSERT OR IGNORE INTO streamers (channel_id, name) VALUES (?, ?)',
+                           (channel_id, channel_name))
+        self.watching = None
+        self.data_version = None
+        self.version = 0
+        self.commands = {}
+        self._read_settings()
+        self.logger.debug('Opened SQLite database %s', path)
+
+    def _read_settings(self):
+        with self._transaction() as cursor:
+            cursor.execute('PRAGMA data_version')
+            self.data_version = cursor.fetchone()[0]
+            cursor.execute('SELECT version, %s FROM streamers WHERE channel_id = ?'
+                           % ', '.join(SETTINGS), (self.channel_id,))
+            row = cursor.fetchone()
+            cursor.execute('SELECT name, output FROM commands WHERE channel_id = ?',
+                           (self.channel_id,))
+            self.commands = dict(cursor.fetchall())
+        settings = dict(zip(SETTINGS, row[1:]))
+        settings['expiry_notice'] = bool(settings['expiry_notice'])
+        self.settings = settings
+        self.version = row[0]
+
+    def watch(self, interval=1):
+        if self.watching is None:
+            self.watching = 'polling'
+            threading.Thread(target=self._poll, args=(interval,), name='settings-watch',
+                             daemon=True).start()
+
+    def _poll(self, interval):
+        while True:
+            time.sleep(interval)
+            with self._transaction() as cursor:
+                cursor.execute('PRAGMA data_version')
+                data_version = cursor.fetchone()[0]
+            if data_version != self.data_version:
+                self._read_settings()
+
+    def _add_columns(self, table, columns):
+        existing = [row[1] for row in self.connection.execute('PRAGMA table_info(%s)' % table)]
+        for name, definition in columns:
+            if name not in existing:
+                self.connection.execute(
+                    'ALTER TABLE %s ADD COLUMN %s %s' % (table, name, definition))
+
+    @contextmanager
+    def _transaction(self):
+        with self.lock:
+            with self.connection:
+                yield self.connection.cursor()
+
+    def _participants(self, where, parameters):
+        with self._transaction() as cursor:
+            cursor.execute(
+                'SELECT user_id, username, session_points, total_points FROM participants '
+                'WHERE channel_id = ? AND ' + where, (self.channel_id,) + parameters)
+            return [Participant(user_id=row[0], username=row[1], session_points=row[2],
+                                total_points=row[3]) for row in cursor.fetchall()]
+
+    def update_setting(self, name, value):
+        if name not in SETTINGS:
+            raise ValueError('Unknown setting %s' % name)
+        for _ in range(UPDATE_ATTEMPTS):
+            with self._transaction() as cursor:
+                cursor.execute('UPDATE streamers SET %s = ?, version = version + 1 '
+                               'WHERE channel_id = ? AND version = ?' % name,
+                               (value, self.channel_id, self.version))
+                updated = cursor.rowcount == 1
+            if not updated:
+                self.logger.info('Streamer settings changed since version %s, rereading',
+                                 self.version)
+            self._read_settings()
+            if updated:
+                return
+        raise sqlite3.OperationalError('Unable to update %s, streamer keeps changing' % name)
+
+    def get_participant(self, user_id):
+        participants = self._participants('user_id = ?', (int(user_id),))
+        return participants[0] if participants else None
+
+    def find_participant(self, username):
+        participants = self._participants('username = ?', (username,))
+        return participants[0] if participants else None
+
+    def add_participant(self, user_id, username):
+        with self._transaction() as cursor:
+            cursor.execute(
+                'INSERT OR IGNORE INTO participants (channel_id, user_id, username) '
+                'VALUES (?, ?, ?)', (self.channel_id, int(user_id), username))
+        return self.get_participant(user_id)
+
+    def iter_participants(self):
+        return iter(self._participants('1', ()))
+
+    def award_points(self, awards, sequence=None):
+        with self._transaction() as cursor:
+            if sequence is not None:
+                cursor.execute('UPDATE streamers SET ledger_sequence = ? WHERE channel_id = ? '
+                               'AND ledger_sequence < ?', (sequence, self.channel_id, sequence))
+                if cursor.rowcount != 1:
+                    return
+            cursor.executemany(
+                'UPDATE participants SET session_points = session_points + ?, '
+                'total_points = total_points + ? WHERE channel_id = ? AND user_id = ?',
+                [(points, points, self.channel_id, int(user_id))
+                 for user_id, points in awards.items() if points])
+
+    def ledger_sequence(self):
+        with self._transaction() as cursor:
+            cursor.execute('SELECT ledger_sequence FROM streamers WHERE channel_id = ?',
+                           (self.channel_id,))
+            return cursor.fetchone()[0]
+
+    def reset_session_points(self):
+        with self._transaction() as cursor:
+            cursor.execute('UPDATE participants SET session_points = 0 WHERE channel_id = ?',
+                           (self.channel_id,))
+
+    def list_commands(self):
+        return list(self.commands.items())
+
+    def get_command(self, name):
+        return self.commands.get(name)
+
+    def add_command(self, name, output):
+        with self._transaction() as cursor:
+            cursor.execute('INSERT OR REPLACE INTO commands (channel_id, name, output) '
+                           'VALUES (?, ?, ?)', (self.channel_id, name, output))
+            self.commands[name] = output
+
+    def remove_command(self, name):
+        with self._transaction() as cursor:
+            cursor.execute('DELETE FROM commands WHERE channel_id = ? AND name = ?',
+                           (self.channel_id, name))
+            self.commands.pop(name, None)
+
+    def edit_command(self, name, output):
+        with self._transaction() as cursor:
+            cursor.execute('UPDATE commands SET output = ? WHERE channel_id = ? AND name = ?',
+                           (output, self.channel_id, name))
+            if cursor.rowcount:
+                self.commands[name] = output
+
+    def in_user_list(self, list_name, user_id):
+        with self._transaction() as cursor:
+            cursor.execute('SELECT 1 FROM user_lists WHERE channel_id = ? AND list_name = ? '
+                           'AND user_id = ?', (self.channel_id, list_name, int(user_id)))
+            return cursor.fetchone() is not None
+
+    def add_to_user_list(self, list_name, user_id, username):
+        with self._transaction() as cursor:
+            cursor.execute('INSERT OR IGNORE INTO user_lists (channel_id, list_name, user_id, '
+                           'username) VALUES (?, ?, ?, ?)',
+                           (self.channel_id, list_name, int(user_id), username))
+            added = cursor.rowcount == 1
+        if not added:
+            self.logger.info('User with ID %s already exists in the database', user_id)
+        return added
+
+    def remove_from_user_list(self, list_name, user_id):
+        with self._transaction() as cursor:
+            cursor.execute('DELETE FROM user_lists WHERE channel_id = ? AND list_name = ? '
+                           'AND user_id = ?', (self.channel_id, list_name, int(user_id)))
+            removed = cursor.rowcount == 1
+        if not removed:
+            self.logger.error('User with ID %s does not exist in the database', user_id)
+        return removed
+
+    def append_session(self, session):
+        with self._transaction() as cursor:
+            cursor.execute('INSERT INTO sessions (channel_id) VALUES (?)', (self.channel_id,))
+            session_id = cursor.lastrowid
+            cursor.executemany(
+                'INSERT INTO session_log (session_id, position, timestamp, participant, '
+                'participant_name, guess_type, guess, session_points, total_points, codes, '
+                'code_version) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                [(session_id, position, entry.timestamp, entry.participant,
+                  entry.participant_name, entry.guess_type, entry.guess or '',
+                  entry.session_points, entry.total_points, _pack_codes(entry.codes),
+                  entry.code_version)
+                 for position, entry in enumerate(session.guesses)])
+
+    def latest_session(self):
+        with self._transaction() as cursor:
+            cursor.execute('SELECT id FROM sessions WHERE channel_id = ? ORDER BY id DESC LIMIT 1',
+                           (self.channel_id,))
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            return self._load_session(cursor, row[0])
+
+    def _load_session(self, cursor, session_id):
+        cursor.execute(
+            'SELECT timestamp, participant, participant_name, guess_type, guess, '
+            'session_points, total_points, codes, code_version FROM session_log '
+            'WHERE session_id = ? ORDER BY position', (session_id,))
+        entries = cursor.fetchall()
+        return Session(guesses=[
+            SessionLogEntry(timestamp=entry[0], participant=entry[1],
+                            participant_name=entry[2], guess_type=entry[3],
+                            guess=entry[4] or None, session_points=entry[5],
+                            total_points=entry[6], codes=_unpack_codes(entry[7]),
+                            code_version=entry[8])
+            for entry in entries])
+
+    def update_stats(self, increments):
+        with self._transaction() as cursor:
+            cursor.executemany(
+                'INSERT OR IGNORE INTO stats (channel_id, kind, key, name) VALUES (?, ?, ?, ?)',
+                [(self.channel_id, kind, key, name) for kind, key, name, _, _, _ in increments])
+            cursor.executemany(
+                'UPDATE stats SET name = ?, guesses = guesses + ?, hits = hits + ?, '
+                'first = first + ? WHERE channel_id = ? AND kind = ? AND key = ?',
+                [(name, guesses, hits, first, self.channel_id, kind, key)
+                 for kind, key, name, guesses, hits, first in increments])
+
+    def _stats(self, where, parameters, limit):
+        with self._transaction() as cursor:
+            cursor.execute(
+                'SELECT %s FROM stats WHERE channel_id = ? AND kind = ? AND %s LIMIT %d'
+                % (', '.join(STATS_FIELDS), where, limit), (self.channel_id,) + parameters)
+            return [dict(zip(STATS_FIELDS, row)) for row in cursor.fetchall()]
+
+    def get_stats(self, kind, name):
+        rows = self._stats('name = ?', (kind, name), 1)
+        return rows[0] if rows else None
+
+    def top_stats(self, kind, limit=1):
+        return self._stats('1 ORDER BY guesses DESC', (kind,), limit)
+
+    def rebuild_stats(self):
+        collector = StatsCollector()
+        with self._transaction() as cursor:
+            cursor.execute(
+                'SELECT participant, participant_name, guess FROM session_log '
+                'JOIN sessions ON sessions.id = session_log.session_id '
+                'WHERE sessions.channel_id = ? AND guess_type = ? ORDER BY session_id, position',
+                (self.channel_id, 'Item'))
+            for user_id, username, guess in cursor.fetchall():
+                collector.record_guess(user_id, username, guess.split(', '))
+            cursor.execute('DELETE FROM stats WHERE channel_id = ?', (self.channel_id,))
+        collector.flush(self)
+        self.update_stats([(CHANNEL, CHANNEL, CHANNEL, 0, 0, 0)])
+        with self._transaction() as cursor:
+            cursor.execute('UPDATE stats SET backfilled = guesses WHERE channel_id = ?',
+                           (self.channel_id,))
+        self.logger.info('Rebuilt stats rollups from stored sessions')
+
+    def publish_live(self, name, data):
+        with self._transaction() as cursor:
+            cursor.execute('INSERT OR REPLACE INTO live_state VALUES (?, ?, ?, ?)',
+                           (self.channel_id, name, json.dumps(data), datetime.utcnow()))
+
+    def get_live(self, name):
+        with self._transaction() as cursor:
+            cursor.execute('SELECT data, updated FROM live_state WHERE channel_id = ? AND name = ?',
+                           (self.channel_id, name))
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        return {"data": json.loads(row[0]), "updated": row[1]}
+
+    def add_report(self, report_type, key, url, size):
+        with self._transaction() as cursor:
+            cursor.execute(
+                'INSERT OR REPLACE INTO reports (key, channel_id, channel_name, report_type, url, '
+                'size, created) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (key, self.channel_id, self.channel_name, report_type, url, size,
+                 datetime.utcnow()))
+
+    def list_reports(self, channel=None, report_type=None, start=None, end=None,
+                     page=1, per_page=50):
+        conditions = []
+        parameters = ()
+        for condition, value in (('channel_name = ?', channel),
+                                 ('report_type = ?', report_type),
+                                 ('created >= ?', start),
+                                 ('created < ?', end)):
+            if value:
+                conditions.append(condition)
+                parameters += (value,)
+        where = ' AND '.join(conditions) or '1'
+        with self._transaction() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM reports WHERE ' + where, parameters)
+            total = cursor.fetchone()[0]
+            cursor.execute(
+                'SELECT %s FROM reports WHERE %s ORDER BY created DESC LIMIT ? OFFSET ?'
+                % (', '.join(REPORT_FIELDS), where), parameters + (per_page, (page - 1) * per_page))
+            return [dict(zip(REPORT_FIELDS, row)) for row in cursor.fetchall()], total
+
+    def top_participants(self, limit):
+        return self._participants('1 ORDER BY session_points DESC LIMIT %d' % limit, ())
+
+    def publish_event(self, name, data):
+        with self._transaction() as cursor:
+            cursor.execute('INSERT INTO live_feed (channel_id, channel_name, name, data) '
+                           'VALUES (?, ?, ?, ?)',
+                           (self.channel_id, self.channel_name, name, json.dumps(data)))
+            cursor.execute('DELETE FROM live_feed WHERE id <= ?', (cursor.lastrowid - FEED_SIZE,))
+
+    def follow_events(self, position=None):
+        position = position or 0
+        while True:
+            with self._transaction() as cursor:
+                cursor.execute('SELECT id, channel_name, name, data FROM live_feed WHERE id > ? '
+                               'ORDER BY id', (position,))
+                events = cursor.fetchall()
+            for position, channel_name, name, data in events:
+                yield position, channel_name, name, json.loads(data)
+            if not events:
+                time.sleep(FEED_POLL)
+
+    def add_code_table(self, version, names):
+        with self._transaction() as cursor:
+            cursor.execute('INSERT OR IGNORE INTO code_tables VALUES (?, ?)',
+                           (version, json.dumps(names)))
+
+    def get_code_table(self, version):
+        with self._transaction() as cursor:
+            cursor.execute('SELECT names FROM code_tables WHERE version = ?', (version,))
+            row = cursor.fetchone()
+        return json.loads(row[0]) if row else None
+
+    def migrate_session_logs(self, guess_types, migrate):
+        with self._transaction() as cursor:
+            cursor.execute(
+                'SELECT session_log.rowid, timestamp, participant, participant_name, guess_type, '
+                'guess, session_points, total_points FROM session_log '
+                'JOIN sessions ON sessions.id = session_log.session_id '
+                'WHERE sessions.channel_id = ? AND codes IS NULL AND guess_type IN (%s)'
+                % ', '.join('?' * len(guess_types)), [self.channel_id] + list(guess_types))
+            updates = []
+            for row in cursor.fetchall():
+                entry = SessionLogEntry(timestamp=row[1], participant=row[2],
+                                        participant_name=row[3], guess_type=row[4],
+                                        guess=row[5], session_points=row[6],
+                                        total_points=row[7])
+                migrate(entry)
+                if entry.codes is not None:
+                    updates.append((entry.guess or '', _pack_codes(entry.codes),
+                                    entry.code_version, row[0]))
+            cursor.executemany(
+                'UPDATE session_log SET guess = ?, codes = ?, code_version = ? WHERE rowid = ?',
+                updates)
+        return len(updates)
+
+    def oldest_sessions(self, limit):
+        with self._transaction() as cursor:
+            cursor.execute(
+                'SELECT id FROM sessions WHERE channel_id = ? AND id < '
+                '(SELECT MAX(id) FROM sessions WHERE channel_id = ?) ORDER BY id LIMIT ?',
+                (self.channel_id, self.channel_id, limit))
+            return [self._load_session(cursor, row[0]) for row in cursor.fetchall()]
+
+    def remove_sessions(self, count):
+        with self._transaction() as cursor:
+            cursor.execute(
+                'SELECT id FROM sessions WHERE channel_id = ? AND id < '
+                '(SELECT MAX(id) FROM sessions WHERE channel_id = ?) ORDER BY id LIMIT ?',
+                (self.channel_id, self.channel_id, count))
+            ids = cursor.fetchall()
+            if len(ids) < count:
+                return False
+            cursor.executemany('DELETE FROM session_log WHERE session_id = ?', ids)
+            cursor.executemany('DELETE FROM sessions WHERE id = ?', ids)
+        return True
+
+    def hot_size(self):
+        with self._transaction() as cursor:
+            cursor.execute(
+                'SELECT SUM(LENGTH(timestamp) + LENGTH(participant) + LENGTH(participant_name) '
+                '+ LENGTH(guess_type) + LENGTH(guess) + LENGTH(session_points) '
+                '+ LENGTH(total_points) + IFNULL(LENGTH(codes), 0)) FROM session_log '
+                'JOIN sessions ON sessions.id = session_log.session_id WHERE channel_id = ?',
+                (self.channel_id,))
+            return cursor.fetchone()[0] or 0
+
+    def add_archive_segment(self, segment):
+        with self._transaction() as cursor:
+            cursor.execute(
+                'INSERT INTO archive_segments (channel_id, created, %s) VALUES (?, ?, %s)'
+                % (', '.join(ARCHIVE_FIELDS), ', '.join('?' * len(ARCHIVE_FIELDS))),
+                [self.channel_id, datetime.utcnow()]
+                + [segment[field] for field in ARCHIVE_FIELDS])
+
+    def list_archive_segments(self, start=None, end=None):
+        where = ['channel_id = ?']
+        parameters = [self.channel_id]
+        if start:
+            where.append('last >= ?')
+            parameters.append(start)
+        if end:
+            where.append('first <= ?')
+            parameters.append(end)
+        with self._transaction() as cursor:
+            cursor.execute('SELECT %s FROM archive_segments WHERE %s ORDER BY last'
+                           % (', '.join(ARCHIVE_FIELDS), ' AND '.join(where)), parameters)
+            return [dict(zip(ARCHIVE_FIELDS, row)) for row in cursor.fetchall()]
+
+    def _user_table(self, kind):
+        if kind == 'participants':
+            return 'participants', PARTICIPANT_FIELDS, [('channel_id', self.channel_id)]
+        return 'user_lists', USER_FIELDS, [('channel_id', self.channel_id), ('list_name', kind)]
+
+    def export_users(self, kind, batch_size=1000):
+        table, fields, keys = self._user_table(kind)
+        where = ' AND '.join('%s = ?' % key for key, _ in keys)
+        last = -1
+        while True:
+            with self._transaction() as cursor:
+                cursor.execute(
+                    'SELECT %s FROM %s WHERE %s AND user_id > ? ORDER BY user_id LIMIT ?'
+                    % (', '.join(fields), table, where),
+                    [value for _, value in keys] + [last, batch_size])
+                rows = cursor.fetchall()
+            for row in rows:
+                yield row
+            if len(rows) < batch_size:
+                return
+            last = rows[-1][0]
+
+    def import_users(self, kind, rows, add=False):
+        table, fields, keys = self._user_table(kind)
+        values = tuple(value for _, value in keys)
+        changes = ''.join(', %s = %s?' % (field, field + ' + ' if add else '')
+                          for field in fields[2:])
+        with self._transaction() as cursor:
+            cursor.executemany(
+                'INSERT OR IGNORE INTO %s (%s, user_id, username) VALUES (%s, ?, ?)'
+                % (table, ', '.join(key for key, _ in keys), ', '.join('?' * len(keys))),
+                [values + tuple(row[:2]) for row in rows])
+            cursor.executemany(
+                'UPDATE %s SET username = ?%s WHERE %s AND user_id = ?'
+                % (table, changes, ' AND '.join('%s = ?' % key for key, _ in keys)),
+                [tuple(row[1:]) + values + (row[0],) for row in rows])
+
+    def _stream(self, query, parameters, batch_size):
+        connection = sqlite3.connect(self.path, detect_types=sqlite3.PARSE_DECLTYPES)
+        try:
+            cursor = connection.execute(query, parameters)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    return
+                for row in rows:
+                    yield row
+        finally:
+            connection.close()
+
+    def stream_participants(self, order='total_points', limit=None, batch_size=1000):
+        if order not in PARTICIPANT_FIELDS[2:]:
+            raise ValueError('Unknown order %s' % order)
+        return self._stream(
+            'SELECT %s FROM participants WHERE channel_id = ? ORDER BY %s DESC, user_id LIMIT ?'
+            % (', '.join(PARTICIPANT_FIELDS), order), (self.channel_id, limit or -1), batch_size)
+
+    def record_standings(self):
+        session = datetime.utcnow().replace(microsecond=0)
+        with self._transaction() as cursor:
+            cursor.execute(
+                'INSERT INTO session_standings SELECT channel_id, ?, user_id, username, '
+                'session_points, total_points FROM participants '
+                'WHERE channel_id = ? AND session_points > 0', (session, self.channel_id))
+        return session
+
+    def standings_sessions(self, limit=2):
+        with self._transaction() as cursor:
+            cursor.execute('SELECT DISTINCT session FROM session_standings WHERE channel_id = ? '
+                           'ORDER BY session DESC LIMIT ?', (self.channel_id, limit))
+            return [row[0] for row in cursor.fetchall()]
+
+    def stream_standings(self, session, batch_size=1000):
+        return self._stream(
+            'SELECT %s FROM session_standings WHERE channel_id = ? AND session = ? '
+            'ORDER BY points DESC, user_id' % ', '.join(STANDING_FIELDS),
+            (self.channel_id, session), batch_size)
+
+    def stream_standings_deltas(self, previous, latest, batch_size=1000):
+        return self._stream(
+            'SELECT user_id, COALESCE(MAX(CASE WHEN session = ? THEN username END), '
+            'MAX(username)), SUM(CASE WHEN session = ? THEN points ELSE 0 END), '
+            'SUM(CASE WHEN session = ? THEN points ELSE 0 END), '
+            'SUM(CASE WHEN session = ? THEN points ELSE -points END) AS delta '
+            'FROM session_standings WHERE channel_id = ? AND session IN (?, ?) '
+            'GROUP BY user_id ORDER BY delta DESC, user_id',
+            (latest, previous, latest, latest, self.channel_id, previous, latest), batch_size)
+
+
+def _pack_codes(codes):
+    return bytes(codes) if codes is not None else None
+
+
+def _unpack_codes(codes):
+    return list(codes) if codes is not None else None
@@ -0,0 +1,64 @@
+"""Shared setup for the tests, which import the bot's modules from the repository root."""
+import functools
+import os
+import sys
+import shutil
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def game_dir(tmp_path, monkeypatch):
+    """Runs the test in a temporary directory set up for a GuessingGame on SQLite."""
+    shutil.copy(os.path.join(ROOT, 'items.json'), str(tmp_path))
+    monkeypatch.chdir(str(tmp_path))
+    monkeypatch.setenv('STORAGE_BACKEND', 'sqlite')
+    monkeypatch.setenv('SNAPSHOT_STORE', 'disk')
+    for name in ('SNAPSHOT_DIR', 'JOURNAL_DIR', 'LEDGER_DIR'):
+        monkeypatch.setenv(name, str(tmp_path / name.split('_')[0].lower()))
+    monkeypatch.delenv('S3_BUCKET', raising=False)
+    return tmp_path
+
+
+@pytest.fixture
+def make_game(game_dir):
+    """Returns a function that opens a GuessingGame on the test's database."""
+    from guessing_game import GuessingGame
+    from storage.sqlite import SQLiteStorage
+
+    def make(clock=None):
+        return GuessingGame(SQLiteStorage('1', 'channel', str(game_dir / 'game.db')), clock=clock)
+    return make
+
+
+@pytest.fixture
+def open_mongo(monkeypatch):
+    """
+    Returns a function that opens a MongoStorage on a test database.
+
+    The database is on the server at MONGODB_TEST_URI when it is set and on
+    mongomock otherwise, in which case the storage's mocked attribute is True.
+    """
+    mongoengine = pytest.importorskip('mongoengine')
+    from storage import mongo
+    uri = os.environ.get('MONGODB_TEST_URI')
+    mocked = not uri
+    if mocked:
+        mongomock = pytest.importorskip('mongomock')
+        uri = 'mongodb://localhost/guessing_bot_test'
+        connect = functools.partial(mongoengine.connect, mongo_client_class=mongomock.MongoClient)
+        # mongomock cannot create the capped collection the change feed uses.
+        connect(host=uri).get_database().create_collection(mongo.FEED_COLLECTION)
+        monkeypatch.setattr(mongo.mongodb, 'connect', connect)
+
+    def open_storage(channel_id='1', channel_name='channel'):
+        storage = mongo.MongoStorage(channel_id, channel_name, uri)
+        storage.mocked = mocked
+        return storage
+    yield open_storage
+    client = mongoengine.connection.get_connection()
+    client.drop_database(mongoengine.connection.get_db().name)
+    mongoengine.disconnect()
@@ -0,0 +1,116 @@
+"""Tests of the web app's report index against a SQLite report index."""
+import re
+from types import SimpleNamespace
+
+import pytest
+from cachetools import TTLCache
+
+import reports
+from storage.sqlite import SQLiteStorage
+
+
+class Timer():
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def web(game_dir, monkeypatch):
+    """Returns the app's test client, its report index storage and its cache's fake timer."""
+    import app
+    monkeypatch.setenv('S3_BUCKET', 'bucket')
+    storage = SQLiteStorage('1', 'channel', str(game_dir / 'game.db'))
+    monkeypatch.setitem(app.channel_storage, 'storage', storage)
+    timer = Timer()
+    monkeypatch.setattr(app, 'report_cache', TTLCache(256, app.REPORT_CACHE_TTL, timer=timer))
+    return SimpleNamespace(client=app.app.test_client(), storage=storage, timer=timer,
+                           per_page=app.PER_PAGE, ttl=app.REPORT_CACHE_TTL)
+
+
+def add_reports(web, report_type, count):
+    for number in range(count):
+        key = '%s-%03d.csv' % (report_type, number)
+        web.storage.add_report(report_type, key, 'https://bucket/%s' % key, 100)
+
+
+def rows(body):
+    return re.findall(r'<td><a href="[^"]*">([^<]*)</a></td>', body)
+
+
+def links(body):
+    return dict((name, href.replace('&amp;', '&')) for href, name in
+                re.findall(r'<a href="([^"]*)">(Previous|Next)</a>', body))
+
+
+def test_every_uploaded_report_type_can_be_filtered(web):
+    for report_type in reports.REPORT_TYPES:
+        add_reports(web, report_type, 2)
+    client = web.client
+    body = client.get('/').get_data(as_text=True)
+    options = re.findall(r'<option value="(\w+)"', body)
+    assert options == list(reports.REPORT_TYPES)
+    for report_type in (reports.REPORT_TOP, reports.REPORT_STANDINGS, reports.REPORT_DELTAS):
+        body = client.get('/?type=%s' % report_type).get_data(as_text=True)
+        assert '<option value="%s" selected>' % report_type in body
+        assert sorted(rows(body)) == ['%s-000.csv' % report_type, '%s-001.csv' % report_type]
+
+
+def test_pages_link_to_each_other_and_keep_filters(web):
+    per_page = web.per_page
+    add_reports(web, reports.REPORT_TOTALS, 2 * per_page + 10)
+    add_reports(web, reports.REPORT_LOG, 5)
+    client = web.client
+
+    body = client.get('/?type=totals').get_data(as_text=True)
+    assert len(rows(body)) == per_page
+    assert 'Page 1 of 3 (%s reports)' % (2 * per_page + 10) in body
+    assert list(links(body)) == ['Next']
+    assert 'type=totals' in links(body)['Next'] and 'page=2' in links(body)['Next']
+
+    body = client.get(links(body)['Next']).get_data(as_text=True)
+    assert 'Page 2 of 3' in body
+    assert sorted(links(body)) == ['Next', 'Previous']
+    assert 'page=1' in links(body)['Previous']
+
+    body = client.get(links(body)['Next']).get_data(as_text=True)
+    assert len(rows(body)) == 10
+    assert list(links(body)) == ['Previous']
+    assert set(rows(body)) <= {'totals-%03d.csv' % number for number in range(2 * per_page + 10)}
+
+    listing = client.get('/reports.json?type=log').get_json()
+    assert (listing['total'], listing['pages'], len(listing['reports'])) == (5, 1, 5)
+
+
+@pytest.mark.parametrize('path', ['/', '/reports.json'])
+def test_repeat_visits_get_not_modified(web, path):
+    add_reports(web, reports.REPORT_LOG, 3)
+    client = web.client
+    response = client.get(path)
+    etag = response.headers['ETag']
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == 'public, max-age=%s' % web.ttl
+    repeat = client.get(path, headers={'If-None-Match': etag})
+    assert repeat.status_code == 304
+    assert repeat.get_data() == b''
+    assert client.get(path, headers={'If-None-Match': '"other"'}).status_code == 200
+
+
+def test_index_is_rendered_again_once_the_cache_expires(web):
+    add_reports(web, reports.REPORT_LOG, 1)
+    client = web.client
+    first = client.get('/')
+    add_reports(web, reports.REPORT_SESSION, 1)
+
+    web.timer.now = web.ttl - 1
+    cached = client.get('/', headers={'If-None-Match': first.headers['ETag']})
+    assert cached.status_code == 304
+    assert rows(client.get('/').get_data(as_text=True)) == ['log-000.csv']
+
+    web.timer.now = web.ttl + 1
+    fresh = client.get('/', headers={'If-None-Match': first.headers['ETag']})
+    assert fresh.status_code == 200
+    assert fresh.headers['ETag'] != first.headers['ETag']
+    assert sorted(rows(fresh.get_data(as_text=True))) == ['log-000.csv', 'session-000.csv']
@@ -0,0 +1,97 @@
+"""Round trips of sessions through the archive into segments on local disk and back."""
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+import archive
+from database.session import Session
+from database.session_log_entry import SessionLogEntry
+from storage.sqlite import SQLiteStorage
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+DAYS_AGO = [90, 60, 45, 10, 0]
+
+
+def old_session(days_ago):
+    timestamp = (datetime.now() - timedelta(days=days_ago)).replace(microsecond=0)
+    return Session(guesses=[
+        SessionLogEntry(timestamp=timestamp, participant=10, participant_name='alice',
+                        guess_type='Item', guess='day %s' % days_ago,
+                        session_points=1, total_points=days_ago)])
+
+
+def hot_guesses(storage):
+    return [session.guesses[0].guess for session in storage.oldest_sessions(10)] + \
+        [storage.latest_session().guesses[0].guess]
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = SQLiteStorage('1', 'channel', str(tmp_path / 'game.db'))
+    for days_ago in DAYS_AGO:
+        storage.append_session(old_session(days_ago))
+    return storage
+
+
+@pytest.mark.parametrize('compression', [
+    'gzip',
+    pytest.param('zstd', marks=pytest.mark.skipif(zstandard is None,
+                                                  reason='zstandard is not installed'))])
+def test_archived_sessions_round_trip(storage, tmp_path, compression):
+    store = archive.LocalSegmentStore(str(tmp_path / 'archive'))
+    archiver = archive.SessionArchiver(storage, store, max_age=30, compression=compression,
+                                       batch=2)
+    full_size = storage.hot_size()
+
+    assert archiver.run() == 2
+    assert hot_guesses(storage) == ['day 45', 'day 10', 'day 0']
+    assert archiver.metrics['hot-size'] == storage.hot_size() < full_size
+    assert archiver.run() == 1
+    assert archiver.run() == 0
+    assert hot_guesses(storage) == ['day 10', 'day 0']
+    assert archiver.metrics['hot-size'] == storage.hot_size()
+    assert (archiver.metrics['archived'], archiver.metrics['segments']) == (3, 2)
+
+    segments = storage.list_archive_segments()
+    assert [segment['sessions'] for segment in segments] == [2, 1]
+    for segment in segments:
+        assert segment['compression'] == compression
+        assert segment['name'].startswith('1/')
+        assert segment['name'].endswith(archive.EXTENSIONS[compression])
+        path = os.path.join(store.directory, segment['name'])
+        assert os.path.getsize(path) == segment['size']
+        assert not os.path.exists(path + '.partial')
+    assert segments[0]['last'] < segments[1]['first']
+
+    restored = list(archiver.iter_sessions())
+    assert [session.guesses[0].guess for session in restored] == ['day 90', 'day 60', 'day 45']
+    originals = [old_session(days_ago) for days_ago in DAYS_AGO[:3]]
+    for session, original in zip(restored, originals):
+        for field in ('participant', 'participant_name', 'guess_type', 'session_points',
+                      'total_points'):
+            assert session.guesses[0][field] == original.guesses[0][field]
+        assert abs(session.guesses[0].timestamp - original.guesses[0].timestamp) < \
+            timedelta(seconds=5)
+
+    recent = list(archiver.iter_sessions(start=datetime.now() - timedelta(days=50)))
+    assert [session.guesses[0].guess for session in recent] == ['day 45']
+
+
+def test_interrupted_run_is_finished_without_archiving_twice(storage, tmp_path, monkeypatch):
+    store = archive.LocalSegmentStore(str(tmp_path / 'archive'))
+    archiver = archive.SessionArchiver(storage, store, max_age=30)
+    monkeypatch.setattr(storage, 'remove_sessions', lambda count: False)
+    assert archiver.run() == 0
+    assert hot_guesses(storage) == ['day 90', 'day 60', 'day 45', 'day 10', 'day 0']
+    monkeypatch.undo()
+
+    assert archiver.run() == 3
+    assert hot_guesses(storage) == ['day 10', 'day 0']
+    assert [segment['sessions'] for segment in storage.list_archive_segments()] == [3]
+    assert [session.guesses[0].guess for session in archiver.iter_sessions()] == \
+        ['day 90', 'day 60', 'day 45']
@@ -0,0 +1,78 @@
+import irc.client
+import pytest
+
+import chat
+from chat import MOD, BROADCASTER, VIP, SUBSCRIBER
+
+
+def message(tags, text='!points'):
+    return chat.ChatMessage(tags, 'alice', text)
+
+
+def test_user_id_comes_from_its_tag():
+    assert message({"user-id": '42'}).user_id == '42'
+    assert message({}).user_id is None
+
+
+@pytest.mark.parametrize('badges, flags', [
+    ('moderator/1', MOD),
+    ('broadcaster/1,subscriber/12', BROADCASTER | SUBSCRIBER),
+    ('vip/1', VIP),
+    ('subscriber/3', SUBSCRIBER),
+    ('founder/0', SUBSCRIBER),
+    ('premium/1,bits/100', 0),
+])
+def test_badges_set_flags(badges, flags):
+    parsed = message({"badges": badges})
+    assert parsed.flags == flags
+    assert set(parsed.badges) == {badge.split('/')[0] for badge in badges.split(',')}
+
+
+def test_mod_and_subscriber_tags_set_flags_without_badges():
+    parsed = message({"mod": '1', "subscriber": '1', "badges": ''})
+    assert parsed.flags == MOD | SUBSCRIBER
+    assert parsed.is_mod()
+    assert not message({"mod": '0', "subscriber": '0'}).flags
+
+
+def test_roles():
+    broadcaster = message({"badges": 'broadcaster/1'})
+    assert broadcaster.is_mod()
+    assert broadcaster.has(MOD | BROADCASTER)
+    assert not broadcaster.has(VIP)
+    vip = message({"badges": 'vip/1'})
+    assert not vip.is_mod()
+    assert vip.has(VIP)
+
+
+@pytest.mark.parametrize('tags', [{}, {"badges": '', "user-id": '', "mod": ''},
+                                  {"badges": None}])
+def test_missing_or_empty_tags(tags):
+    parsed = message(tags)
+    assert parsed.badges == {}
+    assert parsed.flags == 0
+    assert not parsed.is_mod()
+    assert parsed.user_id in (None, '')
+
+
+def test_command_is_tokenized_once():
+    parsed = message({}, '!HUD Add hover boots')
+    assert parsed.command == ['!HUD', 'Add', 'hover', 'boots']
+    assert parsed.command_name == '!hud'
+    assert parsed.sub_command == 'add'
+    assert parsed.text == '!HUD Add hover boots'
+    single = message({}, '!Points')
+    assert (single.command, single.command_name, single.sub_command) == \
+        (['!Points'], '!points', None)
+
+
+def test_from_event():
+    event = irc.client.Event('pubmsg', irc.client.NickMask('alice!alice@alice.tmi.twitch.tv'),
+                             '#channel', ['!guess bow'],
+                             [{'key': 'user-id', 'value': '42'},
+                              {'key': 'badges', 'value': 'moderator/1'}])
+    parsed = chat.ChatMessage.from_event(event)
+    assert (parsed.username, parsed.user_id, parsed.flags) == ('alice', '42', MOD)
+    assert parsed.command == ['!guess', 'bow']
+    untagged = irc.client.Event('pubmsg', 'bob!bob@bob', '#channel', ['!points'], None)
+    assert chat.ChatMessage.from_event(untagged).tags == {}
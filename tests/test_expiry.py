@@ -0,0 +1,110 @@
+import chat
+import clocks
+
+MOD_USER = {"username": 'channel', "user-id": '1', "channel-id": '1'}
+MOD_PERMISSIONS = {"mod": True, "whitelist": False, "blacklist": False}
+USER_PERMISSIONS = {"mod": False, "whitelist": False, "blacklist": False}
+
+
+def send(game, text, user=None, permissions=USER_PERMISSIONS):
+    user = user or {"username": 'chatter', "user-id": '50', "channel-id": '1'}
+    message = chat.ChatMessage({"user-id": user['user-id']}, user['username'], text)
+    return game.do_command(user, permissions, message)
+
+
+def mod(game, text):
+    return send(game, text, MOD_USER, MOD_PERMISSIONS)
+
+
+def chatter(number):
+    return {"username": 'chatter%02d' % number, "user-id": str(100 + number), "channel-id": '1'}
+
+
+def started_game(make_game, minutes=2):
+    clock = clocks.SimulatedClock()
+    game = make_game(clock=clock)
+    mod(game, '!start')
+    mod(game, '!guesstime %s' % minutes)
+    return game, clock
+
+
+def pending(game):
+    return sorted(guess.username for guess in game.guesses['item'].values())
+
+
+def test_guesses_expire_at_their_deadline(make_game):
+    game, clock = started_game(make_game, minutes=2)
+    send(game, '!guess bow', chatter(1))
+    clock.advance(60)
+    send(game, '!guess hookshot', chatter(2))
+    clock.advance(59)
+    assert game.expire_guesses() is None
+    assert pending(game) == ['chatter01', 'chatter02']
+    clock.advance(1)
+    game.expire_guesses()
+    assert pending(game) == ['chatter02']
+    assert game.odds['counts'] == {game.code_table.ids['item']['Hookshot']: 1}
+    clock.advance(60)
+    game.expire_guesses()
+    assert pending(game) == []
+    assert not game.odds['counts']
+
+
+def test_guess_expiry_setting_is_honoured(make_game):
+    game, clock = started_game(make_game, minutes=2)
+    send(game, '!guess bow', chatter(1))
+    mod(game, '!guesstime 5')
+    send(game, '!guess bow', chatter(2))
+    clock.advance(120)
+    game.expire_guesses()
+    assert pending(game) == ['chatter02']
+    clock.advance(180)
+    game.expire_guesses()
+    assert pending(game) == []
+
+
+def test_replaced_guesses_keep_their_new_deadline(make_game):
+    game, clock = started_game(make_game, minutes=2)
+    send(game, '!guess bow', chatter(1))
+    clock.advance(90)
+    send(game, '!guess hookshot', chatter(1))
+    clock.advance(30)
+    game.expire_guesses()
+    guess, = game.guesses['item'].values()
+    assert guess.codes == game.code_table.encode('item', ['Hookshot'])
+    clock.advance(90)
+    game.expire_guesses()
+    assert pending(game) == []
+
+
+def test_stale_entries_do_not_pile_up(make_game):
+    game, clock = started_game(make_game, minutes=15)
+    items = ['bow', 'hookshot', 'hammer', 'bombs']
+    for round_number in range(200):
+        for number in range(10):
+            send(game, '!guess %s' % items[(round_number + number) % 4], chatter(number))
+        clock.advance(1)
+        assert len(game.expiry['heap']) <= 3 * len(game.guesses['item'])
+    assert len(game.guesses['item']) == 10
+    clock.advance(15 * 60)
+    game.expire_guesses()
+    assert pending(game) == []
+    assert game.expiry['heap'] == []
+
+
+def test_expiry_notice_is_batched(make_game):
+    game, clock = started_game(make_game, minutes=1)
+    for number in range(25):
+        send(game, '!guess bow', chatter(number))
+    clock.advance(60)
+    assert game.expire_guesses() is None
+    assert pending(game) == []
+
+    mod(game, '!guessnotice on')
+    for number in range(25):
+        send(game, '!guess bow', chatter(number))
+    clock.advance(60)
+    notice = game.expire_guesses()
+    names = ', '.join('chatter%02d' % number for number in range(20))
+    assert notice == 'Guesses expired for %s and 5 more' % names
+    assert game.expire_guesses() is None
@@ -0,0 +1,120 @@
+"""Tests of the live feed relay and the server-sent events route built on it."""
+import queue
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import feed
+
+SUBSCRIBERS = 100
+UPDATES = 3
+
+
+class Feed():
+    """
+    This is a class for a change feed that counts how often it is read.
+
+    Events put on it are handed out one per read to whoever follows it.
+    """
+    def __init__(self, fail_first=False):
+        self.events = queue.Queue()
+        self.reads = 0
+        self.follows = 0
+        self.fail_first = fail_first
+
+    def follow(self, position):
+        self.follows += 1
+        if self.fail_first and self.follows == 1:
+            raise IOError('feed unavailable')
+        while True:
+            event = self.events.get()
+            self.reads += 1
+            yield event
+
+
+def wait_for(condition, timeout=5):
+    end = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < end, 'timed out'
+        time.sleep(0.005)
+
+
+@pytest.fixture
+def live():
+    """Returns a started relay, the feed it follows and the data it rendered."""
+    source = Feed()
+    renders = []
+
+    def render(channel_name, name, data):
+        renders.append(data)
+        return '<p>%s</p>' % data['n']
+    relay = feed.FeedRelay(source.follow, render, retry=0.01)
+    relay.start()
+    return SimpleNamespace(relay=relay, source=source, renders=renders)
+
+
+def test_subscribers_share_one_read_and_render_per_update(live):
+    relay = live.relay
+    seen = [[] for _ in range(SUBSCRIBERS)]
+
+    def subscribe(versions):
+        version = None
+        while len(versions) < UPDATES:
+            version, event = relay.wait('channel', version, 5)
+            assert event is not None
+            versions.append(version)
+    threads = [threading.Thread(target=subscribe, args=(versions,), daemon=True)
+               for versions in seen]
+    for thread in threads:
+        thread.start()
+    for number in range(1, UPDATES + 1):
+        live.source.events.put((number, 'channel', 'live', {"n": number}))
+        wait_for(lambda: all(len(versions) >= number for versions in seen))
+    for thread in threads:
+        thread.join(5)
+    assert live.source.reads == UPDATES
+    assert len(live.renders) == UPDATES
+    assert all(versions == [1, 2, 3] for versions in seen)
+
+
+def test_channels_are_kept_apart(live):
+    relay = live.relay
+    live.source.events.put((1, 'channel', 'live', {"n": 1}))
+    wait_for(lambda: relay.current('channel'))
+    assert relay.current('channel') == '<p>1</p>'
+    assert relay.current('other') is None
+    assert relay.wait('other', None, 0.05) == (None, None)
+    version, event = relay.wait('channel', None, 0.05)
+    assert event == 'id: 1\nevent: live\ndata: <p>1</p>\n\n'
+    assert relay.wait('channel', version, 0.05) == (version, None)
+
+
+def test_relay_follows_again_after_an_error():
+    source = Feed(fail_first=True)
+    relay = feed.FeedRelay(source.follow, lambda channel, name, data: str(data), retry=0.01)
+    relay.start()
+    source.events.put((1, 'channel', 'live', 'back'))
+    wait_for(lambda: relay.current('channel') == 'back')
+    assert source.follows == 2
+
+
+def test_events_route_streams_the_relay(live, monkeypatch):
+    import app
+    monkeypatch.setattr(app, 'live_relay', live.relay)
+    monkeypatch.setattr(app, 'KEEP_ALIVE', 0.05)
+    live.source.events.put((1, 'channel', 'live', {"n": 1}))
+    wait_for(lambda: live.relay.current('channel'))
+    response = app.app.test_client().get('/live/Channel/events')
+    assert response.mimetype == 'text/event-stream'
+    assert response.headers['Cache-Control'] == 'no-cache'
+    chunks = iter(response.response)
+    assert next(chunks) == b'id: 1\nevent: live\ndata: <p>1</p>\n\n'
+    assert next(chunks) == b': keep-alive\n\n'
+    live.source.events.put((2, 'channel', 'live', {"n": 2}))
+    for chunk in chunks:
+        if chunk != b': keep-alive\n\n':
+            break
+    assert chunk == b'id: 2\nevent: live\ndata: <p>2</p>\n\n'
+    response.close()
@@ -0,0 +1,107 @@
+"""Tests of the typo tolerant guess resolver against a corpus of chat misspellings."""
+import os
+import time
+
+import chat
+import fuzzy
+
+CORPUS = os.path.join(os.path.dirname(__file__), 'data', 'misspellings.tsv')
+MOD_USER = {"username": 'channel', "user-id": '1', "channel-id": '1'}
+MOD_PERMISSIONS = {"mod": True, "whitelist": False, "blacklist": False}
+USER_PERMISSIONS = {"mod": False, "whitelist": False, "blacklist": False}
+
+
+def read_corpus(kind):
+    with open(CORPUS) as corpus:
+        rows = [line.rstrip('\n').split('\t') for line in corpus if not line.startswith('#')]
+    return [(typed, intended) for row_kind, typed, intended in rows if row_kind == kind]
+
+
+def mean_microseconds(function, inputs, rounds=20):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text in inputs:
+            function(text)
+    return (time.perf_counter() - start) / (rounds * len(inputs)) * 1e6
+
+
+def all_modes_game(make_game):
+    game = make_game()
+    game.state['mode'] = [modes['name'] for modes in game.state['modes']]
+    return game
+
+
+def send(game, text, user=None, permissions=USER_PERMISSIONS):
+    user = user or {"username": 'chatter', "user-id": '50', "channel-id": '1'}
+    message = chat.ChatMessage({"user-id": user['user-id']}, user['username'], text)
+    return game.do_command(user, permissions, message)
+
+
+def test_edit_distance_counts_swaps_as_one_edit():
+    assert fuzzy.edit_distance('hookshot', 'hookshto', 2) == 1
+    assert fuzzy.edit_distance('hammer', 'hamer', 2) == 1
+    assert fuzzy.edit_distance('bow', 'slingshot', 2) == 3
+
+
+def test_index_resolves_closest_first_and_looks_up_exactly():
+    index = fuzzy.FuzzyIndex({'hookshot': ['Hookshot'], 'longshot': ['Hookshot'],
+                              'hover': ['Hover Boots'], 'bow': ['Bow']})
+    assert index.resolve('Hook-shto') == ('Hookshot',)
+    assert index.resolve('bwo') == ()
+    assert index.resolve('hovr') == ('Hover Boots',)
+    assert index.lookup('HOOKSHOT') == ('Hookshot',)
+    assert index.lookup('hookshto') == ()
+
+
+def test_corpus_items_resolve(make_game):
+    game = all_modes_game(make_game)
+    corpus = read_corpus('item')
+    resolved = [(intended, game._parse_items(typed.split(), 1)) for typed, intended in corpus]
+    correct = [intended for intended, items in resolved if items == [intended]]
+    wrong = [(intended, items) for intended, items in resolved if items and items != [intended]]
+    assert len(corpus) == 70
+    assert len(correct) >= 65
+    assert wrong == [('Bottle', ['Fire Medallion'])]
+
+
+def test_corpus_songs_resolve(make_game):
+    game = make_game()
+    for typed, intended in read_corpus('song'):
+        assert game._parse_songs(typed) == intended, typed
+
+
+def test_lookups_take_microseconds(make_game):
+    game = all_modes_game(make_game)
+    index = game.resolvers['items']
+    typed = [typed for typed, _ in read_corpus('item')]
+    index.resolve.cache_clear()
+    first = mean_microseconds(index._resolve, typed, rounds=1)
+    repeated = mean_microseconds(index.resolve, typed)
+    parse = mean_microseconds(lambda text: game._parse_items(text.split(), 1), typed)
+    print('first sighting %.1f us, repeated %.1f us, !guess parse %.1f us'
+          % (first, repeated, parse))
+    assert first < 500
+    assert repeated < 20
+    assert parse < 100
+
+
+def test_hud_only_accepts_exact_codes(make_game):
+    game = make_game()
+    send(game, '!start', MOD_USER, MOD_PERMISSIONS)
+    send(game, '!guess hookshto')
+    assert [guess.username for guess in game.guesses['item'].values()] == ['chatter']
+    send(game, '!hud hookshto', MOD_USER, MOD_PERMISSIONS)
+    assert game.guesses['item']
+    send(game, '!hud hookshot', MOD_USER, MOD_PERMISSIONS)
+    assert not game.guesses['item']
+    game.flush_points()
+    assert game.database['storage'].get_participant('50').session_points > 0
+
+
+def test_song_results_only_accept_exact_codes(make_game):
+    game = make_game()
+    send(game, '!start', MOD_USER, MOD_PERMISSIONS)
+    send(game, '!song lulaby sot', MOD_USER, MOD_PERMISSIONS)
+    assert game.state['songs'] == {}
+    send(game, '!song lullaby sot', MOD_USER, MOD_PERMISSIONS)
+    assert game.state['songs'] == {"Zelda's Lullaby": 'Song of Time'}
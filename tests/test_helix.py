@@ -0,0 +1,150 @@
+"""Tests of the Helix client against a local HTTP stand-in for the Twitch API."""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+import pytest
+
+from helix import HelixClient
+
+
+class StandIn(ThreadingMixIn, HTTPServer):
+    """
+    This is a class for a local server standing in for the Helix API.
+
+    Each request takes the next scripted (status, headers, body, delay) response,
+    or a found user once the script runs out, and is recorded as a tuple of the
+    time it arrived, its path and the client port it came from.
+    """
+    daemon_threads = True
+
+    def __init__(self):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), StandInHandler)
+        self.lock = threading.Lock()
+        self.script = []
+        self.requests = []
+
+    def respond(self, status=200, headers=None, body=None, delay=0):
+        if body is None:
+            body = {'data': [{'id': '42', 'login': 'alice'}]}
+        self.script.append((status, headers or {}, body, delay))
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self): #pylint: disable=invalid-name
+        with self.server.lock:
+            self.server.requests.append((time.time(), self.path, self.client_address[1]))
+            script = self.server.script
+            status, headers, body, delay = script.pop(0) if script else \
+                (200, {}, {'data': [{'id': '42', 'login': 'alice'}]}, 0)
+        time.sleep(delay)
+        payload = body if isinstance(body, bytes) else json.dumps(body).encode()
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args): #pylint: disable=arguments-differ
+        pass
+
+
+@pytest.fixture
+def server():
+    server = StandIn()
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(server):
+    return HelixClient('client-id', base_url='http://127.0.0.1:%s/' % server.server_port,
+                       timeout=(1, 0.5), retries=3, backoff=0.01)
+
+
+def test_get_user_id(server, client):
+    assert client.get_user_id('Alice') == '42'
+    assert [path for _, path, _ in server.requests] == ['/users?login=alice']
+
+
+def test_429_waits_for_ratelimit_reset(server, client):
+    reset = time.time() + 0.5
+    server.respond(429, {'Ratelimit-Remaining': '0', 'Ratelimit-Reset': '%.3f' % reset}, {})
+    assert client.get('users', {'login': 'alice'})['data'][0]['id'] == '42'
+    assert len(server.requests) == 2
+    assert server.requests[1][0] >= reset
+
+
+def test_empty_bucket_waits_before_sending(server, client):
+    reset = time.time() + 0.5
+    server.respond(headers={'Ratelimit-Remaining': '0', 'Ratelimit-Reset': '%.3f' % reset})
+    server.respond(headers={'Ratelimit-Remaining': '799', 'Ratelimit-Reset': '%.3f' % reset})
+    client.get('users')
+    client.get('users')
+    client.get('users')
+    arrivals = [arrived for arrived, _, _ in server.requests]
+    assert arrivals[0] < reset <= arrivals[1]
+    assert arrivals[2] - arrivals[1] < 0.4
+
+
+def test_retries_server_errors(server, client):
+    server.respond(500, body={})
+    server.respond(503, body={})
+    assert client.get_user_id('alice') == '42'
+    assert len(server.requests) == 3
+
+
+def test_gives_up_after_retries(server, client):
+    for _ in range(client.retries + 1):
+        server.respond(502, body={})
+    assert client.get_user_id('alice') is None
+    assert len(server.requests) == client.retries + 1
+    assert client.get_user_id('alice') == '42'
+
+
+def test_errors_are_not_retried_or_raised(server, client):
+    server.respond(404, body={'error': 'Not Found'})
+    server.respond(200, body=b'not json')
+    server.respond(200, body={'data': []})
+    assert client.get_user_id('alice') is None
+    assert client.get_user_id('alice') is None
+    assert client.get_user_id('alice') is None
+    assert len(server.requests) == 3
+
+
+def test_slow_responses_time_out_and_retry(server, client):
+    server.respond(delay=1)
+    started = time.time()
+    assert client.get_user_id('alice') == '42'
+    assert len(server.requests) == 2
+    assert time.time() - started < 1
+
+
+def test_concurrent_lookups_are_merged_and_cached(server, client):
+    server.respond(delay=0.3)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(client.get_user_id('alice')))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ['42'] * 8
+    assert client.get_user_id('ALICE') == '42'
+    assert len(server.requests) == 1
+
+
+def test_connections_are_kept_alive(server, client):
+    for name in ['alice', 'bob', 'carol', 'dave']:
+        client.get_user_id(name)
+    assert len(server.requests) == 4
+    assert len({port for _, _, port in server.requests}) == 1
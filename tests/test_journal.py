@@ -0,0 +1,57 @@
+import pytest
+
+import journal
+from journal import JournalReader, JournalWriter
+
+
+def read(path):
+    return [(event, data) for event, _, data in JournalReader(path)]
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'channel' / 'session.journal')
+
+
+def test_records_are_readable_before_sync(path):
+    writer = JournalWriter(path, sync_every=1000, sync_interval=1000)
+    writer.append(journal.START, {"username": 'a'})
+    assert read(path) == [(journal.START, {"username": 'a'})]
+    assert writer.pending == 1
+    writer.close()
+
+
+@pytest.mark.parametrize('torn', [
+    b'\x01\x02\x03',
+    journal.RECORD_HEADER.pack(20, journal.GUESS, 0.0) + b'{"a":',
+    journal.RECORD_HEADER.pack(5, journal.GUESS, 0.0) + b'{"a":'
+])
+def test_reopen_cuts_off_a_torn_record(path, torn):
+    writer = JournalWriter(path)
+    writer.append(journal.START, {"a": 1})
+    writer.close()
+    with open(path, 'ab') as file:
+        file.write(torn)
+    writer = JournalWriter(path)
+    writer.append(journal.GUESS, {"b": 2})
+    writer.append(journal.GUESS, {"c": 3})
+    writer.close()
+    assert read(path) == [(journal.START, {"a": 1}), (journal.GUESS, {"b": 2}),
+                          (journal.GUESS, {"c": 3})]
+
+
+def test_reopen_rewrites_a_torn_header(path):
+    JournalWriter(path).close()
+    with open(path, 'wb') as file:
+        file.write(journal.MAGIC[:2])
+    writer = JournalWriter(path)
+    writer.append(journal.START, {"a": 1})
+    writer.close()
+    assert read(path) == [(journal.START, {"a": 1})]
+
+
+def test_reopen_refuses_a_file_that_is_not_a_journal(path, tmp_path):
+    other = tmp_path / 'other'
+    other.write_bytes(b'not a journal')
+    with pytest.raises(ValueError):
+        JournalWriter(str(other))
@@ -0,0 +1,55 @@
+import pytest
+
+import journal
+from ledger import PointsLedger
+from storage.sqlite import SQLiteStorage
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = SQLiteStorage('1', 'channel', str(tmp_path / 'game.db'))
+    for user_id, username in ((11, 'a'), (12, 'b')):
+        storage.add_participant(user_id, username)
+    return storage
+
+
+def points(storage):
+    return {participant.username: participant.total_points
+            for participant in storage.iter_participants()}
+
+
+def test_flush_writes_the_awards_and_empties_the_journal(storage, tmp_path):
+    path = str(tmp_path / 'ledger' / '1.ledger')
+    ledger = PointsLedger(storage, path)
+    ledger.award({11: ['a', 2], 12: ['b', 0]})
+    ledger.award({11: ['a', 1], 12: ['b', 4]})
+    assert points(storage) == {'a': 0, 'b': 0}
+    assert ledger.get_participant(11).total_points == 3
+    assert ledger.flush() == 2
+    assert points(storage) == {'a': 3, 'b': 4}
+    assert list(journal.JournalReader(path)) == []
+
+
+@pytest.mark.parametrize('torn', [
+    b'\x01\x02\x03',
+    journal.RECORD_HEADER.pack(40, journal.AWARD, 0.0) + b'{"sequence":',
+    journal.RECORD_HEADER.pack(12, journal.AWARD, 0.0) + b'{"sequence":'
+])
+def test_reopening_after_a_torn_award_keeps_every_award(storage, tmp_path, torn):
+    path = str(tmp_path / 'ledger' / '1.ledger')
+    ledger = PointsLedger(storage, path)
+    ledger.award({11: ['a', 2]})
+    ledger.writer.close()
+    with open(path, 'ab') as file:
+        file.write(torn)
+
+    ledger = PointsLedger(storage, path)
+    assert points(storage) == {'a': 2, 'b': 0}
+    ledger.award({12: ['b', 5]})
+    ledger.writer.close()
+    with open(path, 'ab') as file:
+        file.write(torn)
+
+    PointsLedger(storage, path)
+    assert points(storage) == {'a': 2, 'b': 5}
+    assert storage.ledger_sequence() == 2
@@ -0,0 +1,28 @@
+import json
+import logging
+
+from database.session import Session
+from database.session_log_entry import SessionLogEntry
+from guessing_game import MEDAL_ORDER
+from storage.sqlite import SQLiteStorage
+
+
+def medal_entry(guess):
+    return SessionLogEntry(participant=11, participant_name='a', guess_type='Medal',
+                           guess=guess, session_points=0, total_points=0)
+
+
+def test_unparseable_entries_are_left_as_they_are(game_dir, make_game, caplog):
+    medals = dict((medal, 'deku') for medal in MEDAL_ORDER)
+    stored = [json.dumps(medals).replace(',', '\n'), 'forest deku fire dc', '["deku"]',
+              '{"not a medal": "deku"}']
+    storage = SQLiteStorage('1', 'channel', str(game_dir / 'game.db'))
+    storage.append_session(Session(guesses=[medal_entry(guess) for guess in stored]))
+    with caplog.at_level(logging.WARNING):
+        game = make_game()
+    entries = game.database['storage'].latest_session().guesses
+    assert entries[0].guess is None
+    assert game._describe_log_entry(entries[0]).splitlines()[0] == 'forest: deku'
+    assert [(entry.guess, entry.codes) for entry in entries[1:]] == \
+        [(guess, None) for guess in stored[1:]]
+    assert sum('leaving it as it is' in record.message for record in caplog.records) == 3
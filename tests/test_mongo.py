@@ -0,0 +1,172 @@
+"""
+Tests that MongoStorage changes the streamer's document with targeted updates.
+
+The streamer's collection is wrapped to record every call made on it, so the
+tests can check that each change sends one small update document rather than
+the whole streamer document, however big it grows.
+"""
+import bson
+import pytest
+from pymongo.results import UpdateResult
+
+from database.session import Session
+from database.session_log_entry import SessionLogEntry
+
+PARTICIPANTS = 2000
+WRITES = ('update_one', 'update_many', 'replace_one', 'insert_one', 'find_one_and_replace',
+          'find_one_and_update', 'bulk_write')
+
+
+class Recorder():
+    """
+    This is a class for recording the calls made on a collection.
+
+    Calls are passed on to the collection unless dry is set, in which case
+    updates report one document changed without being applied, for the update
+    features mongomock does not implement.
+    """
+    def __init__(self, collection):
+        self.collection = collection
+        self.calls = []
+        self.dry = False
+
+    def __getattr__(self, name):
+        method = getattr(self.collection, name)
+
+        def record(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+            if self.dry and name == 'update_one':
+                return UpdateResult({'n': 1, 'nModified': 1}, True)
+            return method(*args, **kwargs)
+        return record
+
+    def writes(self):
+        return [call for call in self.calls if call[0] in WRITES]
+
+
+@pytest.fixture
+def storage(open_mongo):
+    storage = open_mongo()
+    storage.import_users('participants', [(user_id, 'user%s' % user_id, 1, 1)
+                                          for user_id in range(1, PARTICIPANTS + 1)])
+    storage.collection = Recorder(storage.collection)
+    return storage
+
+
+def document_size(storage):
+    return len(bson.BSON.encode(storage.collection.collection.find_one()))
+
+
+def sent_size(call):
+    """Returns the size in bytes of the encoded filter and update of an update_one call."""
+    _, args, kwargs = call
+    return len(bson.BSON.encode({'q': args[0], 'u': args[1],
+                                 'arrayFilters': kwargs.get('array_filters') or []}))
+
+
+def only_write(storage):
+    writes = storage.collection.writes()
+    assert [name for name, _, _ in writes] == ['update_one']
+    assert sent_size(writes[0]) < 512 < document_size(storage) // 100
+    return writes[0][1]
+
+
+def assert_no_full_reads(storage):
+    for name, args, _ in storage.collection.calls:
+        if name in ('find', 'find_one'):
+            assert len(args) > 1 and args[1], 'read the whole document'
+
+
+@pytest.mark.parametrize('change', [
+    lambda storage: storage.add_participant('9999', 'newcomer'),
+    lambda storage: storage.add_command('hello', 'hi'),
+    lambda storage: storage.add_to_user_list('whitelist', '5', 'user5'),
+    lambda storage: storage.append_session(Session(guesses=[SessionLogEntry(
+        participant=5, participant_name='user5', guess_type='Item', guess='Bow',
+        session_points=1, total_points=1)])),
+], ids=['participant', 'command', 'whitelist', 'session'])
+def test_additions_are_pushed(storage, change):
+    change(storage)
+    query, update = only_write(storage)
+    assert set(update) <= {'$push', '$inc'}
+    assert len(query) == 2 or list(query) == ['channel_id']
+    assert_no_full_reads(storage)
+
+
+def test_removals_are_pulled(storage):
+    storage.add_command('hello', 'hi')
+    storage.add_to_user_list('blacklist', '5', 'user5')
+    storage.collection.calls = []
+    storage.remove_command('hello')
+    storage.remove_from_user_list('blacklist', '5')
+    updates = [args[1] for _, args, _ in storage.collection.writes()]
+    assert [set(update) for update in updates] == [{'$pull', '$inc'}] * 2
+    assert storage.get_command('hello') is None
+    assert not storage.in_user_list('blacklist', '5')
+    assert_no_full_reads(storage)
+
+
+def test_command_edit_is_a_positional_set(storage):
+    storage.add_command('hello', 'hi')
+    storage.collection.calls = []
+    storage.edit_command('hello', 'hey')
+    query, update = only_write(storage)
+    assert query['commands.name'] == 'hello'
+    assert update['$set'] == {'commands.$.output': 'hey'}
+    assert storage.get_command('hello') == 'hey'
+
+
+def test_settings_updates_check_the_version(storage, open_mongo):
+    version = storage.version
+    storage.update_setting('points', 2)
+    query, update = only_write(storage)
+    assert query['version'] == version
+    assert update == {'$set': {'points': 2}, '$inc': {'version': 1}}
+    assert storage.version == version + 1
+    assert_no_full_reads(storage)
+
+
+def test_stale_settings_writers_do_not_clobber(storage, open_mongo):
+    other = open_mongo()
+    other.update_setting('guess_expiry', 5)
+    storage.update_setting('points', 3)
+    assert len(storage.collection.writes()) == 2
+    fresh = open_mongo()
+    assert (fresh.settings['guess_expiry'], fresh.settings['points']) == (5, 3)
+
+
+def test_awards_increment_only_the_awarded_participants(storage):
+    storage.collection.dry = storage.mocked
+    storage.award_points({'5': 2, '6': 0, '7': 1}, sequence=9)
+    query, update = only_write(storage)
+    assert query['ledger_sequence'] == {'$not': {'$gte': 9}}
+    assert update['$set'] == {'ledger_sequence': 9}
+    assert sorted(update['$inc'].values()) == [1, 1, 2, 2]
+    array_filters = storage.collection.writes()[0][2]['array_filters']
+    assert sorted(f.popitem()[1] for f in array_filters) == [5, 7]
+    if not storage.mocked:
+        assert storage.get_participant('5').total_points == 3
+
+
+def test_session_reset_sets_every_participant_at_once(storage):
+    storage.collection.dry = storage.mocked
+    storage.reset_session_points()
+    _, update = only_write(storage)
+    assert update == {'$set': {'participants.$[].session_points': 0}}
+    if not storage.mocked:
+        assert storage.get_participant('5').session_points == 0
+
+
+@pytest.mark.parametrize('read', [
+    lambda storage: storage.top_participants(10),
+    lambda storage: list(storage.export_users('participants')),
+    lambda storage: list(storage.export_users('whitelist')),
+], ids=['top_participants', 'export_participants', 'export_whitelist'])
+def test_pipelines_project_before_unwinding(open_mongo, read):
+    storage = open_mongo()
+    storage.add_participant('5', 'user5')
+    storage.collection = Recorder(storage.collection)
+    read(storage)
+    (name, args, _), = [call for call in storage.collection.calls if call[0] == 'aggregate']
+    stages = [list(stage)[0] for stage in args[0]]
+    assert stages.index('$project') < stages.index('$unwind')
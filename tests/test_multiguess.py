@@ -0,0 +1,64 @@
+import chat
+from guessing_game import MULTIGUESS_LIMIT
+
+MOD_USER = {"username": 'channel', "user-id": '1', "channel-id": '1'}
+MOD_PERMISSIONS = {"mod": True, "whitelist": False, "blacklist": False}
+USER_PERMISSIONS = {"mod": False, "whitelist": False, "blacklist": False}
+
+
+def send(game, text, user=None, permissions=USER_PERMISSIONS):
+    user = user or {"username": 'chatter', "user-id": '50', "channel-id": '1'}
+    message = chat.ChatMessage({"user-id": user['user-id']}, user['username'], text)
+    return game.do_command(user, permissions, message)
+
+
+def mod(game, text):
+    return send(game, text, MOD_USER, MOD_PERMISSIONS)
+
+
+def chatter(number):
+    return {"username": 'chatter%s' % number, "user-id": str(100 + number), "channel-id": '1'}
+
+
+def guessed(game, number):
+    guess = game.guesses['item'].get(100 + number)
+    return [] if guess is None else game.code_table.decode('item', guess.codes)
+
+
+def test_guess_takes_several_items_only_in_multiguess_mode(make_game):
+    game = make_game()
+    mod(game, '!start')
+    send(game, '!guess bow hookshot bombs', chatter(1))
+    assert guessed(game, 1) == ['Bow']
+    mod(game, '!finish')
+
+    mod(game, '!mode multiguess')
+    mod(game, '!start')
+    send(game, '!guess bow hookshot bombs', chatter(1))
+    assert guessed(game, 1) == ['Bow', 'Hookshot', 'Bombs']
+    send(game, '!guess bow hookshot bombs hammer', chatter(2))
+    assert len(guessed(game, 2)) == MULTIGUESS_LIMIT
+
+
+def test_hud_gives_each_user_one_combined_award(make_game):
+    game = make_game()
+    mod(game, '!mode multiguess')
+    mod(game, '!start')
+    send(game, '!guess bow hookshot', chatter(1))
+    send(game, '!guess bombs hammer', chatter(2))
+    send(game, '!guess bow', chatter(3))
+    awards = []
+    award = game.ledger.award
+    game.ledger.award = lambda batch: awards.append(dict(batch)) or award(batch)
+
+    mod(game, '!hud bow hookshot bombs')
+    # One point per correct item, and one bonus per item for the first to guess it
+    assert awards == [{100 + 1: ['chatter1', 4], 100 + 2: ['chatter2', 2],
+                       100 + 3: ['chatter3', 1]}]
+    assert guessed(game, 1) == []
+    assert guessed(game, 2) == ['Hammer']
+    assert guessed(game, 3) == []
+    game.flush_points()
+    storage = game.database['storage']
+    assert [storage.get_participant(str(100 + number)).session_points
+            for number in (1, 2, 3)] == [4, 2, 1]
@@ -0,0 +1,95 @@
+from collections import Counter
+
+import chat
+import clocks
+
+MOD_USER = {"username": 'channel', "user-id": '1', "channel-id": '1'}
+MOD_PERMISSIONS = {"mod": True, "whitelist": False, "blacklist": False}
+USER_PERMISSIONS = {"mod": False, "whitelist": False, "blacklist": False}
+
+
+def send(game, text, user=None, permissions=USER_PERMISSIONS):
+    user = user or {"username": 'chatter', "user-id": '50', "channel-id": '1'}
+    message = chat.ChatMessage({"user-id": user['user-id']}, user['username'], text)
+    return game.do_command(user, permissions, message)
+
+
+def mod(game, text):
+    return send(game, text, MOD_USER, MOD_PERMISSIONS)
+
+
+def chatter(number):
+    return {"username": 'chatter%s' % number, "user-id": str(100 + number), "channel-id": '1'}
+
+
+def direct_count(game):
+    """Returns the pending item guesses per item name, counted from the guesses themselves."""
+    return Counter(name for guess in game.guesses['item'].values()
+                   for name in game.code_table.decode('item', guess.codes))
+
+
+def assert_odds(game, expected):
+    """Checks the live counts and both forms of !odds against a direct count."""
+    counts = direct_count(game)
+    assert counts == Counter(expected)
+    assert {game.code_table.names['item'][code]: count
+            for code, count in game.odds['counts'].items()} == counts
+    pending = len(game.guesses['item'])
+    if not pending:
+        assert send(game, '!odds') == 'No pending item guesses'
+        return
+    parts = ['%s %s%% (%s)' % (item, int(round(100.0 * count / pending)), count)
+             for item, count in sorted(counts.items(), key=lambda pair: -pair[1])]
+    assert send(game, '!odds') == 'Most guessed: %s' % ', '.join(parts)
+    for item in ('Bow', 'Hookshot', 'Bombs', 'Hammer'):
+        assert send(game, '!odds %s' % item.lower()) == \
+            '%s of %s pending guesses (%s%%) are on %s' % (
+                counts[item], pending, int(round(100.0 * counts[item] / pending)), item)
+
+
+def test_odds_follow_every_transition(make_game):
+    clock = clocks.SimulatedClock()
+    game = make_game(clock=clock)
+    mod(game, '!mode multiguess')
+    mod(game, '!start')
+    mod(game, '!guesstime 2')
+    assert_odds(game, {})
+
+    # Added
+    for number, items in enumerate(['bow', 'bow hookshot', 'bow hookshot bombs']):
+        send(game, '!guess %s' % items, chatter(number))
+    assert_odds(game, {'Bow': 3, 'Hookshot': 2, 'Bombs': 1})
+
+    # Replaced
+    clock.advance(60)
+    send(game, '!guess hammer', chatter(0))
+    assert_odds(game, {'Bow': 2, 'Hookshot': 2, 'Bombs': 1, 'Hammer': 1})
+    send(game, '!guess bow', chatter(0))
+    assert_odds(game, {'Bow': 3, 'Hookshot': 2, 'Bombs': 1})
+
+    # Scored, leaving the items that were not found pending
+    mod(game, '!hud hookshot')
+    assert_odds(game, {'Bow': 3, 'Bombs': 1})
+
+    # Expired
+    clock.advance(60)
+    game.expire_guesses()
+    assert_odds(game, {'Bow': 1})
+    clock.advance(60)
+    game.expire_guesses()
+    assert_odds(game, {})
+
+
+def test_odds_lists_the_most_guessed_items(make_game):
+    game = make_game()
+    mod(game, '!start')
+    items = ['bow', 'hookshot', 'bombs', 'hammer', 'slingshot', 'boomerang', 'lens']
+    number = 0
+    for rank, item in enumerate(items):
+        for _ in range(len(items) - rank):
+            send(game, '!guess %s' % item, chatter(number))
+            number += 1
+    reply = send(game, '!odds')
+    assert reply.startswith('Most guessed: Bow 25% (7), Hookshot 21% (6)')
+    assert reply.count('%') == 5
+    assert send(game, '!odds nothing like an item') is None
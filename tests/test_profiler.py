@@ -0,0 +1,63 @@
+import os
+import re
+import threading
+
+import profiler
+
+LINE = re.compile(r'^(\S.*) (\d+)$')
+FRAME = re.compile(r'^\S+ \([^;()]+:\d+\)$')
+
+
+def spin_in_known_function(profile, stop):
+    profile.tag('!hud')
+    while not stop.is_set():
+        sum(range(100))
+    profile.tag(None)
+
+
+def test_samples_are_written_as_tagged_collapsed_stacks(tmp_path):
+    profile = profiler.SamplingProfiler(rate=200, directory=str(tmp_path / 'profiles'))
+    stop = threading.Event()
+    spinner = threading.Thread(target=spin_in_known_function, args=(profile, stop), daemon=True)
+    spinner.start()
+    try:
+        assert profile.start(0.3)
+        assert profile.running
+        assert not profile.start(0.3)
+        sampler = profile.sampler
+        sampler.join(5)
+    finally:
+        stop.set()
+        spinner.join(5)
+    assert sampler is profile.sampler
+    assert not profile.running
+
+    written, = os.listdir(profile.directory)
+    assert written.endswith('.folded')
+    with open(os.path.join(profile.directory, written)) as folded:
+        lines = folded.read().splitlines()
+    stacks = {}
+    for line in lines:
+        stack, count = LINE.match(line).groups()
+        tag, *frames = stack.split(';')
+        assert frames and all(FRAME.match(frame) for frame in frames), line
+        stacks[stack] = (tag, frames, int(count))
+    counts = [count for _, _, count in stacks.values()]
+    assert counts == sorted(counts, reverse=True)
+
+    spinning = [(tag, count) for tag, frames, count in stacks.values()
+                if any(frame.startswith('spin_in_known_function (test_profiler.py:')
+                       for frame in frames)]
+    assert spinning
+    assert {tag for tag, _ in spinning} == {'!hud'}
+    assert sum(count for _, count in spinning) >= 10
+    assert 'idle' in {tag for tag, _, _ in stacks.values()}
+
+
+def test_profiler_can_run_again_after_finishing(tmp_path):
+    profile = profiler.SamplingProfiler(rate=100, directory=str(tmp_path))
+    assert profile.start(0)
+    profile.sampler.join(5)
+    assert profile.start(0)
+    profile.sampler.join(5)
+    assert not profile.running
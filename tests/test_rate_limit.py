@@ -0,0 +1,43 @@
+import rate_limit
+from rate_limit import RateLimiter, ACCEPT, DEFER, DROP
+
+
+def exhaust(limiter, user_id, command_name):
+    for _ in range(limiter.burst):
+        assert limiter.admit(user_id, command_name) == ACCEPT
+
+
+def test_deferred_guess_does_not_hold_other_commands():
+    limiter = RateLimiter(rate=0.001, burst=1)
+    exhaust(limiter, '1', '!guess')
+    assert limiter.admit('1', '!guess') == DEFER
+    limiter.defer('1', '!guess', 'guess')
+    assert limiter.admit('1', '!points') == ACCEPT
+    assert limiter.admit('2', '!guess') == ACCEPT
+
+
+def test_deferred_guesses_are_merged_per_user_and_command():
+    limiter = RateLimiter(rate=0.001, burst=1, merge_window=0)
+    exhaust(limiter, '1', '!guess')
+    limiter.defer('1', '!guess', 'first')
+    limiter.defer('1', '!guess', 'second')
+    limiter.defer('2', '!guess', 'other')
+    assert limiter.flush() == ['second', 'other']
+    assert limiter.stats()['shed']['merged'] == 1
+
+
+def test_limited_commands_that_cannot_merge_are_dropped():
+    limiter = RateLimiter(rate=0.001, burst=1)
+    exhaust(limiter, '1', '!points')
+    assert limiter.admit('1', '!points') == DROP
+    assert limiter.stats()['shed'] == {'limit !points': 1}
+
+
+def test_overload_sheds_low_priority_commands(monkeypatch):
+    limiter = RateLimiter(overload_rate=1)
+    assert limiter.admit('1', '!guess') == ACCEPT
+    assert limiter.admit('2', '!odds', low_priority=True) == DROP
+    assert limiter.overloaded()
+    now = rate_limit.time.monotonic()
+    monkeypatch.setattr(rate_limit.time, 'monotonic', lambda: now + 60)
+    assert not limiter.overloaded()
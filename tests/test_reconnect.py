@@ -0,0 +1,191 @@
+"""Tests of the bot reconnecting to a local IRC server standing in for Twitch chat."""
+import socket
+import threading
+import time
+from socketserver import StreamRequestHandler, TCPServer, ThreadingMixIn
+
+import pytest
+
+import reconnect
+
+FIRST = 0.2
+LONGEST = 0.4
+# How late a scheduled retry may run, the bot's loop polls every 0.05 seconds
+SLACK = 0.15
+
+
+class FakeChat(ThreadingMixIn, TCPServer):
+    """
+    This is a class for a local IRC server standing in for Twitch chat.
+
+    It welcomes every connection, acknowledges capabilities and echoes joins.
+    The next refuse connections are closed as soon as they are accepted, and
+    the time each connection was accepted and joined is recorded, along with
+    the time each handler saw its connection closed.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        TCPServer.__init__(self, ('127.0.0.1', 0), FakeChatHandler)
+        self.lock = threading.Lock()
+        self.refuse = 0
+        self.accepted = []
+        self.joined = []
+
+    def main(self):
+        """Returns the handler of the connection that joined last."""
+        with self.lock:
+            return self.joined[-1][1]
+
+
+class FakeChatHandler(StreamRequestHandler):
+    closed = None
+
+    def handle(self):
+        with self.server.lock:
+            self.server.accepted.append(time.monotonic())
+            if self.server.refuse:
+                self.server.refuse -= 1
+                return
+        for line in self.rfile:
+            words = line.decode().rstrip('\r\n').split(' ')
+            if words[0] == 'NICK':
+                self.nick = words[1]
+                self.send(':tmi.twitch.tv 001 %s :Welcome, GLHF!' % self.nick)
+            elif words[0] == 'CAP' and words[1] == 'REQ':
+                self.send(':tmi.twitch.tv CAP * ACK %s' % words[2])
+            elif words[0] == 'JOIN':
+                self.send(':{0}!{0}@{0}.tmi.twitch.tv JOIN {1}'.format(self.nick, words[1]))
+                with self.server.lock:
+                    self.server.joined.append((time.monotonic(), self))
+        self.closed = time.monotonic()
+
+    def send(self, line):
+        try:
+            self.wfile.write((line + '\r\n').encode())
+        except OSError:
+            pass
+
+    def drop(self):
+        """The function to close the connection, returning when it was closed."""
+        self.request.shutdown(socket.SHUT_RDWR)
+        return time.monotonic()
+
+
+def wait_for(condition, timeout=5):
+    end = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < end, 'timed out'
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def chat_server():
+    server = FakeChat()
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def start_bot(game_dir, chat_server, monkeypatch):
+    """Returns a function that starts a TwitchBot on the fake chat server once it has joined."""
+    import bot
+    import helix
+    monkeypatch.setattr(helix.HelixClient, 'get_user_id',
+                        lambda self, username: {'channel': '1', 'bot': '2'}[username])
+    _, port = chat_server.server_address
+    for name, value in (('TWITCH_ID', 'id'), ('TWITCH_TOKEN', 'oauth:token'),
+                        ('TWITCH_BOT_NAME', 'bot'), ('TWITCH_CHANNEL', 'channel'),
+                        ('IRC_SERVER', '127.0.0.1'), ('IRC_PORT', str(port)),
+                        ('RECONNECT_FIRST', str(FIRST)), ('RECONNECT_MAX', str(LONGEST))):
+        monkeypatch.setenv(name, value)
+    running = threading.Event()
+    bots = []
+
+    def loop(twitch_bot):
+        twitch_bot._connect()
+        while running.is_set():
+            twitch_bot.reactor.process_once(0.05)
+
+    def start(standby=False):
+        monkeypatch.setenv('IRC_STANDBY', '1' if standby else '0')
+        twitch_bot = bot.TwitchBot(False)
+        running.set()
+        thread = threading.Thread(target=loop, args=(twitch_bot,), daemon=True)
+        thread.start()
+        bots.append((twitch_bot, thread))
+        wait_for(lambda: chat_server.joined)
+        if standby:
+            wait_for(lambda: twitch_bot.standby_ready)
+        return twitch_bot
+    yield start
+    running.clear()
+    for twitch_bot, thread in bots:
+        thread.join()
+        twitch_bot.recon.run = lambda bot: None
+        twitch_bot.reactor.disconnect_all()
+
+
+def test_intervals_double_up_to_the_longest():
+    recon = reconnect.TwitchReconnect(FIRST, LONGEST)
+    bounds = [FIRST, 2 * FIRST, LONGEST, LONGEST]
+    for bound in bounds:
+        assert bound / 2 <= recon.next_interval() <= bound
+    recon.reset()
+    assert recon.next_interval() <= FIRST
+
+
+def test_drop_reconnects_within_backoff_bounds(chat_server, start_bot):
+    twitch_bot = start_bot()
+    chat_server.refuse = 3
+    dropped = chat_server.main().drop()
+    wait_for(lambda: len(chat_server.joined) == 2)
+
+    # One retry for each refused connection, then the one that joins
+    attempts = chat_server.accepted[1:]
+    assert len(attempts) == 4
+    waits = [later - earlier for earlier, later in zip([dropped] + attempts, attempts)]
+    for waited, bound in zip(waits, [FIRST, 2 * FIRST, LONGEST, LONGEST]):
+        assert bound / 2 <= waited <= bound + SLACK, waits
+
+    wait_for(lambda: not twitch_bot.gaps.in_gap())
+    rejoined = chat_server.joined[-1][0]
+    assert twitch_bot.gaps.metrics['gaps'] == 1
+    gap = twitch_bot.gaps.gaps[-1][1]
+    assert sum(bound / 2 for bound in [FIRST, 2 * FIRST, LONGEST, LONGEST]) <= gap
+    assert gap <= rejoined - dropped + SLACK
+    assert twitch_bot.recon.attempts == 0
+    assert twitch_bot.gaps.describe().startswith('1 disconnects')
+
+
+def test_reconnect_request_records_the_gap(chat_server, start_bot):
+    twitch_bot = start_bot()
+    old = chat_server.main()
+    asked = time.monotonic()
+    old.send(':tmi.twitch.tv RECONNECT')
+    wait_for(lambda: len(chat_server.joined) == 2)
+    wait_for(lambda: not twitch_bot.gaps.in_gap())
+    # Twitch asked, so the bot connects again straight away without backing off
+    assert chat_server.accepted[1] - asked < FIRST / 2
+    assert twitch_bot.gaps.metrics['gaps'] == 1
+    assert twitch_bot.gaps.gaps[-1][1] < SLACK
+    # The old connection is kept until the new one has joined, then closed
+    wait_for(lambda: old.closed is not None)
+    assert old.closed >= chat_server.joined[-1][0]
+    assert twitch_bot.retiring is None
+
+
+def test_drop_promotes_the_standby(chat_server, start_bot):
+    twitch_bot = start_bot(standby=True)
+    standby = twitch_bot.standby
+    main = chat_server.main()
+    assert len(chat_server.accepted) == 2
+    main.drop()
+    wait_for(lambda: twitch_bot.gaps.metrics['gaps'] == 1)
+    assert twitch_bot.connection is standby
+    assert twitch_bot.gaps.gaps[-1][1] < SLACK
+    assert chat_server.main() is not main
@@ -0,0 +1,86 @@
+import csv
+import gzip
+import json
+import os
+import random
+import shutil
+import tracemalloc
+from datetime import datetime
+
+import pytest
+
+import chat
+import reports
+from guessing_game import REPORT_TOTALS
+from storage.base import PARTICIPANT_FIELDS
+from storage.sqlite import SQLiteStorage
+
+PARTICIPANTS = 100000
+CEILING = 2 * 1024 * 1024
+MOD_USER = {"username": 'channel', "user-id": '1', "channel-id": '1'}
+MOD_PERMISSIONS = {"mod": True, "whitelist": False, "blacklist": False}
+
+
+def read_report(path, file_format):
+    """Returns the columns and rows of a report as lists of strings."""
+    if file_format == 'csv':
+        with open(path, newline='') as report:
+            rows = list(csv.reader(report))
+        return rows[0], rows[1:]
+    with gzip.open(path, 'rt', encoding='utf-8') as report:
+        if file_format == 'jsonl':
+            rows = [json.loads(line) for line in report]
+            columns = list(rows[0]) if rows else []
+            return columns, [[str(row[column]) for column in columns] for row in rows]
+        data = json.load(report)
+    columns = list(data['columns'])
+    return columns, [[str(value) for value in row]
+                     for row in zip(*[data['columns'][column] for column in columns])]
+
+
+@pytest.mark.parametrize('file_format', sorted(reports.FORMATS))
+def test_formats_hold_the_same_rows(tmp_path, file_format):
+    rows = [(1, 'a, "quoted"', datetime(2020, 1, 2, 3, 4, 5)), (2, 'b', None)]
+    path = str(tmp_path / ('report' + reports.FORMATS[file_format]))
+    assert reports.write_report(path, ['id', 'name', 'when'], iter(rows), file_format) == 2
+    columns, read = read_report(path, file_format)
+    assert columns == ['id', 'name', 'when']
+    expected = ['2020-01-02 03:04:05', ''] if file_format == 'csv' else \
+        ['2020-01-02T03:04:05', 'None']
+    assert [row[2] for row in read] == expected
+    assert [row[1] for row in read] == ['a, "quoted"', 'b']
+
+
+@pytest.fixture(scope='module')
+def participants_db(tmp_path_factory):
+    """Returns the path of a database of 100k participants."""
+    path = tmp_path_factory.mktemp('reports') / 'game.db'
+    storage = SQLiteStorage('1', 'channel', str(path))
+    generator = random.Random(0)
+    for start in range(0, PARTICIPANTS, 1000):
+        storage.import_users('participants', [
+            (user_id, 'user%06d' % user_id, generator.randint(0, 50), generator.randint(0, 5000))
+            for user_id in range(start + 1, start + 1001)])
+    storage.connection.close()
+    return path
+
+
+@pytest.mark.parametrize('file_format', sorted(reports.FORMATS))
+def test_100k_row_totals_stream_in_bounded_memory(participants_db, game_dir, make_game,
+                                                  file_format):
+    shutil.copy(str(participants_db), str(game_dir / 'game.db'))
+    game = make_game()
+    message = chat.ChatMessage({"user-id": '1'}, 'channel',
+                               '!report %s %s' % (REPORT_TOTALS, file_format))
+    tracemalloc.start()
+    game.do_command(MOD_USER, MOD_PERMISSIONS, message)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    assert peak < CEILING
+
+    name, = os.listdir(str(game_dir / 'reports'))
+    columns, rows = read_report(str(game_dir / 'reports' / name), file_format)
+    assert columns == PARTICIPANT_FIELDS
+    assert len(rows) == PARTICIPANTS
+    totals = [int(row[3]) for row in rows]
+    assert totals == sorted(totals, reverse=True)
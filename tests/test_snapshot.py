@@ -0,0 +1,82 @@
+import json
+import os
+import zlib
+
+import clocks
+import snapshot
+from guesses import Guess
+from guessing_game import MEDAL_ORDER
+
+SESSION_ENTRY = ('{"timestamp": {"$date": 1500000000000}, "participant": 12, '
+                 '"participant_name": "b", "guess_type": "Item", "guess": "Bow, Slingshot", '
+                 '"session_points": 0, "total_points": 0}')
+
+
+def write_version_1(game_dir, clock):
+    """Writes a snapshot and delta log as the bot saved them before version 2."""
+    now = clock.time()
+    state = {
+        "running": True,
+        "freebie": None,
+        "mode": [],
+        "songs": {},
+        "medals": {},
+        "guesses": {
+            "item": [{"timestamp": now, "deadline": now + 600, "user-id": '11',
+                      "username": 'a', "guess": 'Bow'}],
+            "medal": [dict({medal: 'deku' for medal in MEDAL_ORDER}, timestamp=now - 60,
+                           username='c', **{"user-id": '13'})],
+            "song": [{"timestamp": now, "deadline": now + 600, "user-id": '14',
+                      "username": 'd', "Not A Song": 'Nowhere'}]
+        },
+        "session": '{"guesses": []}',
+        "journal": None
+    }
+    delta = {
+        "type": 'item',
+        "guess": {"timestamp": now, "deadline": now + 300, "user-id": '12', "username": 'b',
+                  "guess": ['Bow', 'Slingshot']},
+        "log": SESSION_ENTRY
+    }
+    store = snapshot.DiskSnapshotStore('1', os.environ['SNAPSHOT_DIR'])
+    store.write_snapshot(zlib.compress(json.dumps(state).encode('utf-8')))
+    store.append_delta(json.dumps(delta).encode('utf-8'))
+    return store
+
+
+def test_version_1_guesses_are_converted(make_game, game_dir):
+    clock = clocks.SimulatedClock()
+    clock.advance(1000)
+    store = write_version_1(game_dir, clock)
+    game = make_game(clock)
+    items = game.guesses['item']
+    assert sorted(items) == [11, 12]
+    assert game.code_table.decode('item', items[12].codes) == ['Bow', 'Slingshot']
+    assert (items[11].timestamp, items[11].deadline) == (1000, 1600)
+    medal = game.guesses['medal'][13]
+    assert game.code_table.decode('dungeon', medal.codes) == ['deku'] * 6
+    # Guesses saved before deadlines get the streamer's expiry
+    assert medal.deadline == 940 + game.database['storage'].settings['guess_expiry'] * 60
+    assert not game.guesses['song']
+    assert game.database['session-log'] == [SESSION_ENTRY]
+
+    data, deltas = store.load()
+    assert deltas == []
+    assert json.loads(zlib.decompressobj().decompress(data).decode('utf-8'))['version'] == 2
+    restored = make_game(clock)
+    assert sorted(restored.guesses['item']) == [11, 12]
+    assert restored.database['session-log'] == [SESSION_ENTRY]
+
+
+def test_version_2_round_trip(game_dir):
+    clock = clocks.SimulatedClock()
+    saved = snapshot.GameSnapshot('1', clock=clock)
+    guess = Guess(5, 'e', 10, 910, bytes([1, 2]))
+    saved.save({"running": True, "guesses": {"item": [guess]}, "session": []})
+    saved.record_guess('item', Guess(6, 'f', 20, 920, bytes([3])), SESSION_ENTRY)
+    state, deltas = snapshot.GameSnapshot('1', clock=clock).load()
+    assert state['version'] == snapshot.SNAPSHOT_VERSION
+    assert state['session'] == '{"guesses": []}'
+    assert repr(state['guesses']['item'][0]) == repr(guess)
+    assert deltas[0]['guess'].deadline == 920
+    assert deltas[0]['log'] == SESSION_ENTRY
@@ -0,0 +1,25 @@
+import logging
+
+import soak
+
+# Five minutes of race with a small chat, played in a few seconds
+SHORT_RACE = ['--hours', str(5 / 60), '--participants', '200', '--rate', '1',
+              '--burst-rate', '4', '--completion-interval', '60', '--sample-interval', '60']
+
+
+def test_short_race_stays_within_budget(game_dir, caplog):
+    caplog.set_level(logging.INFO, logger='soak')
+    assert soak.main(SHORT_RACE) == 0
+    assert 'Finished the race in' in caplog.text
+    assert 'Over budget' not in caplog.text
+
+
+def test_budgets_are_enforced(game_dir, caplog):
+    assert soak.main(SHORT_RACE + ['--latency-budget', '0.0001', '--finish-budget', '0.0001',
+                                   '--memory-budget', '0.0001']) == 1
+    failures = [record.getMessage() for record in caplog.records
+                if record.levelno == logging.ERROR]
+    assert len(failures) == 3
+    assert any(failure.startswith('Over budget: hour 0 p99') for failure in failures)
+    assert any(failure.startswith('Over budget: !finish') for failure in failures)
+    assert any(failure.startswith('Over budget: peak heap') for failure in failures)
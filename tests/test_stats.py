@@ -0,0 +1,70 @@
+import chat
+import stats
+
+MOD_USER = {"username": 'channel', "user-id": '1', "channel-id": '1'}
+MOD_PERMISSIONS = {"mod": True, "whitelist": False, "blacklist": False}
+USER_PERMISSIONS = {"mod": False, "whitelist": False, "blacklist": False}
+
+
+def send(game, text, user=None, permissions=USER_PERMISSIONS):
+    user = user or {"username": 'chatter', "user-id": '50', "channel-id": '1'}
+    message = chat.ChatMessage({"user-id": user['user-id']}, user['username'], text)
+    return game.do_command(user, permissions, message)
+
+
+def mod(game, text):
+    return send(game, text, MOD_USER, MOD_PERMISSIONS)
+
+
+def chatter(number):
+    return {"username": 'chatter%s' % number, "user-id": str(100 + number), "channel-id": '1'}
+
+
+def test_stats_names_items_of_several_words(make_game):
+    game = make_game()
+    mod(game, '!start')
+    send(game, '!guess hover boots', chatter(1))
+    send(game, '!guess iron boots', chatter(2))
+    send(game, '!guess hovers', chatter(3))
+    mod(game, '!hud hover boots')
+    game.stats.flush(game.database['storage'])
+
+    assert send(game, '!stats hover boots') == \
+        'Hover Boots was guessed 2 times, 2 correct (100%), 1 first correct guesses'
+    assert send(game, '!stats hboots') == send(game, '!stats hover boots')
+    assert send(game, '!stats Iron Boots') == \
+        'Iron Boots was guessed 1 times, 0 correct (0%), 0 first correct guesses'
+    assert send(game, '!stats iron and hover boots') == \
+        'Iron and Hover Boots has not been guessed yet'
+    assert send(game, '!stats chatter1') == \
+        'chatter1 made 1 guesses, 1 correct (100%), 1 first correct guesses'
+    assert send(game, '!stats') == \
+        '3 guesses, 2 correct (67%), most guessed item is Hover Boots (2 times)'
+
+
+def test_rebuilt_stats_leave_backfilled_guesses_out_of_hit_rates(make_game):
+    game = make_game()
+    mod(game, '!start')
+    for number in range(3):
+        send(game, '!guess bow', chatter(number))
+    mod(game, '!hud bow')
+    mod(game, '!finish')
+    storage = game.database['storage']
+    storage.rebuild_stats()
+
+    assert send(game, '!stats') == \
+        '3 guesses, correct guesses not tracked yet, most guessed item is Bow (3 times)'
+    assert send(game, '!stats bow') == 'Bow was guessed 3 times, correct guesses not tracked yet'
+    assert send(game, '!stats chatter0') == \
+        'chatter0 made 1 guesses, correct guesses not tracked yet'
+
+    mod(game, '!start')
+    send(game, '!guess bow', chatter(0))
+    send(game, '!guess hammer', chatter(1))
+    mod(game, '!hud bow')
+    game.stats.flush(storage)
+    bow = storage.get_stats(stats.ITEM, 'Bow')
+    assert (bow['guesses'], bow['hits'], bow['backfilled'], stats.tracked(bow)) == (4, 1, 3, 1)
+    assert send(game, '!stats bow') == \
+        'Bow was guessed 4 times, 1 correct (100%), 1 first correct guesses'
+    assert send(game, '!stats').startswith('5 guesses, 1 correct (50%)')
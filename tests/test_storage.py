@@ -0,0 +1,356 @@
+"""
+Conformance tests run against every storage backend so they cannot drift apart.
+
+The MongoDB backend runs against the server at MONGODB_TEST_URI when it is set
+and against mongomock otherwise. Tests of the few update features mongomock does
+not implement are skipped under mongomock.
+"""
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from database.session import Session
+from database.session_log_entry import SessionLogEntry
+from stats import CHANNEL, ITEM, USER
+from storage.base import Storage, SETTINGS
+from storage.sqlite import SQLiteStorage
+
+CHANNEL_ID = '1'
+CHANNEL_NAME = 'channel'
+
+
+@pytest.fixture(params=['sqlite', 'mongo'])
+def open_storage(request, tmp_path):
+    """Returns a function that opens another storage object on the same data."""
+    if request.param == 'mongo':
+        return request.getfixturevalue('open_mongo')
+    path = str(tmp_path / 'game.db')
+    return lambda: SQLiteStorage(CHANNEL_ID, CHANNEL_NAME, path)
+
+
+@pytest.fixture
+def storage(open_storage):
+    return open_storage()
+
+
+def requires_mongod(storage, feature):
+    """Skips the test under mongomock, which does not implement the feature."""
+    if getattr(storage, 'mocked', False):
+        pytest.skip('mongomock does not implement %s' % feature)
+
+
+def entry(user_id, username, guess, guess_type='Item', codes=None):
+    return SessionLogEntry(timestamp=datetime(2020, 1, 1), participant=user_id,
+                           participant_name=username, guess_type=guess_type, guess=guess,
+                           codes=codes, code_version=1 if codes else None,
+                           session_points=0, total_points=0)
+
+
+def wait_for_next_second():
+    now = datetime.utcnow().replace(microsecond=0)
+    while datetime.utcnow().replace(microsecond=0) == now:
+        time.sleep(0.05)
+
+
+def test_every_method_is_implemented(storage):
+    for name, method in vars(Storage).items():
+        if callable(method) and not name.startswith('_'):
+            assert getattr(type(storage), name) is not method, name
+
+
+def test_settings(storage, open_storage):
+    assert sorted(storage.settings) == sorted(SETTINGS)
+    storage.update_setting('points', 3)
+    storage.update_setting('expiry_notice', True)
+    assert storage.settings['points'] == 3
+    assert open_storage().settings['points'] == 3
+    assert open_storage().settings['expiry_notice'] is True
+    with pytest.raises(ValueError):
+        storage.update_setting('unknown', 1)
+
+
+def test_stale_settings_writers_do_not_clobber(storage, open_storage):
+    other = open_storage()
+    other.update_setting('guess_expiry', 5)
+    storage.update_setting('points', 3)
+    assert (storage.settings['guess_expiry'], storage.settings['points']) == (5, 3)
+    other.update_setting('expiry_notice', True)
+    assert (other.settings['guess_expiry'], other.settings['points']) == (5, 3)
+    fresh = open_storage()
+    assert fresh.settings == dict(storage.settings, expiry_notice=True)
+
+
+def test_watch_picks_up_changes_from_another_process(storage, open_storage):
+    requires_mongod(storage, 'change streams')
+    storage.watch(interval=0.05)
+    open_storage().update_setting('guess_expiry', 5)
+    deadline = time.time() + 5
+    while storage.settings['guess_expiry'] != 5 and time.time() < deadline:
+        time.sleep(0.05)
+    assert storage.settings['guess_expiry'] == 5
+
+
+def test_participants(storage):
+    assert storage.get_participant('10') is None
+    assert storage.find_participant('alice') is None
+    participant = storage.add_participant('10', 'alice')
+    assert (participant.user_id, participant.username) == (10, 'alice')
+    assert (participant.session_points, participant.total_points) == (0, 0)
+    storage.add_participant('10', 'alice')
+    storage.add_participant('20', 'bob')
+    assert storage.get_participant(20).username == 'bob'
+    assert storage.find_participant('alice').user_id == 10
+    assert sorted(p.user_id for p in storage.iter_participants()) == [10, 20]
+
+
+def test_award_points_and_reset(storage):
+    requires_mongod(storage, 'array filters')
+    storage.add_participant('10', 'alice')
+    storage.add_participant('20', 'bob')
+    storage.award_points({'10': 3, '20': 0})
+    storage.award_points({'10': 2, '20': 1}, sequence=4)
+    storage.award_points({'10': 100}, sequence=4)
+    storage.award_points({'10': 100}, sequence=3)
+    assert storage.ledger_sequence() == 4
+    alice = storage.get_participant('10')
+    assert (alice.session_points, alice.total_points) == (5, 5)
+    storage.reset_session_points()
+    alice = storage.get_participant('10')
+    assert (alice.session_points, alice.total_points) == (0, 5)
+    assert storage.get_participant('20').total_points == 1
+
+
+def test_ledger_sequence_starts_at_zero(storage):
+    assert storage.ledger_sequence() == 0
+
+
+def test_commands(storage):
+    assert storage.get_command('hello') is None
+    storage.add_command('hello', 'hi')
+    storage.add_command('bye', 'later')
+    storage.edit_command('hello', 'hey')
+    assert storage.get_command('hello') == 'hey'
+    assert sorted(storage.list_commands()) == [('bye', 'later'), ('hello', 'hey')]
+    storage.remove_command('bye')
+    assert storage.list_commands() == [('hello', 'hey')]
+
+
+def test_commands_are_looked_up_in_the_cache(storage, open_storage):
+    other = open_storage()
+    other.add_command('!elsewhere', 'hi')
+    assert storage.get_command('!elsewhere') is None
+    assert storage.get_command('!xyz') is None
+    assert open_storage().get_command('!elsewhere') == 'hi'
+
+
+def test_watch_picks_up_commands_from_another_process(storage, open_storage):
+    requires_mongod(storage, 'change streams')
+    storage.watch(interval=0.05)
+    other = open_storage()
+    other.add_command('!elsewhere', 'hi')
+    deadline = time.time() + 5
+    while storage.get_command('!elsewhere') is None and time.time() < deadline:
+        time.sleep(0.05)
+    assert storage.get_command('!elsewhere') == 'hi'
+    other.remove_command('!elsewhere')
+    while storage.get_command('!elsewhere') is not None and time.time() < deadline:
+        time.sleep(0.05)
+    assert storage.get_command('!elsewhere') is None
+
+
+def test_user_lists(storage):
+    assert not storage.in_user_list('whitelist', '10')
+    assert storage.add_to_user_list('whitelist', '10', 'alice')
+    assert not storage.add_to_user_list('whitelist', '10', 'alice')
+    assert storage.in_user_list('whitelist', 10)
+    assert not storage.in_user_list('blacklist', '10')
+    assert storage.remove_from_user_list('whitelist', '10')
+    assert not storage.remove_from_user_list('whitelist', '10')
+    assert not storage.in_user_list('whitelist', '10')
+
+
+def test_sessions(storage):
+    assert storage.latest_session() is None
+    storage.append_session(Session(guesses=[entry(10, 'alice', 'Bow')]))
+    storage.append_session(Session(guesses=[entry(10, 'alice', 'Bow, Hammer'),
+                                            entry(20, 'bob', 'Hookshot')]))
+    latest = storage.latest_session()
+    assert [(e.participant, e.participant_name, e.guess) for e in latest.guesses] == \
+        [(10, 'alice', 'Bow, Hammer'), (20, 'bob', 'Hookshot')]
+    assert latest.guesses[0].timestamp == datetime(2020, 1, 1)
+
+
+def test_oldest_and_remove_sessions(storage):
+    assert storage.oldest_sessions(5) == []
+    assert not storage.remove_sessions(1)
+    for guess in ['Bow', 'Hammer', 'Hookshot']:
+        storage.append_session(Session(guesses=[entry(10, 'alice', guess)]))
+    assert [s.guesses[0].guess for s in storage.oldest_sessions(5)] == ['Bow', 'Hammer']
+    assert [s.guesses[0].guess for s in storage.oldest_sessions(1)] == ['Bow']
+    assert not storage.remove_sessions(3)
+    assert storage.remove_sessions(1)
+    assert [s.guesses[0].guess for s in storage.oldest_sessions(5)] == ['Hammer']
+    assert storage.latest_session().guesses[0].guess == 'Hookshot'
+
+
+def test_hot_size_grows_with_sessions(storage):
+    requires_mongod(storage, 'raw BSON documents')
+    before = storage.hot_size()
+    storage.append_session(Session(guesses=[entry(10, 'alice', 'Bow')] * 10))
+    assert storage.hot_size() > before
+
+
+def test_migrate_session_logs(storage):
+    storage.append_session(Session(guesses=[entry(10, 'alice', 'Bow'),
+                                            entry(10, 'alice', 'Bow', codes=[1]),
+                                            entry(10, 'alice', 'Gold', 'Medal')]))
+
+    def migrate(log_entry):
+        if log_entry.guess_type == 'Item':
+            log_entry.codes = [7]
+            log_entry.code_version = 2
+    assert storage.migrate_session_logs(['Item', 'Medal'], migrate) == 1
+    assert storage.migrate_session_logs(['Item', 'Medal'], migrate) == 0
+    guesses = storage.latest_session().guesses
+    assert [(e.codes, e.code_version) for e in guesses] == [([7], 2), ([1], 1), (None, None)]
+    assert guesses[2].guess == 'Gold'
+
+
+def test_code_tables(storage):
+    assert storage.get_code_table(1) is None
+    storage.add_code_table(1, ['NONE', 'Bow'])
+    storage.add_code_table(1, ['NONE', 'Hammer'])
+    assert storage.get_code_table(1) == ['NONE', 'Bow']
+
+
+def test_stats(storage):
+    assert storage.get_stats(ITEM, 'Bow') is None
+    storage.update_stats([(ITEM, 'bow', 'Bow', 2, 1, 1), (ITEM, 'hammer', 'Hammer', 1, 0, 0)])
+    storage.update_stats([(ITEM, 'bow', 'Bow', 1, 1, 0)])
+    assert storage.get_stats(ITEM, 'Bow') == {
+        'kind': ITEM, 'key': 'bow', 'name': 'Bow', 'guesses': 3, 'hits': 2, 'first': 1,
+        'backfilled': 0}
+    assert [row['name'] for row in storage.top_stats(ITEM, limit=2)] == ['Bow', 'Hammer']
+    assert storage.top_stats(USER) == []
+
+
+def test_rebuild_stats(storage):
+    storage.update_stats([(ITEM, 'stale', 'Stale', 5, 0, 0)])
+    storage.rebuild_stats()
+    assert storage.get_stats(ITEM, 'Stale') is None
+    assert storage.get_stats(CHANNEL, CHANNEL)['guesses'] == 0
+    storage.append_session(Session(guesses=[entry(10, 'alice', 'Bow, Hammer'),
+                                            entry(20, 'bob', 'Bow'),
+                                            entry(20, 'bob', 'Gold', 'Medal')]))
+    storage.rebuild_stats()
+    assert storage.get_stats(CHANNEL, CHANNEL)['guesses'] == 3
+    assert storage.get_stats(ITEM, 'Bow')['guesses'] == 2
+    assert storage.get_stats(USER, 'alice')['guesses'] == 2
+    assert storage.get_stats(USER, 'bob')['guesses'] == 1
+    # Hits are not logged, so the backfilled guesses are kept out of hit rates
+    assert storage.get_stats(ITEM, 'Bow') == {
+        'kind': ITEM, 'key': 'Bow', 'name': 'Bow', 'guesses': 2, 'hits': 0, 'first': 0,
+        'backfilled': 2}
+    assert storage.get_stats(CHANNEL, CHANNEL)['backfilled'] == 3
+    storage.update_stats([(ITEM, 'Bow', 'Bow', 1, 1, 1), (ITEM, 'Lens', 'Lens', 1, 0, 0)])
+    assert storage.get_stats(ITEM, 'Bow') == {
+        'kind': ITEM, 'key': 'Bow', 'name': 'Bow', 'guesses': 3, 'hits': 1, 'first': 1,
+        'backfilled': 2}
+    assert storage.get_stats(ITEM, 'Lens')['backfilled'] == 0
+
+
+def test_live_state(storage):
+    assert storage.get_live('odds') is None
+    storage.publish_live('odds', {'Bow': 1})
+    storage.publish_live('odds', {'Bow': 2})
+    live = storage.get_live('odds')
+    assert live['data'] == {'Bow': 2}
+    assert abs(live['updated'] - datetime.utcnow()) < timedelta(minutes=1)
+
+
+def test_reports(storage):
+    assert storage.list_reports() == ([], 0)
+    storage.add_report('session', 'a.csv', 'https://example.com/a.csv', 10)
+    storage.add_report('standings', 'b.csv', 'https://example.com/b.csv', 20)
+    storage.add_report('session', 'c.csv', 'https://example.com/c.csv', 30)
+    reports, total = storage.list_reports()
+    assert total == 3
+    assert set(reports[0]) == {'channel_name', 'report_type', 'key', 'url', 'size', 'created'}
+    reports, total = storage.list_reports(report_type='session', per_page=1, page=2)
+    assert total == 2 and len(reports) == 1
+    assert storage.list_reports(channel='other') == ([], 0)
+    assert storage.list_reports(channel=CHANNEL_NAME)[1] == 3
+    assert storage.list_reports(start=datetime.utcnow() + timedelta(hours=1))[1] == 0
+    assert storage.list_reports(end=datetime.utcnow() + timedelta(hours=1))[1] == 3
+
+
+def test_events(storage):
+    storage.publish_event('guess', {'user': 'alice'})
+    storage.publish_event('points', {'user': 'bob'})
+    events = storage.follow_events()
+    first = next(events)
+    assert first[1:] == (CHANNEL_NAME, 'guess', {'user': 'alice'})
+    assert next(events)[1:] == (CHANNEL_NAME, 'points', {'user': 'bob'})
+    assert next(storage.follow_events(first[0]))[1:] == (CHANNEL_NAME, 'points', {'user': 'bob'})
+
+
+def test_archive_segments(storage):
+    assert storage.list_archive_segments() == []
+    for day in (1, 10):
+        storage.add_archive_segment({
+            'name': 'segment-%s' % day, 'compression': 'zlib', 'sessions': 2,
+            'first': datetime(2020, 1, day), 'last': datetime(2020, 1, day + 2), 'size': 100})
+    segments = storage.list_archive_segments()
+    assert [segment['name'] for segment in segments] == ['segment-1', 'segment-10']
+    assert segments[0]['last'] == datetime(2020, 1, 3)
+    assert [segment['name'] for segment in
+            storage.list_archive_segments(start=datetime(2020, 1, 5))] == ['segment-10']
+    assert [segment['name'] for segment in
+            storage.list_archive_segments(end=datetime(2020, 1, 5))] == ['segment-1']
+
+
+def test_import_and_export_participants(storage):
+    assert list(storage.export_users('participants')) == []
+    storage.add_participant('10', 'alice')
+    storage.import_users('participants', [(10, 'alicia', 2, 5), (20, 'bob', 1, 1)])
+    assert sorted(storage.export_users('participants', batch_size=1)) == \
+        [(10, 'alicia', 2, 5), (20, 'bob', 1, 1)]
+    storage.import_users('participants', [(20, 'bob', 3, 3), (30, 'carol', 4, 4)], add=True)
+    assert sorted(storage.export_users('participants')) == \
+        [(10, 'alicia', 2, 5), (20, 'bob', 4, 4), (30, 'carol', 4, 4)]
+    assert storage.get_participant('30').username == 'carol'
+
+
+def test_import_and_export_user_lists(storage):
+    storage.add_to_user_list('blacklist', '10', 'alice')
+    storage.import_users('blacklist', [(10, 'alicia'), (20, 'bob')])
+    assert sorted(storage.export_users('blacklist')) == [(10, 'alicia'), (20, 'bob')]
+    assert storage.in_user_list('blacklist', '20')
+    assert list(storage.export_users('whitelist')) == []
+
+
+def test_stream_and_top_participants(storage):
+    storage.import_users('participants', [(10, 'alice', 1, 9), (20, 'bob', 5, 5),
+                                          (30, 'carol', 3, 9)])
+    assert list(storage.stream_participants(batch_size=1)) == \
+        [(10, 'alice', 1, 9), (30, 'carol', 3, 9), (20, 'bob', 5, 5)]
+    assert [row[0] for row in storage.stream_participants('session_points', limit=2)] == [20, 30]
+    assert [p.user_id for p in storage.top_participants(2)] == [20, 30]
+
+
+def test_standings(storage):
+    assert storage.standings_sessions() == []
+    storage.import_users('participants', [(10, 'alice', 2, 2), (20, 'bob', 0, 1),
+                                          (30, 'carol', 5, 5)])
+    previous = storage.record_standings()
+    wait_for_next_second()
+    storage.import_users('participants', [(10, 'alice', 6, 8), (20, 'bob', 1, 2),
+                                          (30, 'carol', 1, 6)])
+    latest = storage.record_standings()
+    assert storage.standings_sessions() == [latest, previous]
+    assert storage.standings_sessions(limit=1) == [latest]
+    assert list(storage.stream_standings(previous, batch_size=1)) == \
+        [(30, 'carol', 5, 5), (10, 'alice', 2, 2)]
+    assert list(storage.stream_standings_deltas(previous, latest)) == [
+        (10, 'alice', 2, 6, 4), (20, 'bob', 0, 1, 1), (30, 'carol', 5, 1, -4)]
@@ -0,0 +1,110 @@
+import random
+import threading
+import time
+
+from workers import CommandDispatcher
+
+
+def wait_for(condition, timeout=5):
+    end = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < end, 'timed out'
+        time.sleep(0.005)
+
+
+def blocked(dispatcher, key='channel'):
+    """Submits work that holds a worker until the returned event is set."""
+    release = threading.Event()
+    started = threading.Event()
+
+    def block():
+        started.set()
+        release.wait(5)
+    assert dispatcher.submit(key, block)
+    started.wait(5)
+    return release
+
+
+def test_work_with_a_key_runs_in_submission_order():
+    dispatcher = CommandDispatcher(workers=4)
+    generator = random.Random(0)
+    done = {'a': [], 'b': []}
+
+    def run(key, number):
+        time.sleep(generator.random() / 1000)
+        done[key].append(number)
+    for number in range(100):
+        for key in done:
+            dispatcher.submit(key, run, key, number)
+    wait_for(lambda: dispatcher.stats()['depth'] == 0)
+    assert done == {'a': list(range(100)), 'b': list(range(100))}
+
+
+def test_different_keys_run_concurrently():
+    dispatcher = CommandDispatcher(workers=2)
+    met = threading.Barrier(2, timeout=5)
+    passed = []
+
+    def meet():
+        met.wait()
+        passed.append(True)
+    dispatcher.submit('a', meet)
+    dispatcher.submit('b', meet)
+    wait_for(lambda: len(passed) == 2)
+
+
+def test_unkeyed_work_is_shed_before_keyed_work():
+    dispatcher = CommandDispatcher(workers=1, max_pending=5, soft_limit=0.8)
+    release = blocked(dispatcher)
+    for _ in range(3):
+        assert dispatcher.submit('channel', time.sleep, 0)
+    # Four pending reaches the soft limit for work that may be shed
+    assert not dispatcher.submit(None, time.sleep, 0)
+    assert dispatcher.submit('channel', time.sleep, 0)
+    assert not dispatcher.submit('channel', time.sleep, 0)
+    stats = dispatcher.stats()
+    assert (stats['depth'], stats['lanes'], stats['rejected']) == (5, 1, 2)
+    release.set()
+    wait_for(lambda: dispatcher.stats()['depth'] == 0)
+    assert dispatcher.submit(None, time.sleep, 0)
+
+
+def test_stats_count_waits_and_failures():
+    dispatcher = CommandDispatcher(workers=1)
+    release = blocked(dispatcher)
+    dispatcher.submit('other', time.sleep, 0)
+    dispatcher.submit('other', int, 'not a number')
+    time.sleep(0.1)
+    release.set()
+    wait_for(lambda: dispatcher.stats()['depth'] == 0)
+    stats = dispatcher.stats()
+    assert stats['submitted'] == 3
+    assert stats['failed'] == 1
+    assert stats['lanes'] == 0
+    assert 0.1 <= stats['wait-max'] < 1
+    assert 0 < stats['wait-average'] < stats['wait-max']
+
+
+def test_periodic_work_is_coalesced_while_queued_or_running():
+    dispatcher = CommandDispatcher(workers=1)
+    runs = []
+
+    def tick():
+        runs.append(time.monotonic())
+    release = blocked(dispatcher)
+    for _ in range(10):
+        assert dispatcher.submit('channel', tick, coalesce=True)
+    assert dispatcher.stats()['depth'] == 2
+    assert dispatcher.stats()['coalesced'] == 9
+    release.set()
+    wait_for(lambda: dispatcher.stats()['depth'] == 0)
+    assert len(runs) == 1
+    assert dispatcher.submit('channel', tick, coalesce=True)
+    wait_for(lambda: len(runs) == 2)
+    # Work that is not coalesced is always queued
+    release = blocked(dispatcher)
+    for _ in range(3):
+        dispatcher.submit('channel', tick)
+    assert dispatcher.stats()['depth'] == 4
+    release.set()
+    wait_for(lambda: len(runs) == 5)
@@ -0,0 +1,220 @@
+"""This module provides bulk import and export of a channel's users and points."""
+import os
+import sys
+import csv
+import json
+import time
+import logging
+import argparse
+
+import helix
+import storage
+from storage.base import USER_LISTS, PARTICIPANT_FIELDS, USER_FIELDS
+
+KINDS = ['participants'] + USER_LISTS
+COLUMNS = ['kind'] + PARTICIPANT_FIELDS
+FORMATS = ['csv', 'jsonl']
+
+logger = logging.getLogger(__name__)
+
+
+class Progress():
+    """This is a class for logging how many rows have been handled and how fast."""
+    def __init__(self, action, every):
+        """
+        The constructor for Progress class.
+
+        Parameters:
+            action (string): What is being done to the rows, such as 'Exported'
+            every (int): How many rows to handle between log messages
+        """
+        self.action = action
+        self.every = every
+        self.count = 0
+        self.start = time.monotonic()
+
+    def add(self, count=1):
+        """The function to count handled rows, logging every so many."""
+        before = self.count
+        self.count += count
+        if self.every and before // self.every != self.count // self.every:
+            self.log()
+
+    def log(self):
+        """The function to log the rows handled so far."""
+        elapsed = max(time.monotonic() - self.start, 1e-9)
+        logger.info('%s %s rows in %.1f seconds (%d rows/s)', self.action, self.count, elapsed,
+                    self.count / elapsed)
+
+
+def fields_for(kind):
+    """Returns the fields stored for a kind of user."""
+    return PARTICIPANT_FIELDS if kind == 'participants' else USER_FIELDS
+
+
+def export_rows(channel_storage, kinds, batch_size):
+    """Returns a generator of the users of each kind as dicts, including their kind."""
+    for kind in kinds:
+        fields = fields_for(kind)
+        for row in channel_storage.export_users(kind, batch_size):
+            yield dict(zip(fields, row), kind=kind)
+
+
+def write_rows(rows, file, file_format, progress):
+    """The function to write rows to a file as CSV or JSONL, one at a time."""
+    if file_format == 'csv':
+        writer = csv.DictWriter(file, COLUMNS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            progress.add()
+    else:
+        for row in rows:
+            file.write(json.dumps(row, separators=(',', ':')) + '\n')
+            progress.add()
+
+
+def read_rows(file, file_format):
+    """Returns a generator of the rows in a CSV or JSONL file as dicts."""
+    if file_format == 'csv':
+        for row in csv.DictReader(file):
+            yield row
+    else:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def parse_row(data):
+    """
+    The function to check a row read from a file.
+
+    Parameters:
+        data (dict): The row as read
+
+    Returns:
+        Returns a tuple of the row's kind and a tuple of its fields.
+
+    Raises:
+        ValueError: The row's kind is unknown or a field is missing or not a number.
+    """
+    kind = data.get('kind') or 'participants'
+    if kind not in KINDS:
+        raise ValueError('Unknown kind %s' % kind)
+    username = data.get('username')
+    if not username:
+        raise ValueError('Missing username')
+    row = [int(data['user_id']), username]
+    row += [int(data.get(field) or 0) for field in fields_for(kind)[2:]]
+    return kind, tuple(row)
+
+
+def import_rows(channel_storage, rows, batch_size, add=False, dry_run=False, progress=None):
+    """
+    The function to write rows to storage in batches.
+
+    Only one batch per kind is held at a time. A user who appears more than once
+    in a batch is written once, with the last username and, when adding, the
+    sum of the points.
+
+    Parameters:
+        channel_storage (Storage): The storage backend to write to
+        rows (iterable): The rows as dicts, as returned by read_rows
+        batch_size (int): How many users to write at a time
+        add (bool): Whether to add points to stored participants' points
+        dry_run (bool): Whether to check the rows without writing them
+        progress (Progress): Counts the rows handled
+
+    Returns:
+        Returns a tuple of the number of rows imported and rows skipped as invalid.
+    """
+    batches = {kind: {} for kind in KINDS}
+    imported = 0
+    skipped = 0
+
+    def flush(kind):
+        batch = batches[kind]
+        if batch and not dry_run:
+            channel_storage.import_users(kind, list(batch.values()), add)
+        batch.clear()
+
+    for number, data in enumerate(rows, 1):
+        try:
+            kind, row = parse_row(data)
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning('Skipping row %s: %s', number, e)
+            skipped += 1
+            continue
+        batch = batches[kind]
+        if add and row[0] in batch:
+            row = row[:2] + tuple(old + new for old, new in zip(batch[row[0]][2:], row[2:]))
+        batch[row[0]] = row
+        imported += 1
+        if progress:
+            progress.add()
+        if len(batch) >= batch_size:
+            flush(kind)
+    for kind in KINDS:
+        flush(kind)
+    return imported, skipped
+
+
+def open_storage(channel_id):
+    """Returns the storage for the channel, looking its ID up if it is not given."""
+    channel_name = os.environ['TWITCH_CHANNEL']
+    if channel_id is None:
+        channel_id = helix.HelixClient(os.environ['TWITCH_ID']).get_user_id(channel_name)
+    return storage.connect(channel_id, channel_name)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Import or export a channel's participants, points, whitelist and "
+                    "blacklist.")
+    parser.add_argument('action', choices=['import', 'export'])
+    parser.add_argument('file', help='The file to read or write, or - for stdin or stdout')
+    parser.add_argument('--format', choices=FORMATS,
+                        help='The file format, guessed from the file name if not given')
+    parser.add_argument('--kind', choices=KINDS, action='append', dest='kinds',
+                        help='Only export this kind of user. May be given more than once')
+    parser.add_argument('--channel-id', help='The channel ID, looked up if not given')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--progress', type=int, default=100000,
+                        help='How many rows to handle between progress messages')
+    parser.add_argument('--add', action='store_true', default=False,
+                        help="Add imported points to participants' points instead of "
+                             "replacing them")
+    parser.add_argument('--dry-run', action='store_true', default=False,
+                        help='Check the rows to import without writing them')
+    args = parser.parse_args(argv)
+    file_format = args.format or ('jsonl' if args.file.endswith('.jsonl') else 'csv')
+    channel_storage = open_storage(args.channel_id)
+
+    if args.action == 'export':
+        progress = Progress('Exported', args.progress)
+        rows = export_rows(channel_storage, args.kinds or KINDS, args.batch_size)
+        if args.file == '-':
+            write_rows(rows, sys.stdout, file_format, progress)
+        else:
+            with open(args.file, 'w', newline='') as file:
+                write_rows(rows, file, file_format, progress)
+        progress.log()
+        return
+
+    progress = Progress('Checked' if args.dry_run else 'Imported', args.progress)
+    if args.file == '-':
+        imported, skipped = import_rows(channel_storage, read_rows(sys.stdin, file_format),
+                                        args.batch_size, args.add, args.dry_run, progress)
+    else:
+        with open(args.file, newline='') as file:
+            imported, skipped = import_rows(channel_storage, read_rows(file, file_format),
+                                            args.batch_size, args.add, args.dry_run, progress)
+    progress.log()
+    logger.info('%s %s rows, skipped %s invalid rows',
+                'Checked' if args.dry_run else 'Imported', imported, skipped)
+
+
+if __name__ == '__main__':
+    logging.basicConfig()
+    logger.setLevel(logging.INFO)
+    main()
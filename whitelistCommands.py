@@ -1,8 +1,3 @@
-import mongoengine as mongodb
-from database.whitelist import WhitelistUser, BlacklistUser
-from database.streamer import Streamer
-
-
 # Currently will assume !hud <item> is the Guess Completion command
 def do_whitelist_command(twitch_bot, connection, command):
     try:
@@ -53,60 +48,22 @@ def get_username_from_command(command):
 
 
 def add_user_to_whitelist(twitch_bot, command):
-    username = get_username_from_command(command)
-
-    if not username:
-        twitch_bot.logger.error('Username not provided')
-        return False
-
-    new_user_id = twitch_bot.get_user_id(username)
-    if not new_user_id:
-        return False
-
-    new_user = WhitelistUser(username = username, user_id = new_user_id)
-    try:
-        streamer = Streamer.objects.get(channel_id = twitch_bot.streamer.channel_id, whitelist__user_id = new_user_id) #pylint: disable=no-member
-        if streamer.whitelist:
-            twitch_bot.logger.info('User with ID %s already exists in the database' % new_user_id)
-            return False
-    except Streamer.DoesNotExist: #pylint: disable=no-member
-        twitch_bot.logger.error('User with ID %s does not exist in the database' %new_user_id)
-
-    try:
-        twitch_bot.streamer.whitelist.append(new_user)
-        twitch_bot.streamer.save()
-        twitch_bot.streamer.reload()
-        return True
-    except mongodb.NotUniqueError:
-        twitch_bot.logger.error('User with ID %s already exists in the database' % new_user_id)
-    return False
+    return add_user_to_list(twitch_bot, command, 'whitelist')
 
 
 def remove_user_from_whitelist(twitch_bot, command):
-    username = get_username_from_command(command)
+    return remove_user_from_list(twitch_bot, command, 'whitelist')
 
-    if not username:
-        twitch_bot.logger.error('Username not provided')
-        return False
 
-    existing_user_id = twitch_bot.get_user_id(username)
-    if not existing_user_id:
-        return False
+def add_user_to_blacklist(twitch_bot, command):
+    return add_user_to_list(twitch_bot, command, 'blacklist')
 
-    try:
-        streamer = Streamer.objects.get(channel_id = twitch_bot.streamer.channel_id, whitelist__user_id = existing_user_id) #pylint: disable=no-member
-        if not streamer.whitelist:
-            return False
-        Streamer.objects.update(channel_id = twitch_bot.streamer.channel_id, pull__whitelist__user_id = existing_user_id) #pylint: disable=no-member
-        twitch_bot.streamer.save()
-        twitch_bot.streamer.reload()
-        return True
-    except Streamer.DoesNotExist: #pylint: disable=no-member
-        twitch_bot.logger.error('User with ID %s does not exist in the database' % existing_user_id)
-        return False
 
+def remove_user_from_blacklist(twitch_bot, command):
+    return remove_user_from_list(twitch_bot, command, 'blacklist')
 
-def add_user_to_blacklist(twitch_bot, command):
+
+def add_user_to_list(twitch_bot, command, list_name):
     username = get_username_from_command(command)
 
     if not username:
@@ -117,26 +74,10 @@ def add_user_to_blacklist(twitch_bot, command):
     if not new_user_id:
         return False
 
-    new_user = BlacklistUser(username=username, user_id=new_user_id)
-    try:
-        streamer = Streamer.objects.get(channel_id = twitch_bot.streamer.channel_id, blacklist__user_id = new_user_id) #pylint: disable=no-member
-        if streamer.blacklist:
-            twitch_bot.logger.info('User with ID %s already exists in the database' % new_user_id)
-            return False
-    except Streamer.DoesNotExist: #pylint: disable=no-member
-        twitch_bot.logger.error('User with ID %s does not exist in the database' % new_user_id)
-
-    try:
-        twitch_bot.streamer.blacklist.append(new_user)
-        twitch_bot.streamer.save()
-        twitch_bot.streamer.reload()
-        return True
-    except mongodb.NotUniqueError:
-        twitch_bot.logger.error('User with ID %s already exists in the database' % new_user_id)
-    return False
+    return twitch_bot.storage.add_to_user_list(list_name, new_user_id, username)
 
 
-def remove_user_from_blacklist(twitch_bot, command):
+def remove_user_from_list(twitch_bot, command, list_name):
     username = get_username_from_command(command)
 
     if not username:
@@ -147,15 +88,4 @@ def remove_user_from_blacklist(twitch_bot, command):
     if not existing_user_id:
         return False
 
-    try:
-        streamer = Streamer.objects.get(channel_id = twitch_bot.streamer.channel_id, blacklist__user_id = existing_user_id) #pylint: disable=no-member
-        if not streamer.whitelist:
-            return False
-        Streamer.objects.update(channel_id = twitch_bot.streamer.channel_id, pull__blacklist__user_id = existing_user_id) #pylint: disable=no-member
-        twitch_bot.streamer.save()
-        twitch_bot.streamer.reload()
-        return True
-    except Streamer.DoesNotExist: #pylint: disable=no-member
-        twitch_bot.logger.error('User with ID %s does not exist in the database' % existing_user_id)
-        return False
-
+    return twitch_bot.storage.remove_from_user_list(list_name, existing_user_id)
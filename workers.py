@@ -0,0 +1,125 @@
+"""This module provides a bounded worker pool for running chat commands."""
+import logging
+import threading
+import time
+from collections import deque
+
+
+class CommandDispatcher():
+    """
+    This is a class for running commands on a pool of worker threads.
+
+    Work is submitted under a key. Work sharing a key runs one at a time in the
+    order it was submitted, while work under different keys, or with no key,
+    runs concurrently. The number of pending tasks is bounded: tasks with no key
+    are rejected once the queue is soft_limit full, and keyed tasks once it is
+    completely full, so ordered game commands keep flowing while read-only
+    commands are shed first. Periodic work can be coalesced, so a task that is
+    still queued or running is not queued again behind itself when it stalls.
+    """
+    def __init__(self, workers=4, max_pending=1000, soft_limit=0.8):
+        """The constructor for CommandDispatcher class."""
+        self.logger = logging.getLogger(__name__)
+        self.max_pending = max_pending
+        self.soft_pending = int(max_pending * soft_limit)
+        self.condition = threading.Condition()
+        self.lanes = {}
+        self.ready = deque()
+        self.pending = 0
+        self.coalescing = set()
+        self.metrics = {
+            "submitted": 0,
+            "rejected": 0,
+            "coalesced": 0,
+            "completed": 0,
+            "failed": 0,
+            "wait-total": 0.0,
+            "wait-max": 0.0
+        }
+        self.threads = [
+            threading.Thread(target=self._work, name='worker-%s' % i, daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, key, function, *args, coalesce=False):
+        """
+        The function to queue work.
+
+        Parameters:
+            key (object): Work with the same key runs in submission order, None for
+                work that may run concurrently with anything
+            function (callable): The function to run
+            args: The arguments to call the function with
+            coalesce (bool): Whether to skip the work while the same function is
+                already queued or running under the key
+
+        Returns:
+            Returns False if the work was rejected because the queue is full.
+        """
+        with self.condition:
+            if coalesce and (key, function) in self.coalescing:
+                self.metrics['coalesced'] += 1
+                return True
+            limit = self.soft_pending if key is None else self.max_pending
+            if self.pending >= limit:
+                self.metrics['rejected'] += 1
+                self.logger.debug('Work queue full, rejected %s', function.__name__)
+                return False
+            if key is None:
+                key = object()
+            lane = self.lanes.get(key)
+            if lane is None:
+                lane = self.lanes[key] = deque()
+                self.ready.append(key)
+                self.condition.notify()
+            if coalesce:
+                self.coalescing.add((key, function))
+            lane.append((time.monotonic(), function, args, coalesce))
+            self.pending += 1
+            self.metrics['submitted'] += 1
+        return True
+
+    def _work(self):
+        while True:
+            with self.condition:
+                while not self.ready:
+                    self.condition.wait()
+                key = self.ready.popleft()
+                enqueued, function, args, coalesce = self.lanes[key][0]
+                wait = time.monotonic() - enqueued
+                self.metrics['wait-total'] += wait
+                self.metrics['wait-max'] = max(self.metrics['wait-max'], wait)
+            try:
+                function(*args)
+            except Exception: #pylint: disable=broad-except
+                self.metrics['failed'] += 1
+                self.logger.exception('Error running %s', function.__name__)
+            with self.condition:
+                lane = self.lanes[key]
+                lane.popleft()
+                if coalesce:
+                    self.coalescing.discard((key, function))
+                self.pending -= 1
+                self.metrics['completed'] += 1
+                if lane:
+                    self.ready.append(key)
+                    self.condition.notify()
+                else:
+                    del self.lanes[key]
+
+    def stats(self):
+        """Returns a dictionary of the queue depth, wait times and counters."""
+        with self.condition:
+            started = self.metrics['completed'] + len(self.lanes) - len(self.ready)
+            return {
+                "depth": self.pending,
+                "lanes": len(self.lanes),
+                "wait-average": self.metrics['wait-total'] / started if started else 0.0,
+                "wait-max": self.metrics['wait-max'],
+                "submitted": self.metrics['submitted'],
+                "rejected": self.metrics['rejected'],
+                "coalesced": self.metrics['coalesced'],
+                "failed": self.metrics['failed']
+            }